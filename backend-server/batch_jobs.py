@@ -0,0 +1,414 @@
+# backend-server/batch_jobs.py
+# The asynchronous batch API. Clients submit analysis or download batches, get a batch ID back
+# immediately, and read the results as a stream (NDJSON or Server-Sent Events) while the batch runs
+# on the server's worker pools. Several clients can run batches at the same time.
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+# orjson is much faster for large result payloads, but it is optional.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- 1. SHARED DESKTOP-CLIENT CORE ---
+# The analysis and download engines live in the desktop client's `core` package; the backend runs
+# the very same code. Point VORTEXFLOW_CLIENT_DIR at the desktop-client folder if it isn't a sibling.
+CLIENT_DIR = os.environ.get(
+    "VORTEXFLOW_CLIENT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "desktop-client"),
+)
+if CLIENT_DIR not in sys.path:
+    sys.path.insert(0, CLIENT_DIR)
+
+from core.analyzer import scan_export_file, merge_scans  # noqa: E402
+from core.share_links import canonical_link_key  # noqa: E402
+from core.metrics import metrics  # noqa: E402
+
+# --- 2. SETTINGS ---
+# Worker processes shared by all analysis batches (parsing is CPU-bound).
+ANALYSIS_PROCESSES = int(os.environ.get("VORTEXFLOW_ANALYSIS_PROCESSES", os.cpu_count() or 1))
+# Download batches that may run at the same time (each one starts its own browsers).
+DOWNLOAD_BATCH_SLOTS = int(os.environ.get("VORTEXFLOW_DOWNLOAD_BATCH_SLOTS", 2))
+# Finished batches kept in memory for clients to read; the oldest are forgotten first.
+MAX_FINISHED_BATCHES = 200
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# A stream with nothing new to say sends a keep-alive this often, so proxies don't close it.
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+# Batch states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+# --- 3. FAST JSON ---
+
+def dumps(data: Any) -> bytes:
+    """Serializes data to compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """A JSON response rendered with dumps()."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --- 4. BATCHES ---
+
+class Batch:
+    """One submitted batch and its results, which grow while the batch runs."""
+
+    def __init__(self, kind: str, total: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.total = total
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # (event loop, asyncio.Event) of every stream waiting for the next result.
+        self._waiters: List[tuple] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batch_id": self.id, "kind": self.kind, "status": self.status, "error": self.error,
+                "total": self.total, "results": len(self.results),
+                "created_at": self.created_at, "finished_at": self.finished_at,
+            }
+
+    def start(self) -> None:
+        with self._lock:
+            if self.status == QUEUED:
+                self.status = RUNNING
+
+    def add_result(self, result: Dict[str, Any]) -> None:
+        """Appends a result (called from worker threads) and wakes up the streams."""
+        with self._lock:
+            self.results.append(dict(result, seq=len(self.results)))
+        self._notify()
+
+    def finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+        self._notify()
+
+    def _notify(self) -> None:
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.results[offset:offset + limit]
+
+    async def wait_for_change(self, seen: int, timeout: float) -> None:
+        """Waits (without blocking the event loop) until there are more than `seen` results or the batch ends."""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if len(self.results) > seen or self.status in (DONE, FAILED):
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.remove(waiter)
+
+
+class BatchManager:
+    """Keeps track of every batch and runs them on shared worker pools."""
+
+    def __init__(self):
+        self._batches: "OrderedDict[str, Batch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._analysis_pool: Optional[ProcessPoolExecutor] = None
+        # Small thread pool for the cheap steps around the CPU work (merging, cleanup).
+        self._coordinator = ThreadPoolExecutor(max_workers=4, thread_name_prefix="BatchCoordinator")
+        self._download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_BATCH_SLOTS, thread_name_prefix="DownloadBatch")
+
+    # --- Bookkeeping ---
+
+    def _register(self, batch: Batch) -> Batch:
+        with self._lock:
+            self._batches[batch.id] = batch
+            finished = [b.id for b in self._batches.values() if b.finished]
+            for batch_id in finished[:max(0, len(finished) - MAX_FINISHED_BATCHES)]:
+                del self._batches[batch_id]
+        return batch
+
+    def get(self, batch_id: str) -> Batch:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None:
+            raise HTTPException(status_code=404, detail=f"Unknown batch '{batch_id}'")
+        return batch
+
+    def list(self, status: Optional[str], offset: int, limit: int) -> Dict[str, Any]:
+        with self._lock:
+            batches = [b for b in reversed(self._batches.values()) if status is None or b.status == status]
+        return {
+            "items": [b.summary() for b in batches[offset:offset + limit]],
+            "total": len(batches), "offset": offset, "limit": limit,
+        }
+
+    def _get_analysis_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._analysis_pool is None:
+                self._analysis_pool = ProcessPoolExecutor(max_workers=max(1, ANALYSIS_PROCESSES))
+            return self._analysis_pool
+
+    def shutdown(self) -> None:
+        self._download_pool.shutdown(wait=False, cancel_futures=True)
+        self._coordinator.shutdown(wait=False, cancel_futures=True)
+        if self._analysis_pool is not None:
+            self._analysis_pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Analysis Batches ---
+
+    def submit_analysis(self, files: List[Dict[str, str]], banned_links: List[str], streaming: bool) -> Batch:
+        """
+        Analyzes uploaded export files. Every file is parsed in a worker process and reported as soon
+        as it is done; once all files are done, the merged result (jobs and statistics) follows.
+        """
+        batch = self._register(Batch("analysis", len(files)))
+        work_dir = tempfile.mkdtemp(prefix=f"vortexflow_{batch.id}_")
+        paths = []
+        for position, export in enumerate(files):
+            # Keep the original file name (it ends up in job folder names), in its own folder.
+            folder = os.path.join(work_dir, str(position))
+            os.makedirs(folder)
+            name = re.sub(r"[\\/:*?\"<>|]", "_", os.path.basename(export["name"])) or "export.html"
+            path = os.path.join(folder, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(export["content"])
+            paths.append(path)
+
+        banned = {text for link in banned_links for text in (link, canonical_link_key(link))}
+        scanned: List[Optional[List[dict]]] = [None] * len(paths)
+        remaining = [len(paths)]
+        lock = threading.Lock()
+
+        def finish():
+            try:
+                with metrics.span("analyzer_dedupe"):
+                    summary = merge_scans(paths, scanned, banned)
+                batch.add_result({"type": "summary", "result": summary})
+                batch.finish(DONE)
+            except Exception as e:
+                batch.finish(FAILED, str(e))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        def on_file_done(position, future, submitted):
+            # Files are parsed in worker processes, so the whole round trip is timed here.
+            metrics.observe_stage("batch_file_analysis", time.perf_counter() - submitted, submitted)
+            try:
+                records = future.result()
+                scanned[position] = records
+                batch.add_result({
+                    "type": "file", "index": position, "file": os.path.basename(paths[position]),
+                    "messages_with_links": len(records),
+                    "links": sum(len(r["links"]) for r in records),
+                    "terabox_links": sum(len(r["terabox"]) for r in records),
+                })
+            except Exception as e:
+                scanned[position] = []
+                batch.add_result({"type": "error", "index": position, "file": os.path.basename(paths[position]), "error": str(e)})
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._coordinator.submit(finish)
+            else:
+                submit_next()
+
+        pool = self._get_analysis_pool()
+        pending_positions = iter(range(len(paths)))
+
+        def submit_next():
+            with lock:
+                position = next(pending_positions, None)
+            if position is not None:
+                submitted = time.perf_counter()
+                future = pool.submit(scan_export_file, paths[position], streaming)
+                future.add_done_callback(lambda f: on_file_done(position, f, submitted))
+
+        batch.start()
+        if not paths:
+            self._coordinator.submit(finish)
+        # Each batch keeps at most one file per worker process in the pool's queue and submits the
+        # next one when a file is done, so concurrent batches share the workers instead of queueing
+        # behind each other.
+        for _ in range(min(len(paths), max(1, ANALYSIS_PROCESSES))):
+            submit_next()
+        return batch
+
+    # --- Download Batches ---
+
+    def submit_downloads(self, jobs: List[Dict[str, Any]], headless: bool) -> Batch:
+        """Downloads the jobs with the client's download scheduler, reporting every job as it finishes."""
+        batch = self._register(Batch("download", len(jobs)))
+
+        def run():
+            batch.start()
+            try:
+                # Imported here so the backend only needs Selenium when it actually downloads.
+                from core.config import LOCAL_DOWNLOAD_FOLDER
+                from core.download_scheduler import DownloadScheduler
+                scheduler = DownloadScheduler(
+                    lambda msg: print(f"[Batch {batch.id[:8]}] {msg}", end=""),
+                    is_headless=headless,
+                    on_job_done=lambda job: batch.add_result(dict(job, type="job")),
+                    # Up to DOWNLOAD_BATCH_SLOTS batches download at once; each gets its own worker folders.
+                    download_root=os.path.join(LOCAL_DOWNLOAD_FOLDER, f"batch_{batch.id}"),
+                )
+                scheduler.run(jobs)
+                batch.finish(DONE)
+            except Exception as e:
+                batch.finish(FAILED, str(e))
+
+        self._download_pool.submit(run)
+        return batch
+
+
+manager = BatchManager()
+
+
+# --- 5. STREAMING ---
+
+def _encode_event(result: Dict[str, Any], stream_format: str) -> bytes:
+    if stream_format == "sse":
+        return b"id: %d\nevent: %s\ndata: " % (result.get("seq", -1), result["type"].encode()) + dumps(result) + b"\n\n"
+    return dumps(result) + b"\n"
+
+
+async def _stream_results(batch: Batch, after: int, stream_format: str):
+    """Yields the batch's results from position `after` on, as they arrive, then an "end" event."""
+    seen = max(0, after)
+    while True:
+        for result in batch.page(seen, MAX_PAGE_SIZE):
+            seen += 1
+            yield _encode_event(result, stream_format)
+        if batch.finished and not batch.page(seen, 1):
+            yield _encode_event({"type": "end", "status": batch.status, "error": batch.error}, stream_format)
+            return
+        count_before = seen
+        await batch.wait_for_change(seen, STREAM_KEEPALIVE_SECONDS)
+        if not batch.page(count_before, 1) and not batch.finished:
+            yield b": keep-alive\n\n" if stream_format == "sse" else b"\n"
+
+
+# --- 6. ENDPOINTS ---
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+
+class ExportFile(BaseModel):
+    name: str
+    content: str
+
+
+class AnalysisBatchRequest(BaseModel):
+    files: List[ExportFile]
+    banned_links: List[str] = []
+    streaming: bool = True
+
+
+class DownloadBatchRequest(BaseModel):
+    jobs: List[Dict[str, Any]]
+    headless: bool = True
+
+
+def _accepted(batch: Batch) -> FastJSONResponse:
+    body = batch.summary()
+    body["stream_url"] = f"/batches/{batch.id}/stream"
+    return FastJSONResponse(body, status_code=202)
+
+
+@router.post("/analysis")
+async def submit_analysis_batch(request: AnalysisBatchRequest) -> FastJSONResponse:
+    """Starts analyzing export files. Returns immediately; read the results from the stream URL."""
+    files = [{"name": export.name, "content": export.content} for export in request.files]
+    # Writing the uploads to disk is blocking I/O, so keep it off the event loop.
+    batch = await asyncio.get_running_loop().run_in_executor(
+        None, manager.submit_analysis, files, request.banned_links, request.streaming
+    )
+    return _accepted(batch)
+
+
+@router.post("/downloads")
+async def submit_download_batch(request: DownloadBatchRequest) -> FastJSONResponse:
+    """Starts downloading a list of download jobs (as created by the analyzer)."""
+    return _accepted(manager.submit_downloads(request.jobs, request.headless))
+
+
+@router.get("")
+async def list_batches(status: Optional[str] = None, offset: int = Query(0, ge=0),
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> FastJSONResponse:
+    """Lists batches, newest first, one page at a time."""
+    return FastJSONResponse(manager.list(status, offset, limit))
+
+
+@router.get("/{batch_id}")
+async def get_batch(batch_id: str) -> FastJSONResponse:
+    """Returns the status of one batch."""
+    return FastJSONResponse(manager.get(batch_id).summary())
+
+
+@router.get("/{batch_id}/results")
+async def get_batch_results(batch_id: str, offset: int = Query(0, ge=0),
+                            limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> FastJSONResponse:
+    """Returns one page of a batch's results (the same items the stream delivers)."""
+    batch = manager.get(batch_id)
+    return FastJSONResponse({**batch.summary(), "items": batch.page(offset, limit), "offset": offset, "limit": limit})
+
+
+@router.get("/{batch_id}/stream")
+async def stream_batch_results(batch_id: str, format: str = "ndjson", after: int = Query(0, ge=0)) -> StreamingResponse:
+    """
+    Streams a batch's results as they are produced: one JSON object per line (format=ndjson) or
+    Server-Sent Events (format=sse). Pass `after` to resume a stream after a dropped connection.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=422, detail="format must be 'ndjson' or 'sse'")
+    batch = manager.get(batch_id)
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(_stream_results(batch, after, format), media_type=media_type,
+                             headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,260 @@
+# backend-server/link_registry.py
+# The shared link registry. Every desktop client reports which links it downloaded, failed or banned,
+# and asks in bulk about the links of a new analysis, so no two machines download the same share.
+# Links are identified by their canonical key (see desktop-client/core/share_links.py).
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+
+from batch_jobs import FastJSONResponse
+from core.metrics import metrics
+
+# orjson parses the large request bodies of bulk lookups several times faster, but it is optional.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- 1. SETTINGS ---
+DATA_DIR = os.environ.get("VORTEXFLOW_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+REGISTRY_LOG_FILE = os.path.join(DATA_DIR, "link_registry.log")
+# Maximum number of links in one lookup or mark request.
+MAX_LINKS_PER_REQUEST = 1_000_000
+
+# --- 2. STATE CODES ---
+# One byte per link in lookup responses.
+UNKNOWN = 0
+SEEN = 1      # Downloaded by another client (a client's own downloads are answered as UNKNOWN)
+FAILED = 2    # Could not be downloaded
+BANNED = 3    # Permanently banned
+
+STATE_CODES = {"unknown": UNKNOWN, "seen": SEEN, "failed": FAILED, "banned": BANNED}
+# A link keeps its strongest state: a later failure never hides a successful download, and
+# nothing lifts a ban.
+_PRIORITY = {UNKNOWN: 0, FAILED: 1, SEEN: 2, BANNED: 3}
+
+# Log record: 64-bit fingerprint of the canonical key + state code + 64-bit fingerprint of the client
+# that set the state (0 if it did not say).
+_RECORD = struct.Struct("<QBQ")
+
+
+def fingerprint(key: str) -> int:
+    """The 64-bit fingerprint a canonical link key is stored under."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LinkRegistry:
+    """
+    An in-memory map of link fingerprint -> state code, made durable by an append-only log
+    of fixed-size binary records that is replayed on start-up and compacted when it grows.
+
+    The registry also remembers which client marked a link as seen, so a client that looks up
+    the shares it downloaded itself gets them back as UNKNOWN: only downloads made by another
+    client are reported as SEEN.
+    """
+
+    def __init__(self, log_path: str = REGISTRY_LOG_FILE):
+        self.log_path = log_path
+        self._states: Dict[int, int] = {}
+        # Link fingerprint -> fingerprint of the client that marked it as seen.
+        self._seen_by: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._log_records = 0
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        self._replay()
+        self._log = open(log_path, "ab")
+
+    def _replay(self) -> None:
+        try:
+            with open(self.log_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        usable = len(data) - len(data) % _RECORD.size  # Ignore a record cut short by a crash.
+        for value, state, client in _RECORD.iter_unpack(memoryview(data)[:usable]):
+            self._states[value] = state
+            if state == SEEN and client:
+                self._seen_by[value] = client
+            else:
+                self._seen_by.pop(value, None)
+        self._log_records = usable // _RECORD.size
+
+    def lookup(self, keys: List[str], client: str = "") -> bytes:
+        """
+        Returns one state code byte per key.
+
+        Args:
+            keys (List[str]): Canonical link keys.
+            client (str): The asking client's ID. Links only it marked as seen are answered as UNKNOWN.
+        """
+        states, seen_by = self._states, self._seen_by
+        client_value = fingerprint(client) if client else 0
+        codes = bytearray(len(keys))
+        with self._lock:
+            for position, key in enumerate(keys):
+                value = fingerprint(key)
+                state = states.get(value, UNKNOWN)
+                if state == SEEN and client_value and seen_by.get(value) == client_value:
+                    state = UNKNOWN
+                codes[position] = state
+        return bytes(codes)
+
+    def mark(self, keys: List[str], state: int, client: str = "") -> int:
+        """
+        Records a new state for every key and persists the changes before returning.
+
+        Args:
+            keys (List[str]): Canonical link keys.
+            state (int): SEEN, FAILED or BANNED.
+            client (str): The reporting client's ID (see lookup()).
+
+        Returns:
+            int: The number of links whose state changed.
+        """
+        client_value = fingerprint(client) if client else 0
+        records = bytearray()
+        with self._lock:
+            for key in keys:
+                value = fingerprint(key)
+                old_state = self._states.get(value, UNKNOWN)
+                if _PRIORITY[state] > _PRIORITY[old_state]:
+                    self._states[value] = state
+                    if state == SEEN and client_value:
+                        self._seen_by[value] = client_value
+                    else:
+                        self._seen_by.pop(value, None)
+                    records += _RECORD.pack(value, state, client_value if state == SEEN else 0)
+            if records:
+                self._log.write(records)
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._log_records += len(records) // _RECORD.size
+                if self._log_records > 2 * len(self._states) + 100_000:
+                    self._compact()
+        return len(records) // _RECORD.size
+
+    def _compact(self) -> None:
+        """Rewrites the log with one record per link (called with the lock held)."""
+        temp_path = self.log_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            seen_by = self._seen_by
+            f.write(b"".join(_RECORD.pack(value, state, seen_by.get(value, 0)) for value, state in self._states.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.close()
+        os.replace(temp_path, self.log_path)
+        self._log = open(self.log_path, "ab")
+        self._log_records = len(self._states)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {name: 0 for name in STATE_CODES if name != "unknown"}
+            names = {code: name for name, code in STATE_CODES.items()}
+            for state in self._states.values():
+                counts[names[state]] += 1
+            return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._log.close()
+
+
+# Opened by open_registry() when the server starts, not on import, so importing this module
+# neither creates DATA_DIR nor replays the log.
+registry: Optional[LinkRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def open_registry() -> LinkRegistry:
+    """Returns the server's link registry, opening it (and replaying its log) on first use."""
+    global registry
+    with _registry_lock:
+        if registry is None:
+            registry = LinkRegistry()
+        return registry
+
+
+def close_registry() -> None:
+    """Closes the registry if it was opened."""
+    global registry
+    with _registry_lock:
+        if registry is not None:
+            registry.close()
+            registry = None
+
+
+# --- 3. ENDPOINTS ---
+
+router = APIRouter(prefix="/registry", tags=["registry"])
+
+
+async def _read_links(request: Request) -> Dict[str, Any]:
+    """Parses a {"links": [...], ...} body without per-item validation (bodies can hold a million links)."""
+    body = await request.body()
+    try:
+        payload = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    links = payload.get("links") if isinstance(payload, dict) else None
+    if not isinstance(links, list) or not all(isinstance(link, str) for link in links):
+        raise HTTPException(status_code=422, detail='"links" must be a list of strings')
+    if len(links) > MAX_LINKS_PER_REQUEST:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_LINKS_PER_REQUEST} links per request")
+    return payload
+
+
+def _client(payload: Dict[str, Any]) -> str:
+    client = payload.get("client", "")
+    if not isinstance(client, str):
+        raise HTTPException(status_code=422, detail='"client" must be a string')
+    return client
+
+
+@router.post("/lookup")
+async def lookup_links(request: Request) -> FastJSONResponse:
+    """
+    Looks up the state of many canonical links at once.
+
+    Body: {"links": ["terabox:s/1abc", ...], "client": "<client ID>"}. The response holds one state
+    code per link, in order, as base64-encoded bytes ("codes"), or as a plain list with ?encoding=array.
+    Links the asking client marked as seen itself are answered as unknown.
+    """
+    payload = await _read_links(request)
+    with metrics.span("registry_lookup_request"):
+        codes = await asyncio.get_running_loop().run_in_executor(None, open_registry().lookup, payload["links"],
+                                                                 _client(payload))
+    if request.query_params.get("encoding") == "array":
+        encoded: Any = list(codes)
+    else:
+        encoded = base64.b64encode(codes).decode("ascii")
+    return FastJSONResponse({"count": len(codes), "codes": encoded, "states": STATE_CODES})
+
+
+@router.post("/mark")
+async def mark_links(request: Request) -> FastJSONResponse:
+    """
+    Records that links were downloaded, failed or banned.
+    Body: {"state": "seen", "links": [...], "client": "<client ID>"}.
+    """
+    payload = await _read_links(request)
+    state = STATE_CODES.get(payload.get("state"))
+    if state is None or state == UNKNOWN:
+        raise HTTPException(status_code=422, detail='"state" must be "seen", "failed" or "banned"')
+    with metrics.span("registry_mark_request"):
+        updated = await asyncio.get_running_loop().run_in_executor(None, open_registry().mark, payload["links"], state,
+                                                                   _client(payload))
+    return FastJSONResponse({"count": len(payload["links"]), "updated": updated})
+
+
+@router.get("/stats")
+async def registry_stats() -> FastJSONResponse:
+    """Returns how many links the registry knows in each state."""
+    return FastJSONResponse(open_registry().stats())
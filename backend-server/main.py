@@ -3,9 +3,14 @@
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict
 
+import batch_jobs
+import link_registry
+from core.metrics import metrics
+
 # --- 1. CREATE THE APP INSTANCE ---
 app = FastAPI(
     title="VortexFlow Backend",
@@ -47,6 +52,34 @@ def ping_pong() -> Dict[str, str]:
     return {"response": "pong"}
 
 
+# Asynchronous analysis and download batches with streamed results (see batch_jobs.py).
+app.include_router(batch_jobs.router)
+# Shared seen/failed/banned link registry for all desktop clients (see link_registry.py).
+app.include_router(link_registry.router)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """
+    Stage timings (analysis, registry requests, and page load/transfer/sorting of download batches)
+    in the Prometheus text format, for scraping.
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+def open_link_registry() -> None:
+    """Opens the link registry (replaying its log) before the first request comes in."""
+    link_registry.open_registry()
+
+
+@app.on_event("shutdown")
+def shutdown_batch_workers() -> None:
+    """Stops the batch worker pools and closes the link registry when the server shuts down."""
+    batch_jobs.manager.shutdown()
+    link_registry.close_registry()
+
+
 # --- 4. PLACEHOLDER FOR FUTURE FEATURES (FROM OUR BLUEPRINT) ---
 
 # @app.post("/auth/google")
@@ -0,0 +1,73 @@
+# benchmarks/bench_browser_profiles.py
+# Compares the browser profiles (see BROWSER_PROFILE in core/config.py) on real share pages:
+# the time from navigation to a clickable download button, and the browser's memory use.
+# Nothing is downloaded. Needs a working browser and network access, so it is not part of
+# run_benchmarks.py.
+#
+# Usage (from the desktop-client folder):
+#     python benchmarks/bench_browser_profiles.py links.txt --repeat 3
+#     # links.txt holds one share link per line
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Make the "core" package importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.downloader import setup_driver, _open_share_page, PROFILE_LEAN, PROFILE_FULL
+from core.driver_manager import DriverPool
+
+
+def measure_profile(profile: str, links: list[str], repeat: int, page_timeout: float, headless: bool) -> dict:
+    """
+    Opens every link `repeat` times in one browser started with `profile`.
+
+    Returns:
+        dict: {"times": seconds to a clickable button per page, "timeouts": int, "memory_mb": float}
+    """
+    driver = setup_driver(lambda message: None, is_headless=headless, profile=profile)
+    times, timeouts = [], 0
+    try:
+        for _ in range(repeat):
+            for link in links:
+                started = time.perf_counter()
+                try:
+                    _open_share_page(driver, link, lambda message: None, page_timeout, lambda *args: None)
+                    times.append(time.perf_counter() - started)
+                except Exception:
+                    timeouts += 1
+                # Start every page from a blank tab, as the downloader does.
+                driver.get("about:blank")
+        memory_mb = DriverPool.memory_mb(driver)
+    finally:
+        driver.quit()
+    return {"times": times, "timeouts": timeouts, "memory_mb": memory_mb}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the lean and full browser profiles on share pages.")
+    parser.add_argument("links_file", help="Text file with one share link per line.")
+    parser.add_argument("--repeat", type=int, default=1, help="Times every link is opened per profile.")
+    parser.add_argument("--page-timeout", type=float, default=30.0, help="Seconds to wait for the download button.")
+    parser.add_argument("--show-browser", action="store_true", help="Don't run the browsers headless.")
+    args = parser.parse_args()
+
+    with open(args.links_file, "r", encoding="utf-8") as f:
+        links = [line.strip() for line in f if line.strip()]
+    if not links:
+        sys.exit("No links to open.")
+
+    print(f"{'profile':<8} {'pages':>6} {'timeouts':>9} {'median':>9} {'p90':>9} {'memory':>10}")
+    for profile in (PROFILE_FULL, PROFILE_LEAN):
+        result = measure_profile(profile, links, args.repeat, args.page_timeout, not args.show_browser)
+        times = sorted(result["times"])
+        median = statistics.median(times) if times else float("nan")
+        p90 = times[int(len(times) * 0.9)] if times else float("nan")
+        print(f"{profile:<8} {len(times):>6} {result['timeouts']:>9} {median:>8.2f}s {p90:>8.2f}s {result['memory_mb']:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
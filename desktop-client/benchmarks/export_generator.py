@@ -0,0 +1,239 @@
+# benchmarks/export_generator.py
+# Writes synthetic Telegram exports with the same structure as the ones Telegram Desktop produces:
+# HTML (messages.html, messages2.html, ...) or JSON (result.json), for benchmarks and manual testing.
+#
+# Usage (from the desktop-client folder):
+#     python benchmarks/export_generator.py OUTPUT_DIR --messages 100000 --files 4
+#     python benchmarks/export_generator.py OUTPUT_DIR --messages 100000 --format json
+
+import argparse
+import html
+import json
+import os
+import random
+import sys
+
+# Make the "core" package importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import TERABOX_DOMAINS
+
+OTHER_HOSTS = ["youtube.com", "www.instagram.com", "t.me", "example.org", "cdn.discordapp.com", "bit.ly", "github.com"]
+SENDERS = ["Archive Bot", "Mirror Uploads", "Alice", "Bob", "Channel Admin"]
+WORDS = ["new", "upload", "part", "full", "pack", "HD", "mirror", "backup", "season", "episode", "link", "files"]
+_ID_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+
+_HEADER = """<!DOCTYPE html>
+<html>
+ <head>
+  <meta charset="utf-8"/>
+  <title>Exported Data</title>
+  <meta content="width=device-width, initial-scale=1.0" name="viewport"/>
+  <link href="css/style.css" rel="stylesheet"/>
+ </head>
+ <body>
+  <div class="page_wrap">
+   <div class="page_header">
+    <div class="content">
+     <div class="text bold">VortexFlow Benchmark Channel</div>
+    </div>
+   </div>
+   <div class="page_body chat_page">
+    <div class="history">
+"""
+_FOOTER = """    </div>
+   </div>
+  </div>
+ </body>
+</html>
+"""
+
+
+class LinkFactory:
+    """Produces TeraBox and other links with a given share of TeraBox links and of repeated shares."""
+
+    def __init__(self, rng: random.Random, terabox_ratio: float, duplicate_rate: float):
+        self.rng = rng
+        self.terabox_ratio = terabox_ratio
+        self.duplicate_rate = duplicate_rate
+        self.share_ids: list[str] = []
+
+    def _new_share_id(self) -> str:
+        return "1" + "".join(self.rng.choices(_ID_ALPHABET, k=22))
+
+    def next_link(self) -> str:
+        rng = self.rng
+        if rng.random() >= self.terabox_ratio:
+            host = rng.choice(OTHER_HOSTS)
+            return f"https://{host}/{rng.choice(WORDS)}/{rng.randrange(10**6)}"
+        if self.share_ids and rng.random() < self.duplicate_rate:
+            # A re-post of an earlier share, often on another mirror domain or with tracking parameters.
+            share_id = rng.choice(self.share_ids)
+        else:
+            share_id = self._new_share_id()
+            self.share_ids.append(share_id)
+        host = rng.choice(TERABOX_DOMAINS)
+        if rng.random() < 0.2:
+            host = "www." + host
+        if rng.random() < 0.1:
+            return f"https://{host}/sharing/link?surl={share_id[1:]}"
+        query = f"?pwd={rng.randrange(1000, 9999)}" if rng.random() < 0.15 else ""
+        return f"https://{host}/s/{share_id}{query}"
+
+
+def _caption(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(2, 8)))
+
+
+def _make_message(rng: random.Random, factory: LinkFactory, number: int, max_links: int) -> dict:
+    """
+    Makes up one message. "links" holds (url, caption) pairs; a caption of None means the
+    bare URL is shown, otherwise the link is a text link showing the caption.
+    """
+    if rng.random() < 0.02:
+        return {"id": number, "type": "service", "day": number % 28 + 1}
+    links = [factory.next_link() for _ in range(rng.randint(0, max_links))]
+    return {
+        "id": number, "type": "message",
+        "day": rng.randint(1, 28), "hour": rng.randint(0, 23), "minute": rng.randint(0, 59),
+        "from": rng.choice(SENDERS), "caption": _caption(rng),
+        "links": [(link, None if rng.random() < 0.6 else _caption(rng)) for link in links],
+    }
+
+
+def _message_html(message: dict, joined: bool) -> str:
+    """One message block as Telegram writes it: the links are <a> tags inside <div class="text">."""
+    number = message["id"]
+    if message["type"] == "service":
+        return (f'     <div class="message service" id="message{number}">\n'
+                f'      <div class="body details">\n       {message["day"]} May 2024\n      </div>\n     </div>\n')
+    parts = [f'     <div class="message default clearfix{" joined" if joined else ""}" id="message{number}">\n']
+    if not joined:
+        parts.append('      <div class="pull_left userpic_wrap">\n       <div class="userpic userpic1" style="width: 42px; height: 42px">\n'
+                     '        <div class="initials" style="line-height: 42px">VF</div>\n       </div>\n      </div>\n')
+    parts.append('      <div class="body">\n')
+    parts.append(f'       <div class="pull_right date details" title="{message["day"]:02d}.05.2024 {message["hour"]:02d}:{message["minute"]:02d}:00 UTC+02:00">'
+                 f'{message["hour"]:02d}:{message["minute"]:02d}</div>\n')
+    if not joined:
+        parts.append(f'       <div class="from_name">{message["from"]}</div>\n')
+    parts.append(f'       <div class="text">{html.escape(message["caption"])}')
+    for link, caption in message["links"]:
+        text = html.escape(link) if caption is None else f"<strong>{html.escape(caption)}</strong>"
+        parts.append(f'<br>\n<a href="{html.escape(link)}">{text}</a>')
+    parts.append('\n       </div>\n      </div>\n     </div>\n')
+    return "".join(parts)
+
+
+def _message_json(message: dict) -> dict:
+    """One message as Telegram writes it to result.json."""
+    if message["type"] == "service":
+        return {"id": message["id"], "type": "service", "date": f"2024-05-{message['day']:02d}T00:00:00",
+                "actor": "VortexFlow Benchmark Channel", "action": "pin_message", "text": "", "text_entities": []}
+    entities = [{"type": "plain", "text": message["caption"]}]
+    for link, caption in message["links"]:
+        entities.append({"type": "plain", "text": "\n"})
+        if caption is None:
+            entities.append({"type": "link", "text": link})
+        else:
+            entities.append({"type": "text_link", "text": caption, "href": link})
+    return {
+        "id": message["id"], "type": "message",
+        "date": f"2024-05-{message['day']:02d}T{message['hour']:02d}:{message['minute']:02d}:00",
+        "from": message["from"], "from_id": "channel1000000001",
+        # "text" repeats the entities, with plain runs as bare strings, like Telegram's own export.
+        "text": [entity["text"] if entity["type"] == "plain" else entity for entity in entities],
+        "text_entities": entities,
+    }
+
+
+def _write_html(path: str, messages, file_number: int, files: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_HEADER)
+        if file_number > 1:
+            previous = "messages.html" if file_number == 2 else f"messages{file_number - 1}.html"
+            f.write(f'     <a class="pagination block_link" href="{previous}">Previous messages</a>\n')
+        joined = False
+        for message in messages:
+            f.write(_message_html(message, joined))
+            # Consecutive messages from the same sender are "joined" (no name or picture), as in real exports.
+            joined = message["type"] == "message" and message["id"] % 5 != 0
+        if file_number < files:
+            f.write(f'     <a class="pagination block_link" href="messages{file_number + 1}.html">Next messages</a>\n')
+        f.write(_FOOTER)
+
+
+def _write_json(path: str, messages) -> None:
+    """Writes result.json one message at a time, so huge exports don't need to fit in memory."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{\n "name": "VortexFlow Benchmark Channel",\n "type": "public_channel",\n "id": 1000000001,\n "messages": [')
+        for n, message in enumerate(messages):
+            f.write(("," if n else "") + "\n  " + json.dumps(_message_json(message), ensure_ascii=False))
+        f.write("\n ]\n}\n")
+
+
+def generate_export(output_dir: str, messages: int = 10_000, links_per_message: float = 1.5,
+                    terabox_ratio: float = 0.7, duplicate_rate: float = 0.3, files: int = 1,
+                    seed: int = 1, export_format: str = "html") -> list[str]:
+    """
+    Writes a synthetic Telegram export split over one or more HTML files, or as a result.json.
+
+    Args:
+        output_dir (str): Folder the export files are written to (created if needed).
+        messages (int): Total number of messages across all files.
+        links_per_message (float): Average number of links in a message (0 to twice this value).
+        terabox_ratio (float): Share of the links that point to a TeraBox domain.
+        duplicate_rate (float): Probability that a TeraBox link re-posts an earlier share.
+        files (int): Number of files the export is split into, like Telegram's 1000-messages pages.
+            Ignored for JSON exports, which are always a single result.json.
+        seed (int): Seed of the random generator, so the same arguments always give the same export.
+            The HTML and JSON exports made with the same arguments hold the same messages.
+        export_format (str): "html" or "json".
+
+    Returns:
+        list[str]: The paths of the written files, in order.
+    """
+    if export_format not in ("html", "json"):
+        raise ValueError(f"Unknown export format '{export_format}'")
+    rng = random.Random(seed)
+    factory = LinkFactory(rng, terabox_ratio, duplicate_rate)
+    os.makedirs(output_dir, exist_ok=True)
+    max_links = max(0, round(links_per_message * 2))
+
+    if export_format == "json":
+        path = os.path.join(output_dir, "result.json")
+        _write_json(path, (_make_message(rng, factory, number, max_links) for number in range(1, messages + 1)))
+        return [path]
+
+    files = max(1, files)
+    paths = []
+    number = 1
+    for file_number in range(1, files + 1):
+        name = "messages.html" if file_number == 1 else f"messages{file_number}.html"
+        path = os.path.join(output_dir, name)
+        count = messages // files + (1 if file_number <= messages % files else 0)
+        _write_html(path, (_make_message(rng, factory, n, max_links) for n in range(number, number + count)), file_number, files)
+        number += count
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Telegram export.")
+    parser.add_argument("output_dir", help="Folder to write messages.html, messages2.html, ... (or result.json) into.")
+    parser.add_argument("--messages", type=int, default=10_000, help="Total number of messages.")
+    parser.add_argument("--links-per-message", type=float, default=1.5, help="Average number of links per message.")
+    parser.add_argument("--terabox-ratio", type=float, default=0.7, help="Share of links on TeraBox domains (0-1).")
+    parser.add_argument("--duplicate-rate", type=float, default=0.3, help="Probability that a TeraBox link repeats a share (0-1).")
+    parser.add_argument("--files", type=int, default=1, help="Number of files to split the export into.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--format", choices=("html", "json"), default="html", help="Export format.")
+    args = parser.parse_args()
+
+    paths = generate_export(args.output_dir, args.messages, args.links_per_message, args.terabox_ratio,
+                            args.duplicate_rate, args.files, args.seed, args.format)
+    total_size = sum(os.path.getsize(path) for path in paths)
+    print(f"Wrote {len(paths)} file(s), {total_size / 1024 / 1024:.1f} MB, to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
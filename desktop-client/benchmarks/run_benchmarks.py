@@ -0,0 +1,414 @@
+# benchmarks/run_benchmarks.py
+# The benchmark suite. Runs the analyzer (HTML and JSON exports), link classification,
+# session/ban storage, file sorting, post-download processing and the share prefetch on synthetic
+# data, records throughput and peak memory, and compares the results with the limits in
+# benchmarks/thresholds.json.
+# Exits with status 1 if any benchmark regressed.
+#
+# Throughput limits hold on any machine: each one is stored with the speed of a calibration loop
+# (plain Python work, or small-file work on disk) measured on the machine that set it, and is
+# scaled by the speed of the same loop measured here, for as long as each run of the benchmark
+# took and right after it.
+#
+# Usage (from the desktop-client folder):
+#     python benchmarks/run_benchmarks.py                      # run and check against thresholds.json
+#     python benchmarks/run_benchmarks.py --only analyze       # run the benchmarks whose name contains "analyze"
+#     python benchmarks/run_benchmarks.py --update-thresholds  # store new limits from this machine
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Any, Callable
+
+# Make the "core" package importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.export_generator import generate_export, LinkFactory
+from benchmarks.share_server import ShareServer, generate_shares
+from core import analyzer, banned_index, downloader, file_placement, job_store, post_processing, registry_client, session_manager, share_metadata
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+# Workload sizes. The memory limits in thresholds.json only make sense for these sizes.
+EXPORT_MESSAGES = 30_000
+EXPORT_FILES = 3
+CLASSIFY_LINKS = 500_000
+SESSION_JOBS = 20_000
+BANNED_LINKS = 200_000
+SORTED_FILES = 1_000
+SORTED_FILE_SIZE = 256 * 1024
+POSTPROCESS_DOWNLOADS = 400
+POSTPROCESS_ARCHIVE_MEMBERS = 4
+PREFETCH_LINKS = 2_000
+PREFETCH_LATENCY = 0.02
+CALIBRATION_CPU_ITEMS = 10_000  # Per step; steps are repeated for as long as the benchmark run took.
+CALIBRATION_FILES = 10
+CALIBRATION_MAX_SECONDS = 2.0
+
+
+@contextlib.contextmanager
+def isolated_app_data(directory: str):
+    """
+    Points the job store, banned-link index, content index and sorted-output folder at `directory`
+    and disables the shared link registry, so benchmarks never touch the user's real data.
+    """
+    saved = (job_store._store, banned_index._index, file_placement._index,
+             downloader.SORTED_OUTPUT_FOLDER, registry_client.LINK_REGISTRY_ENABLED)
+    job_store._store = job_store.JobStore(os.path.join(directory, "jobs.db"))
+    banned_index._index = banned_index.BannedLinkIndex(os.path.join(directory, "banned_index"))
+    file_placement._index = file_placement.ContentIndex(os.path.join(directory, "content.db"))
+    downloader.SORTED_OUTPUT_FOLDER = os.path.join(directory, "sorted")
+    registry_client.LINK_REGISTRY_ENABLED = False
+    try:
+        yield
+    finally:
+        job_store._store.close()
+        (job_store._store, banned_index._index, file_placement._index,
+         downloader.SORTED_OUTPUT_FOLDER, registry_client.LINK_REGISTRY_ENABLED) = saved
+
+
+def _silenced(func: Callable[[], Any]) -> Callable[[], Any]:
+    """Wraps a function so its progress prints don't end up in the benchmark report."""
+    def run():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return func()
+    return run
+
+
+def _flush_disk() -> None:
+    """Writes the files a benchmark just prepared to disk, so the timed run doesn't pay for it."""
+    if hasattr(os, "sync"):
+        os.sync()
+
+
+# --- Calibration ---
+# How fast this machine is at the kind of work a benchmark does. Each function returns the number
+# of items per step and the step function. A benchmark's throughput limit is scaled by the ratio
+# between this speed and the one stored with the limit.
+
+def calibrate_cpu(directory: str):
+    """Plain Python work: string formatting, dict updates and method calls."""
+    def step():
+        counts = {}
+        for n in range(CALIBRATION_CPU_ITEMS):
+            key = f"item_{n % 1000}"
+            counts[key] = counts.get(key, 0) + len(key.upper())
+    return CALIBRATION_CPU_ITEMS, step
+
+
+def calibrate_files(directory: str):
+    """Small-file work: creating, hashing, renaming and deleting files of SORTED_FILE_SIZE."""
+    folder = os.path.join(directory, "calibration")
+    os.makedirs(folder, exist_ok=True)
+    data = bytes(SORTED_FILE_SIZE)
+
+    def step():
+        for n in range(CALIBRATION_FILES):
+            path = os.path.join(folder, f"file_{n}")
+            with open(path, "wb") as f:
+                f.write(data)
+            with open(path, "rb") as f:
+                hashlib.blake2b(f.read(), digest_size=32)
+            os.replace(path, path + ".placed")
+            os.remove(path + ".placed")
+    return CALIBRATION_FILES, step
+
+
+CALIBRATIONS: dict[str, Callable] = {
+    "cpu": calibrate_cpu,
+    "files": calibrate_files,
+}
+
+
+# --- Benchmarks ---
+# Each benchmark is set up by a function taking the scratch folder. It returns the number of
+# items processed per run, the unit, and a "prepare" function. prepare() resets the state (untimed)
+# and returns the function to measure.
+
+def bench_analyze_html_files(directory: str):
+    paths = generate_export(os.path.join(directory, "export"), messages=EXPORT_MESSAGES, files=EXPORT_FILES)
+    # One worker, so the whole parse happens in this process and tracemalloc sees all of it.
+    run = _silenced(lambda: analyzer.analyze_html_files(paths, use_cache=False, workers=1, use_registry=False))
+    return EXPORT_MESSAGES, "messages", lambda: run
+
+
+def bench_analyze_json_export(directory: str):
+    paths = generate_export(os.path.join(directory, "export"), messages=EXPORT_MESSAGES, export_format="json")
+    run = _silenced(lambda: analyzer.analyze_html_files(paths, use_cache=False, workers=1, use_registry=False))
+    return EXPORT_MESSAGES, "messages", lambda: run
+
+
+def bench_categorize_link(directory: str):
+    factory = LinkFactory(random.Random(1), terabox_ratio=0.7, duplicate_rate=0.3)
+    links = [factory.next_link() for _ in range(CLASSIFY_LINKS)]
+
+    def run():
+        for link in links:
+            analyzer._categorize_link(link)
+    return CLASSIFY_LINKS, "links", lambda: run
+
+
+def bench_save_session(directory: str):
+    factory = LinkFactory(random.Random(2), terabox_ratio=1.0, duplicate_rate=0.0)
+    jobs = [{"type": "SINGLE", "folder_name": f"job_{n}", "links": [factory.next_link()]} for n in range(SESSION_JOBS)]
+    run = lambda: session_manager.save_session(jobs, directory)
+    return SESSION_JOBS, "jobs", lambda: run
+
+
+def bench_load_banned_links(directory: str):
+    factory = LinkFactory(random.Random(3), terabox_ratio=0.7, duplicate_rate=0.0)
+    banned = [factory.next_link() for _ in range(BANNED_LINKS)]
+    queries = banned[::2] + [factory.next_link() for _ in range(BANNED_LINKS // 2)]
+    index_dir = os.path.join(directory, "banned_index")
+    session_manager.save_banned_links(banned)
+    banned_index.get_banned_index().compact()
+
+    def prepare():
+        # Reopen the index from disk each time, as a fresh application start would.
+        banned_index._index.close()
+        banned_index._index = banned_index.BannedLinkIndex(index_dir)
+
+        def run():
+            bans = session_manager.load_banned_links()
+            return sum(1 for link in queries if link in bans)
+        return run
+    return len(queries), "lookups", prepare
+
+
+def bench_sort_downloaded_files(directory: str):
+    downloads = os.path.join(directory, "downloads")
+    os.makedirs(downloads, exist_ok=True)
+    job = {"type": "MULTI", "folder_name": "benchmark"}
+
+    def prepare():
+        # Fresh downloads, a fifth of them repeating the content of another file.
+        file_placement._index.close()
+        for name in ("content.db", "content.db-wal", "content.db-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, name))
+        file_placement._index = file_placement.ContentIndex(os.path.join(directory, "content.db"))
+        with contextlib.suppress(FileNotFoundError):
+            shutil.rmtree(downloader.SORTED_OUTPUT_FOLDER)
+        paths = []
+        for n in range(SORTED_FILES):
+            path = os.path.join(downloads, f"video_{n}.mp4")
+            content_id = n if n % 5 else n // 5
+            with open(path, "wb") as f:
+                f.write(content_id.to_bytes(8, "little") * (SORTED_FILE_SIZE // 8 + content_id))
+            paths.append(path)
+        _flush_disk()
+        return _silenced(lambda: downloader.sort_downloaded_files(paths, job))
+    return SORTED_FILES, "files", prepare
+
+
+def bench_post_process(directory: str):
+    downloads = os.path.join(directory, "downloads")
+    os.makedirs(downloads, exist_ok=True)
+    jobs = [{"type": "SINGLE", "folder_name": f"job_{n}"} for n in range(POSTPROCESS_DOWNLOADS)]
+
+    def prepare():
+        # Every fourth download is a zip archive, the others single videos; none repeat content.
+        file_placement._index.close()
+        for name in ("content.db", "content.db-wal", "content.db-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, name))
+        file_placement._index = file_placement.ContentIndex(os.path.join(directory, "content.db"))
+        with contextlib.suppress(FileNotFoundError):
+            shutil.rmtree(downloader.SORTED_OUTPUT_FOLDER)
+        rng = random.Random(1)
+        deliveries = []
+        for n in range(POSTPROCESS_DOWNLOADS):
+            if n % 4 == 0:
+                path = os.path.join(downloads, f"archive_{n}.zip")
+                with zipfile.ZipFile(path, "w") as archive:
+                    for member in range(POSTPROCESS_ARCHIVE_MEMBERS):
+                        archive.writestr(f"part_{member}.bin", rng.randbytes(SORTED_FILE_SIZE // POSTPROCESS_ARCHIVE_MEMBERS))
+                info = {"state": share_metadata.ALIVE, "name": os.path.basename(path), "size": os.path.getsize(path)}
+            else:
+                path = os.path.join(downloads, f"video_{n}.mp4")
+                with open(path, "wb") as f:
+                    f.write(rng.randbytes(SORTED_FILE_SIZE))
+                info = {"state": share_metadata.ALIVE, "name": os.path.basename(path), "size": SORTED_FILE_SIZE}
+            deliveries.append((jobs[n], [path], info))
+        _flush_disk()
+
+        def run():
+            processor = post_processing.PostProcessor(lambda message: None).start()
+            for job, paths, info in deliveries:
+                processor.submit(job, paths, share_info=info)
+            processor.close()
+        return run
+    return POSTPROCESS_DOWNLOADS, "downloads", prepare
+
+
+def bench_prefetch_share_info(directory: str):
+    links, shares = generate_shares(PREFETCH_LINKS)
+    # Kept running for the whole process; it is a daemon thread and holds nothing.
+    server = ShareServer(shares, latency=PREFETCH_LATENCY).start()
+    run = lambda: share_metadata.prefetch_share_info(links, api_base=server.base_url)
+    return PREFETCH_LINKS, "links", lambda: run
+
+
+BENCHMARKS: dict[str, Callable] = {
+    "analyze_html_files": bench_analyze_html_files,
+    "analyze_json_export": bench_analyze_json_export,
+    "categorize_link": bench_categorize_link,
+    "save_session": bench_save_session,
+    "load_banned_links": bench_load_banned_links,
+    "sort_downloaded_files": bench_sort_downloaded_files,
+    "post_process": bench_post_process,
+    "prefetch_share_info": bench_prefetch_share_info,
+}
+
+# The calibration each benchmark's throughput is scaled by. The share prefetch is bound by the
+# simulated API latency, not by the machine, so its limit is used as it is.
+BENCHMARK_CALIBRATION: dict[str, str | None] = {
+    "analyze_html_files": "cpu",
+    "analyze_json_export": "cpu",
+    "categorize_link": "cpu",
+    "save_session": "cpu",
+    "load_banned_links": "cpu",
+    "sort_downloaded_files": "files",
+    "post_process": "files",
+    "prefetch_share_info": None,
+}
+
+
+def _timed(run: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def _rate_over(calibration: tuple, seconds: float) -> float:
+    """Repeats a calibration step for about `seconds` (at least once) and returns its items per second."""
+    items, step = calibration
+    steps = 0
+    start = time.perf_counter()
+    while True:
+        step()
+        steps += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return items * steps / elapsed
+
+
+def measure(prepare: Callable[[], Callable], items: int, repeat: int, calibration=None) -> dict[str, float]:
+    """
+    Runs a benchmark `repeat` times for throughput (best run) and once more under tracemalloc
+    for peak memory, since tracing slows the code down too much to time it at the same time.
+    After every run, the calibration (items, step) is timed for as long as the run took, so its
+    speed averages over the machine's ups and downs like the run did. The best run's calibration
+    is the one reported.
+    """
+    best = float("inf")
+    best_calibration = None
+    for _ in range(repeat):
+        run = prepare()
+        seconds = _timed(run)
+        rate = _rate_over(calibration, min(seconds, CALIBRATION_MAX_SECONDS)) if calibration else None
+        if seconds < best:
+            best, best_calibration = seconds, rate
+
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {"seconds": best, "throughput": items / best, "peak_memory_mb": peak / 1024 / 1024}
+    if best_calibration:
+        result["calibration"] = best_calibration
+    return result
+
+
+def min_throughput(result: dict[str, float], limits: dict[str, float]) -> float:
+    """The throughput limit of a benchmark, scaled to the speed of this machine."""
+    limit = limits.get("min_throughput", 0)
+    if result.get("calibration") and limits.get("calibration"):
+        limit *= result["calibration"] / limits["calibration"]
+    return limit
+
+
+def check(name: str, result: dict[str, float], limits: dict[str, float] | None) -> list[str]:
+    """Returns the regressions of one benchmark against its limits."""
+    if not limits:
+        return []
+    problems = []
+    limit = min_throughput(result, limits)
+    if result["throughput"] < limit:
+        problems.append(f"{name}: throughput {result['throughput']:,.0f}/s is below the minimum of {limit:,.0f}/s"
+                        " for this machine")
+    if result["peak_memory_mb"] > limits.get("max_peak_memory_mb", float("inf")):
+        problems.append(f"{name}: peak memory {result['peak_memory_mb']:.1f} MB is above the maximum of {limits['max_peak_memory_mb']:.1f} MB")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the VortexFlow benchmark suite.")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (the best one counts).")
+    parser.add_argument("--update-thresholds", action="store_true",
+                        help="Write new limits to thresholds.json from this run instead of checking. "
+                             "They are stored with this machine's calibration, so they hold on other machines too.")
+    parser.add_argument("--margin", type=float, default=0.4,
+                        help="Headroom for --update-thresholds (0.4 = fail below 60%% of today's throughput "
+                             "or above 140%% of today's peak memory).")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # Keep "Session saved" and similar messages out of the report.
+
+    try:
+        with open(THRESHOLDS_FILE, "r", encoding="utf-8") as f:
+            thresholds = json.load(f)
+    except FileNotFoundError:
+        thresholds = {}
+
+    selected = {name: setup for name, setup in BENCHMARKS.items() if not args.only or args.only in name}
+    results = {}
+    print(f"{'benchmark':<24} {'time':>9} {'throughput':>22} {'peak memory':>12}")
+    for name, setup in selected.items():
+        with tempfile.TemporaryDirectory(prefix="vortexflow_bench_") as directory, isolated_app_data(directory):
+            items, unit, prepare = setup(directory)
+            calibration = BENCHMARK_CALIBRATION.get(name)
+            result = measure(prepare, items, max(1, args.repeat),
+                             CALIBRATIONS[calibration](directory) if calibration else None)
+        results[name] = result
+        print(f"{name:<24} {result['seconds']:8.3f}s {result['throughput']:>14,.0f} {unit + '/s':<9}"
+              f" {result['peak_memory_mb']:9.1f} MB")
+
+    if args.update_thresholds:
+        for name, result in results.items():
+            thresholds[name] = {
+                "min_throughput": round(result["throughput"] * (1 - args.margin)),
+                "max_peak_memory_mb": round(result["peak_memory_mb"] * (1 + args.margin) + 1, 1),
+            }
+            if "calibration" in result:
+                thresholds[name]["calibration"] = round(result["calibration"])
+        with open(THRESHOLDS_FILE, "w", encoding="utf-8") as f:
+            json.dump(thresholds, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"\nThresholds written to {THRESHOLDS_FILE}.")
+        return
+
+    problems = [problem for name, result in results.items() for problem in check(name, result, thresholds.get(name))]
+    if problems:
+        print("\nREGRESSIONS:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\nAll benchmarks are within their thresholds.")
+
+
+if __name__ == "__main__":
+    main()
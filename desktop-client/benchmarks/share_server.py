@@ -0,0 +1,125 @@
+# benchmarks/share_server.py
+# A local stand-in for the TeraBox share info API (/api/shorturlinfo), for benchmarking and
+# trying out the share prefetch without touching the real mirrors. Point the client at it with
+# the VORTEXFLOW_SHARE_API environment variable (see SHARE_METADATA_API in core/config.py).
+#
+# Usage (from the desktop-client folder):
+#     python benchmarks/share_server.py --port 8765 --shares 1000 --dead-rate 0.1 --latency 0.05
+#     # prints the links it serves, one per line
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Make the "core" package importable when this file is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.export_generator import LinkFactory
+
+
+class ShareServer(ThreadingHTTPServer):
+    """
+    Answers share info requests from a table of shares.
+
+    `shares` maps a share ID (e.g. "1AbCdEf") to the list of its files, each a dict with
+    "server_filename", "size" and "isdir", or to None for a deleted share. Unknown IDs are
+    answered as deleted too. Every answer is delayed by `latency` seconds, like a real mirror.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, shares: dict[str, list[dict] | None], port: int = 0, latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), _ShareHandler)
+        self.shares = shares
+        self.latency = latency
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "ShareServer":
+        """Serves requests from a background thread until shutdown() is called."""
+        threading.Thread(target=self.serve_forever, name="ShareServer", daemon=True).start()
+        return self
+
+
+class _ShareHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API, so pooled connections get reused.
+    disable_nagle_algorithm = True  # Otherwise delayed ACKs add ~40 ms to every keep-alive answer.
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path != "/api/shorturlinfo":
+            self.send_error(404)
+            return
+        with self.server._count_lock:
+            self.server.requests_served += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        share_id = parse_qs(parts.query).get("shorturl", [""])[0]
+        files = self.server.shares.get(share_id)
+        if files is None:
+            answer = {"errno": -9, "errmsg": "share not found"}
+        else:
+            answer = {"errno": 0, "list": files}
+        body = json.dumps(answer).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def generate_shares(count: int, dead_rate: float = 0.1, seed: int = 1) -> tuple[list[str], dict[str, list[dict] | None]]:
+    """
+    Makes up `count` TeraBox links and the share table to serve for them.
+
+    Returns:
+        tuple: (the links, the `shares` table for ShareServer). Sizes range from 1 MB to 4 GB.
+    """
+    rng = random.Random(seed)
+    factory = LinkFactory(rng, terabox_ratio=1.0, duplicate_rate=0.0)
+    links = [factory.next_link() for _ in range(count)]
+    shares = {}
+    for share_id in factory.share_ids:
+        if rng.random() < dead_rate:
+            shares[share_id] = None
+        else:
+            size = int(1024 * 1024 * 4096 ** rng.random())
+            shares[share_id] = [{"server_filename": f"video_{share_id[-6:]}.mp4", "size": str(size), "isdir": "0"}]
+    return links, shares
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stand-in TeraBox share info API.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--shares", type=int, default=1000, help="Number of shares to serve.")
+    parser.add_argument("--dead-rate", type=float, default=0.1, help="Share of deleted shares (0-1).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every answer is delayed by.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = parser.parse_args()
+
+    links, shares = generate_shares(args.shares, args.dead_rate, args.seed)
+    server = ShareServer(shares, args.port, args.latency)
+    print("\n".join(links))
+    print(f"Serving {len(shares)} shares at {server.base_url} (set VORTEXFLOW_SHARE_API={server.base_url}).",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
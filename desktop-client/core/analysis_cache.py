@@ -0,0 +1,290 @@
+# core/analysis_cache.py
+# This module keeps an on-disk index of already-analyzed export files, so that pressing
+# Analyze again only parses the files (or the trailing messages of a file) that changed.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from .config import ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_BYTES, LINK_CATEGORY_RULES
+
+# Bump this whenever the layout of a cached scan changes, so old entries are ignored.
+# 2: entries record the extractor that scanned the file (see analyzer.get_extractor).
+CACHE_FORMAT_VERSION = 2
+INDEX_FILE = os.path.join(ANALYSIS_CACHE_DIR, "index.json")
+
+# Every Telegram message (regular or service) starts with this tag. An appended export keeps
+# everything before its last message unchanged, so this is where re-analysis can resume.
+_MESSAGE_START_MARKER = b'<div class="message '
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Cached scans depend on how links are categorized, so they are only valid for the same rules.
+_RULES_KEY = hashlib.blake2b(json.dumps(LINK_CATEGORY_RULES, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+_index_lock = threading.Lock()
+
+
+# --- Index Persistence ---
+
+def _load_index() -> dict[str, Any]:
+    """Loads the cache index, or returns an empty one if it is missing, corrupt or outdated."""
+    try:
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == CACHE_FORMAT_VERSION and index.get("rules") == _RULES_KEY:
+            return index
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, OSError) as e:
+        logging.error(f"Error loading analysis cache index: {e}")
+    return {"version": CACHE_FORMAT_VERSION, "rules": _RULES_KEY, "entries": {}}
+
+def _save_index(index: dict[str, Any]) -> None:
+    """Atomically replaces the cache index on disk."""
+    os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+    temp_path = INDEX_FILE + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(temp_path, INDEX_FILE)
+
+def _entry_key(file_path: str) -> str:
+    return os.path.normcase(os.path.abspath(file_path))
+
+def _scan_path(file_path: str) -> str:
+    digest = hashlib.blake2b(_entry_key(file_path).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(ANALYSIS_CACHE_DIR, f"{digest}.json")
+
+def _remove_entry(index: dict[str, Any], key: str) -> None:
+    entry = index["entries"].pop(key, None)
+    if entry:
+        try:
+            os.remove(os.path.join(ANALYSIS_CACHE_DIR, entry["scan_file"]))
+        except OSError:
+            pass
+
+
+# --- Fingerprinting ---
+
+def _hash_file(file_path: str, prefix_length: int | None = None) -> tuple[str, str | None]:
+    """
+    Hashes a whole file in one streaming pass.
+
+    Args:
+        file_path (str): The file to hash.
+        prefix_length (int | None): If given, also return the hash of the first prefix_length bytes.
+
+    Returns:
+        tuple[str, str | None]: The hash of the whole file and the hash of the prefix.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    prefix_hash = None
+    remaining = prefix_length
+    with open(file_path, "rb") as f:
+        while True:
+            if remaining is not None and remaining <= 0:
+                prefix_hash = hasher.copy().hexdigest()
+                remaining = None
+            read_size = _HASH_CHUNK_SIZE if remaining is None else min(_HASH_CHUNK_SIZE, remaining)
+            chunk = f.read(read_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    if remaining is not None:
+        # The file is shorter than the requested prefix.
+        prefix_hash = None
+    return hasher.hexdigest(), prefix_hash
+
+def _hash_prefix(file_path: str, length: int) -> str | None:
+    """Returns the hash of the first `length` bytes of a file, or None if it is shorter."""
+    hasher = hashlib.blake2b(digest_size=16)
+    remaining = length
+    with open(file_path, "rb") as f:
+        while remaining > 0:
+            chunk = f.read(min(_HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                return None
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher.hexdigest()
+
+def find_resume_offset(file_path: str) -> int | None:
+    """
+    Finds the byte offset where the last message of an HTML export starts.
+
+    Args:
+        file_path (str): Path to a Telegram HTML export.
+
+    Returns:
+        int | None: The offset of the last message tag, or None if the file has no messages.
+    """
+    with open(file_path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        # Read backwards in overlapping windows so a marker split across two reads is still found.
+        window = _HASH_CHUNK_SIZE
+        position = end
+        while position > 0:
+            start = max(0, position - window)
+            f.seek(start)
+            data = f.read(min(end, position + len(_MESSAGE_START_MARKER)) - start)
+            found = data.rfind(_MESSAGE_START_MARKER)
+            if found != -1:
+                return start + found
+            position = start
+    return None
+
+
+# --- Public API ---
+
+def load_cached_scan(file_path: str, extractor: str) -> dict[str, Any] | None:
+    """
+    Looks up the cached scan of an export file.
+
+    Args:
+        file_path (str): Path to the export file.
+        extractor (str): The name of the extractor that would scan the file now. A scan made by
+            another extractor (e.g. before the file's format was supported) is not used.
+
+    Returns:
+        dict | None: None if the file must be scanned from scratch. Otherwise a dictionary with
+            "scan" (the cached scan) and "resume_offset"/"resume_index". When "resume_offset" is None
+            the cached scan is complete; otherwise the file was appended to, "scan" holds only the
+            records before "resume_index", and the file must be scanned again from "resume_offset".
+    """
+    key = _entry_key(file_path)
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+
+    with _index_lock:
+        index = _load_index()
+        entry = index["entries"].get(key)
+        if entry is None:
+            return None
+        if entry.get("extractor") != extractor:
+            _remove_entry(index, key)
+            _save_index(index)
+            return None
+
+        resume_offset = None
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            # The file was touched. It is still a hit if the content is unchanged, and it can be
+            # resumed if everything before its last message is unchanged (the export was appended to).
+            resume = entry.get("resume")
+            try:
+                if resume and stat.st_size > entry["size"] and _hash_prefix(file_path, resume["offset"]) == resume["prefix_hash"]:
+                    resume_offset = resume["offset"]
+                elif stat.st_size == entry["size"] and _hash_file(file_path)[0] == entry["hash"]:
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                else:
+                    _remove_entry(index, key)
+                    _save_index(index)
+                    return None
+            except OSError:
+                return None
+
+        try:
+            with open(os.path.join(ANALYSIS_CACHE_DIR, entry["scan_file"]), "r", encoding="utf-8") as f:
+                scan = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.error(f"Error loading cached analysis of {os.path.basename(file_path)}: {e}")
+            _remove_entry(index, key)
+            _save_index(index)
+            return None
+
+        entry["last_used"] = time.time()
+        _save_index(index)
+
+    if resume_offset is None:
+        return {"scan": scan, "resume_offset": None, "resume_index": None}
+
+    resume_index = entry["resume"]["index"]
+    scan["records"] = [record for record in scan["records"] if record["index"] < resume_index]
+    scan["message_count"] = resume_index
+    return {"scan": scan, "resume_offset": resume_offset, "resume_index": resume_index}
+
+def store_scan(file_path: str, scan: dict[str, Any], extractor: str, resume_offset: int | None = None,
+               resume_index: int | None = None) -> None:
+    """
+    Stores the complete scan of an export file and evicts old entries if the cache is too big.
+
+    Args:
+        file_path (str): Path to the export file.
+        scan (dict): The scan produced by the analyzer for the whole file.
+        extractor (str): The name of the extractor that produced the scan.
+        resume_offset (int | None): Byte offset of the file's last message, if it can be resumed from there.
+        resume_index (int | None): Index of the first message block at or after resume_offset.
+    """
+    key = _entry_key(file_path)
+    try:
+        stat = os.stat(file_path)
+        file_hash, prefix_hash = _hash_file(file_path, resume_offset)
+        if os.stat(file_path).st_mtime_ns != stat.st_mtime_ns:
+            return  # The file changed while we were reading it; don't cache a mismatched scan.
+
+        os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+        scan_path = _scan_path(file_path)
+        with open(scan_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(scan, f, separators=(",", ":"))
+        os.replace(scan_path + ".tmp", scan_path)
+        scan_size = os.path.getsize(scan_path)
+    except OSError as e:
+        logging.error(f"Error caching analysis of {os.path.basename(file_path)}: {e}")
+        return
+
+    resume = None
+    if resume_offset is not None and resume_index is not None and prefix_hash is not None:
+        resume = {"offset": resume_offset, "index": resume_index, "prefix_hash": prefix_hash}
+
+    with _index_lock:
+        index = _load_index()
+        index["entries"][key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash,
+            "extractor": extractor,
+            "resume": resume,
+            "scan_file": os.path.basename(scan_path),
+            "bytes": scan_size,
+            "last_used": time.time(),
+        }
+        _evict(index, ANALYSIS_CACHE_MAX_BYTES)
+        try:
+            _save_index(index)
+        except OSError as e:
+            logging.error(f"Error saving analysis cache index: {e}")
+
+def _evict(index: dict[str, Any], max_bytes: int) -> None:
+    """Drops entries for deleted files, then least-recently-used entries until the cache fits."""
+    for key in [k for k in index["entries"] if not os.path.exists(k)]:
+        _remove_entry(index, key)
+
+    total = sum(entry["bytes"] for entry in index["entries"].values())
+    for key, entry in sorted(index["entries"].items(), key=lambda item: item[1]["last_used"]):
+        if total <= max_bytes:
+            break
+        total -= entry["bytes"]
+        _remove_entry(index, key)
+
+def invalidate(file_path: str | None = None) -> None:
+    """
+    Removes cached analysis results.
+
+    Args:
+        file_path (str | None): The export file to forget, or None to clear the whole cache.
+    """
+    with _index_lock:
+        index = _load_index()
+        keys = list(index["entries"]) if file_path is None else [_entry_key(file_path)]
+        for key in keys:
+            _remove_entry(index, key)
+        try:
+            _save_index(index)
+        except OSError as e:
+            logging.error(f"Error saving analysis cache index: {e}")
@@ -0,0 +1,207 @@
+# core/analysis_results.py
+# This module keeps analysis results in the client and hands the UI a small handle instead of
+# the full result. The UI gets the summary counts right away and then fetches pages of links and
+# jobs, filtered and sorted here, so neither the websocket nor the browser ever holds everything.
+
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any
+
+from .config import ANALYSIS_RESULTS_KEPT, ANALYSIS_PAGE_MAX_SIZE
+from .link_classifier import classify_many
+
+LINKS = "links"
+JOBS = "jobs"
+
+# Fields each kind of page can be filtered and sorted by.
+_LINK_FILTERS = ("category",)
+_JOB_FILTERS = ("source_file", "type")
+_LINK_SORTS = ("link", "category")
+_JOB_SORTS = ("folder_name", "source_file", "type", "link_count")
+# Filtered and sorted views remembered per result, so paging through one costs only the page.
+_VIEWS_PER_RESULT = 8
+# Counts copied from the analyzer's result into the summary.
+_COUNT_KEYS = ("raw_count", "banned_count", "duplicate_count", "terabox_count", "seen_elsewhere_count")
+
+
+class _Result:
+    def __init__(self, result: dict):
+        self.links: list[str] = result["unique_links"]
+        self.categories: list[str] = classify_many(self.links)
+        self.jobs: list[dict] = result["download_jobs"]
+        self.counts = {key: result.get(key, 0) for key in _COUNT_KEYS}
+        self.views: OrderedDict[tuple, list[int]] = OrderedDict()
+
+
+class AnalysisResultStore:
+    """
+    Holds the most recent analysis results, each under an opaque handle.
+
+    Pages are computed on request: the matching items are filtered and sorted once per distinct
+    query, remembered, and sliced for every page after that.
+    """
+
+    def __init__(self, max_results: int = ANALYSIS_RESULTS_KEPT, max_page_size: int = ANALYSIS_PAGE_MAX_SIZE):
+        """
+        Args:
+            max_results (int): How many results are kept; adding one more releases the oldest.
+            max_page_size (int): The largest page a caller can ask for.
+        """
+        self.max_results = max(1, max_results)
+        self.max_page_size = max(1, max_page_size)
+        self._lock = threading.Lock()
+        self._results: OrderedDict[str, _Result] = OrderedDict()
+
+    def add(self, result: dict) -> dict[str, Any]:
+        """
+        Stores the result of analyze_html_files() and returns its summary.
+
+        Returns:
+            dict: The summary (see summary()), including the new result's "handle".
+        """
+        handle = uuid.uuid4().hex
+        stored = _Result(result)
+        with self._lock:
+            self._results[handle] = stored
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return self._summarize(handle, stored)
+
+    def summary(self, handle: str) -> dict[str, Any] | None:
+        """
+        Returns the counts of a result, or None if the handle is unknown or was released.
+
+        The summary holds the analyzer's counts ("raw_count", "banned_count", "duplicate_count",
+        "terabox_count", "seen_elsewhere_count"), "link_count" and "job_count", and the number of
+        links per category ("categories") and of jobs per source file ("source_files") and type
+        ("types"), which is what the UI needs to build its filters.
+        """
+        stored = self._get(handle)
+        return None if stored is None else self._summarize(handle, stored)
+
+    def page(self, handle: str, kind: str = JOBS, offset: int = 0, limit: int = 100,
+             filters: dict | None = None, sort_by: str | None = None, descending: bool = False,
+             search: str | None = "") -> dict[str, Any] | None:
+        """
+        Returns one page of the links or jobs of a result.
+
+        Args:
+            handle (str): The handle returned by add().
+            kind (str): LINKS or JOBS.
+            offset (int): Index of the first matching item to return.
+            limit (int): Maximum number of items (capped at max_page_size).
+            filters (dict | None): Exact-match filters: "category" for links, "source_file" and
+                "type" for jobs. Unknown fields are ignored.
+            sort_by (str | None): "link" or "category" for links; "folder_name", "source_file",
+                "type" or "link_count" for jobs. None keeps the analysis order.
+            descending (bool): Reverse the sort order.
+            search (str | None): Only items containing this text (in the link, or the job's folder
+                name or links), ignoring case. Empty or None matches everything.
+
+        Returns:
+            dict | None: {"handle", "kind", "total" (matching items), "offset", "items"}, or None
+                if the handle is unknown. Links are {"id", "link", "category"}; jobs are the job
+                dicts plus "id" (their position in the result) and "link_count".
+        """
+        stored = self._get(handle)
+        if stored is None:
+            return None
+        if kind not in (LINKS, JOBS):
+            raise ValueError(f"Unknown page kind '{kind}'")
+        allowed = _LINK_FILTERS if kind == LINKS else _JOB_FILTERS
+        active = tuple(sorted((name, value) for name, value in (filters or {}).items()
+                              if name in allowed and value not in (None, "")))
+        if sort_by not in (_LINK_SORTS if kind == LINKS else _JOB_SORTS):
+            sort_by = None
+        key = (kind, active, sort_by, bool(descending), (search or "").lower())
+
+        with self._lock:
+            view = stored.views.get(key)
+            if view is not None:
+                stored.views.move_to_end(key)
+        if view is None:
+            view = self._build_view(stored, *key)
+            with self._lock:
+                stored.views[key] = view
+                while len(stored.views) > _VIEWS_PER_RESULT:
+                    stored.views.popitem(last=False)
+
+        offset = max(0, offset)
+        ids = view[offset:offset + max(0, min(limit, self.max_page_size))]
+        if kind == LINKS:
+            items = [{"id": n, "link": stored.links[n], "category": stored.categories[n]} for n in ids]
+        else:
+            items = [dict(stored.jobs[n], id=n, link_count=len(stored.jobs[n].get('links', []))) for n in ids]
+        return {"handle": handle, "kind": kind, "total": len(view), "offset": offset, "items": items}
+
+    def jobs(self, handle: str, job_ids: list[int] | None = None) -> list[dict] | None:
+        """
+        Returns the download jobs of a result: all of them, or those with the given ids.
+
+        Returns:
+            list[dict] | None: The jobs, or None if the handle is unknown.
+        """
+        stored = self._get(handle)
+        if stored is None:
+            return None
+        if job_ids is None:
+            return list(stored.jobs)
+        return [stored.jobs[n] for n in job_ids if 0 <= n < len(stored.jobs)]
+
+    def release(self, handle: str) -> None:
+        """Forgets a result, e.g. when the UI starts a new analysis or is closed."""
+        with self._lock:
+            self._results.pop(handle, None)
+
+    # --- Internals ---
+
+    def _get(self, handle: str) -> _Result | None:
+        with self._lock:
+            stored = self._results.get(handle)
+            if stored is not None:
+                self._results.move_to_end(handle)
+            return stored
+
+    def _summarize(self, handle: str, stored: _Result) -> dict[str, Any]:
+        return dict(
+            stored.counts,
+            handle=handle,
+            link_count=len(stored.links),
+            job_count=len(stored.jobs),
+            categories=dict(Counter(stored.categories).most_common()),
+            source_files=dict(Counter(job.get('source_file') for job in stored.jobs)),
+            types=dict(Counter(job.get('type') for job in stored.jobs)),
+        )
+
+    @staticmethod
+    def _build_view(stored: _Result, kind: str, filters: tuple, sort_by: str | None, descending: bool,
+                    search: str) -> list[int]:
+        """Returns the positions of the matching items, in the requested order."""
+        if kind == LINKS:
+            def field(n, name):
+                return stored.categories[n] if name == "category" else stored.links[n]
+
+            def matches_search(n):
+                return search in stored.links[n].lower()
+            count = len(stored.links)
+        else:
+            def field(n, name):
+                job = stored.jobs[n]
+                return len(job.get('links', [])) if name == "link_count" else job.get(name) or ""
+
+            def matches_search(n):
+                job = stored.jobs[n]
+                return search in job.get('folder_name', "").lower() or any(search in link.lower() for link in job.get('links', []))
+            count = len(stored.jobs)
+
+        ids = [n for n in range(count)
+               if all(field(n, name) == value for name, value in filters) and (not search or matches_search(n))]
+        if sort_by is not None:
+            # Stable, so items that compare equal keep the analysis order.
+            ids.sort(key=lambda n: field(n, sort_by), reverse=descending)
+        return ids
+
+
+# The results of this process's analyses.
+analysis_results = AnalysisResultStore()
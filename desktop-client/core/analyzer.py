@@ -1,13 +1,34 @@
 # core/analyzer.py
-# This module contains all the logic for parsing HTML files and analyzing links.
+# This module contains all the logic for parsing export files (HTML or JSON) and analyzing links.
 
+import abc
+import io
+import json
 import os
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import Any, Iterator
+from lxml import etree
 
 # We will assume these are correctly imported from your other modules
-from .config import TERABOX_DOMAINS
+from .config import ANALYZER_STREAMING, ANALYZER_READ_CHUNK_SIZE, ANALYZER_MAX_WORKERS, ANALYSIS_CACHE_ENABLED, LINK_REGISTRY_ENABLED
+from . import analysis_cache
 from .session_manager import load_banned_links
+from .link_classifier import classify_link, classify_many
+from .share_links import canonical_link_key
+from . import registry_client
+from .metrics import metrics
+
+# A message block is represented as the list of (href, link text) pairs of its <a href> tags,
+# in document order. Both parser modes below produce exactly the same blocks, and the JSON
+# extractor produces the blocks the HTML export of the same chat would have.
+MessageAnchors = list[tuple[str, str]]
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
 
 def _categorize_link(url: str) -> str:
     """
@@ -19,107 +40,624 @@ def _categorize_link(url: str) -> str:
     Returns:
         str: The category of the URL (e.g., "TeraBox", "Telegram", or the domain name).
     """
+    return classify_link(url)
+
+def _is_message_div(element) -> bool:
+    """Returns True if an lxml element is a Telegram message body (<div class="text">)."""
+    return element.tag == "div" and "text" in (element.get("class") or "").split()
+
+def _open_export(file_path: str, start_offset: int = 0) -> io.TextIOWrapper:
+    """Opens an export as text, positioned at a byte offset (which must be at a tag boundary)."""
+    raw = open(file_path, "rb")
+    raw.seek(start_offset)
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="ignore")
+
+def _iter_messages_soup(file_path: str, start_offset: int = 0) -> Iterator[MessageAnchors]:
+    """
+    Yields the anchors of every message block by building the full BeautifulSoup tree.
+    This is the original, in-memory parser mode.
+
+    Args:
+        file_path (str): Path to a Telegram HTML export.
+        start_offset (int): Byte offset of the message to start from.
+
+    Yields:
+        MessageAnchors: The (href, text) pairs of one <div class="text"> block.
+    """
+    from bs4 import BeautifulSoup  # Only this mode needs bs4, which is slow to import.
+    with _open_export(file_path, start_offset) as f:
+        soup = BeautifulSoup(f.read(), "lxml")
+
+    # Find all message containers in the Telegram export
+    for message in soup.find_all('div', class_='text'):
+        yield [(a['href'], a.text) for a in message.find_all('a', href=True)]
+
+def _iter_messages_streaming(file_path: str, start_offset: int = 0) -> Iterator[MessageAnchors]:
+    """
+    Yields the anchors of every message block using incremental lxml parsing.
+
+    The file is fed to the parser in fixed-size chunks and every element is cleared
+    as soon as it has been processed, so peak memory stays flat regardless of file size.
+
+    Args:
+        file_path (str): Path to a Telegram HTML export.
+        start_offset (int): Byte offset of the message to start from.
+
+    Yields:
+        MessageAnchors: The (href, text) pairs of one <div class="text"> block.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    open_messages = 0   # How many <div class="text"> blocks we are currently inside
+    started = 0         # Start-order counter, so nested blocks come out in document order
+    start_order = {}
+    pending = []
+
+    with _open_export(file_path, start_offset) as f:
+        while True:
+            chunk = f.read(ANALYZER_READ_CHUNK_SIZE)
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+
+            for event, element in parser.read_events():
+                if event == "start":
+                    if _is_message_div(element):
+                        start_order[element] = started
+                        started += 1
+                        open_messages += 1
+                    continue
+
+                if _is_message_div(element):
+                    anchors = [
+                        (a.get("href"), "".join(a.itertext()))
+                        for a in element.iter("a") if a.get("href") is not None
+                    ]
+                    pending.append((start_order.pop(element), anchors))
+                    open_messages -= 1
+
+                if open_messages == 0:
+                    if pending:
+                        pending.sort(key=lambda item: item[0])
+                        for _, anchors in pending:
+                            yield anchors
+                        pending.clear()
+                    # Nothing outside a message block is needed again: drop the element
+                    # and everything before it so the tree never grows.
+                    element.clear()
+                    parent = element.getparent()
+                    while parent is not None and element.getprevious() is not None:
+                        del parent[0]
+
+            if not chunk:
+                break
+
+# --- JSON Exports ---
+
+class _JsonStream:
+    """Reads the JSON values of a file one at a time, holding little more than the current value in memory."""
+
+    def __init__(self, f):
+        self._f = f
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read_more(self, size: int) -> bool:
+        chunk = self._f.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character ("" at the end of the file)."""
+        while True:
+            self._pos = _JSON_WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_more(ANALYZER_READ_CHUNK_SIZE):
+                return ""
+
+    def take(self, expected: str) -> None:
+        """Consumes one structural character (e.g. "{" or ":")."""
+        if self.peek() != expected:
+            raise ValueError(f"Malformed JSON export: expected '{expected}' at character {self._pos}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decodes the next complete value."""
+        self.peek()
+        read_size = ANALYZER_READ_CHUNK_SIZE
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self._buffer, self._pos)
+                # A number ending exactly at the end of the buffer may continue in the next chunk.
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Double the read size, so a huge value is not decoded again for every chunk.
+            self._read_more(read_size)
+            read_size *= 2
+
+def _iter_json_export(file_path: str, streaming: bool = ANALYZER_STREAMING) -> Iterator[tuple[str, Any]]:
+    """
+    Yields ("name", chat name) and ("message", message dict) from a Telegram result.json, in file order.
+
+    In streaming mode only the "messages" array is walked element by element, so memory stays flat
+    however big the export is. Otherwise the whole file is loaded with json.load().
+    """
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        if not streaming:
+            for key, value in json.load(f).items():
+                if key == "name":
+                    yield "name", value
+                elif key == "messages":
+                    for message in value:
+                        yield "message", message
+            return
+
+        stream = _JsonStream(f)
+        stream.take("{")
+        while stream.peek() != "}":
+            if stream.peek() == ",":
+                stream.take(",")
+                continue
+            key = stream.value()
+            stream.take(":")
+            if key == "messages" and stream.peek() == "[":
+                stream.take("[")
+                while stream.peek() != "]":
+                    if stream.peek() == ",":
+                        stream.take(",")
+                    elif stream.peek() == "":
+                        raise ValueError("Malformed JSON export: the file ends inside the message list")
+                    else:
+                        yield "message", stream.value()
+                stream.take("]")
+            else:
+                value = stream.value()
+                if key == "name":
+                    yield "name", value
+
+def _json_message_anchors(message: Any) -> MessageAnchors | None:
+    """
+    Returns the anchors the HTML export would write for a result.json message, or None if the
+    HTML export would have no <div class="text"> block for it (service messages and messages
+    without text).
+    """
+    if not isinstance(message, dict) or message.get("type", "message") != "message":
+        return None
+    entities = message.get("text_entities")
+    if entities is None:
+        # Older exports only have "text": a string, or a list of strings and entity dicts.
+        text = message.get("text", "")
+        parts = [text] if isinstance(text, str) else text
+        entities = [part if isinstance(part, dict) else {"type": "plain", "text": part} for part in parts]
+    if not any(entity.get("text") for entity in entities):
+        return None
+
+    anchors = []
+    for entity in entities:
+        kind, text = entity.get("type"), entity.get("text", "")
+        if kind == "link":
+            anchors.append((text, text))
+        elif kind == "text_link":
+            anchors.append((entity.get("href", ""), text))
+        elif kind == "email":
+            anchors.append((f"mailto:{text}", text))
+        elif kind == "mention":
+            anchors.append((f"https://t.me/{text.lstrip('@')}", text))
+    return anchors
+
+def _iter_messages_json(file_path: str, streaming: bool = ANALYZER_STREAMING) -> Iterator[MessageAnchors]:
+    """
+    Yields the message blocks of a Telegram result.json, numbered like those of a single messages.html.
+
+    Args:
+        file_path (str): Path to a Telegram JSON export.
+        streaming (bool): Walk the messages incrementally instead of loading the whole file.
+
+    Yields:
+        MessageAnchors: The (href, text) pairs of one message block, in file order.
+    """
+    for kind, value in _iter_json_export(file_path, streaming):
+        if kind == "name":
+            # The HTML export shows the chat name in a <div class="text bold"> page header, which
+            # counts as a message block; mirroring it keeps the folder names of both formats the same.
+            yield []
+            continue
+        anchors = _json_message_anchors(value)
+        if anchors is not None:
+            yield anchors
+
+
+# --- Export Extractors ---
+# An extractor reads the message blocks of one export format. Telegram's HTML and JSON exports
+# are built in; register_extractor() adds others. Extractors are looked up again inside the
+# analysis worker processes, so register them when your module is imported.
+
+class ExportExtractor(abc.ABC):
+    """
+    Reads the message blocks of one export format.
+
+    Subclasses set `name` and `extensions` and implement iter_messages(). `resumable` extractors
+    can start at the offset found by analysis_cache.find_resume_offset(), so an export that was
+    appended to is only parsed from its last message onwards.
+    """
+
+    name = ""
+    extensions: tuple[str, ...] = ()
+    resumable = False
+
+    def sniff(self, head: bytes) -> bool:
+        """Returns True if a file starting with `head` is in this format (used for unknown extensions)."""
+        return False
+
+    @abc.abstractmethod
+    def iter_messages(self, file_path: str, streaming: bool, start_offset: int = 0) -> Iterator[MessageAnchors]:
+        """Yields the anchors of every message block, starting at byte `start_offset` if resumable."""
+
+class HtmlExtractor(ExportExtractor):
+    """Telegram Desktop's HTML export (messages.html, messages2.html, ...)."""
+
+    name = "html"
+    extensions = (".html", ".htm")
+    resumable = True
+
+    def sniff(self, head: bytes) -> bool:
+        return head.lstrip().startswith(b"<")
+
+    def iter_messages(self, file_path: str, streaming: bool, start_offset: int = 0) -> Iterator[MessageAnchors]:
+        if streaming:
+            return _iter_messages_streaming(file_path, start_offset)
+        return _iter_messages_soup(file_path, start_offset)
+
+class JsonExtractor(ExportExtractor):
+    """Telegram Desktop's machine-readable export (result.json)."""
+
+    name = "json"
+    extensions = (".json",)
+
+    def sniff(self, head: bytes) -> bool:
+        return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"{")
+
+    def iter_messages(self, file_path: str, streaming: bool, start_offset: int = 0) -> Iterator[MessageAnchors]:
+        return _iter_messages_json(file_path, streaming)
+
+_HTML_EXTRACTOR = HtmlExtractor()  # Also used for files no extractor recognizes, as before JSON support.
+_EXTRACTORS: list[ExportExtractor] = [_HTML_EXTRACTOR, JsonExtractor()]
+
+def register_extractor(extractor: ExportExtractor) -> None:
+    """Adds an export format. It takes precedence over the formats registered before it."""
+    _EXTRACTORS.insert(0, extractor)
+
+def get_extractor(file_path: str) -> ExportExtractor:
+    """
+    Picks the extractor for a file: by extension, else by its first bytes, else HTML.
+
+    Args:
+        file_path (str): Path to an export file.
+
+    Returns:
+        ExportExtractor: The extractor to read the file with.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    for extractor in _EXTRACTORS:
+        if extension in extractor.extensions:
+            return extractor
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(64)
+    except OSError:
+        head = b""
+    for extractor in _EXTRACTORS:
+        if extractor.sniff(head):
+            return extractor
+    return _HTML_EXTRACTOR
+
+def iter_message_anchors(file_path: str, streaming: bool = ANALYZER_STREAMING, start_offset: int = 0) -> Iterator[MessageAnchors]:
+    """
+    Yields the anchors of every message block of a Telegram export (HTML or JSON).
+
+    Args:
+        file_path (str): Path to a Telegram export file.
+        streaming (bool): Use the bounded-memory incremental parser instead of loading the whole file.
+        start_offset (int): Byte offset of the message to start from (0 for the whole file).
+
+    Yields:
+        MessageAnchors: The (href, text) pairs of one message block, in document order.
+    """
+    return get_extractor(file_path).iter_messages(file_path, streaming, start_offset)
+
+def _scan_file(file_path: str, streaming: bool = ANALYZER_STREAMING, start_offset: int = 0, start_index: int = 0) -> dict:
+    """
+    Extracts the per-message link data of a single export file.
+
+    This is the expensive, file-local part of the analysis. It does not depend on the
+    banned list or on other files, so it can safely run in a separate worker process.
+
+    Args:
+        file_path (str): Path to a Telegram export file (HTML or JSON).
+        streaming (bool): Use the bounded-memory incremental parser.
+        start_offset (int): Byte offset of the message to start from (0 for the whole file).
+        start_index (int): Index of the first message block found at start_offset.
+
+    Returns:
+        dict: The scan, with keys "records", "message_count" (number of message blocks) and
+            "complete" (False if the file could not be read to the end). There is one record
+            per message that contains links, with keys "index" (position among all message
+            blocks), "links" (every href in order), "terabox" (the sorted, unique TeraBox links)
+            and "titles" (the text of the first <a> tag for each TeraBox link). "timings" holds the
+            seconds spent parsing and classifying.
+    """
+    records = []
+    message_count = 0
+    complete = False
+    started = time.perf_counter()
+    classify_seconds = 0.0
     try:
-        domain = urlparse(url).netloc.replace("www.", "")
-        if any(d in domain for d in TERABOX_DOMAINS):
-            return "TeraBox"
-        if "t.me" in domain or "telegram" in domain:
-            return "Telegram"
-        # Add any other special domains here
-        return domain if domain else "Other"
-    except (ValueError, AttributeError):
-        return "Invalid URL"
-
-def analyze_html_files(file_paths: list[str]) -> dict:
-    """
-    Parses a list of HTML files, extracts all links, filters them,
+        for i, anchors in enumerate(iter_message_anchors(file_path, streaming, start_offset), start_index):
+            message_count += 1
+            links_in_message = [href for href, _ in anchors]
+            if not links_in_message:
+                continue
+
+            classify_started = time.perf_counter()
+            categories = classify_many(links_in_message)
+            terabox_links = sorted(set(link for link, category in zip(links_in_message, categories) if category == 'TeraBox'))
+            titles = {}
+            for href, text in anchors:
+                if href in terabox_links and href not in titles:
+                    titles[href] = text
+            classify_seconds += time.perf_counter() - classify_started
+
+            records.append({"index": i, "links": links_in_message, "terabox": terabox_links, "titles": titles})
+        complete = True
+    except Exception as e:
+        print(f"Error processing {os.path.basename(file_path)}: {e}")
+    parse_seconds = time.perf_counter() - started - classify_seconds
+    return {"records": records, "message_count": message_count, "complete": complete,
+            "timings": {"analyzer_parse": parse_seconds, "analyzer_classify": classify_seconds}}
+
+def _cache_scan(file_path: str, scan: dict, streaming: bool) -> None:
+    """Stores a complete scan in the analysis cache, together with the point re-analysis can resume from."""
+    extractor = get_extractor(file_path)
+    resume_offset = None
+    if extractor.resumable:
+        try:
+            resume_offset = analysis_cache.find_resume_offset(file_path)
+        except OSError:
+            return
+    resume_index = None
+    if resume_offset is not None:
+        tail_messages = sum(1 for _ in iter_message_anchors(file_path, streaming, resume_offset))
+        resume_index = scan["message_count"] - tail_messages
+    analysis_cache.store_scan(file_path, scan, extractor.name, resume_offset, resume_index)
+
+def _scan_files(file_paths: list[str], streaming: bool, workers: int | None, use_cache: bool) -> list[list[dict]]:
+    """
+    Scans every file, in parallel worker processes when there is more than one file to parse.
+
+    With the cache enabled, unchanged files are not parsed at all and files that were appended
+    to are only parsed from their last previously-seen message onwards.
+
+    Args:
+        file_paths (list[str]): The export files to scan.
+        streaming (bool): Use the bounded-memory incremental parser.
+        workers (int | None): Maximum number of worker processes. None means one per CPU core.
+        use_cache (bool): Read and update the on-disk analysis cache.
+
+    Returns:
+        list[list[dict]]: The records of each file, in the same order as file_paths.
+    """
+    scans = [None] * len(file_paths)
+    tasks = []  # (position, start_offset, start_index, cached prefix scan)
+    for position, file_path in enumerate(file_paths):
+        cached = analysis_cache.load_cached_scan(file_path, get_extractor(file_path).name) if use_cache else None
+        if cached is None:
+            tasks.append((position, 0, 0, None))
+        elif cached["resume_offset"] is None:
+            scans[position] = cached["scan"]
+        else:
+            tasks.append((position, cached["resume_offset"], cached["resume_index"], cached["scan"]))
+
+    if tasks:
+        print(f"[Analyzer] {len(file_paths) - len(tasks)} file(s) loaded from cache, parsing {len(tasks)}.")
+        task_paths = [file_paths[position] for position, _, _, _ in tasks]
+        offsets = [offset for _, offset, _, _ in tasks]
+        indexes = [index for _, _, index, _ in tasks]
+        results = None
+
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # map() returns results in submission order, which keeps the merge deterministic.
+                    results = list(executor.map(_scan_file, task_paths, repeat(streaming), offsets, indexes))
+            except (OSError, BrokenProcessPool) as e:
+                print(f"[Analyzer] Parallel analysis unavailable ({e}), falling back to a single process.")
+        if results is None:
+            results = [_scan_file(*args) for args in zip(task_paths, repeat(streaming), offsets, indexes)]
+
+        for (position, _, _, prefix), scan in zip(tasks, results):
+            # Files may have been scanned in worker processes, so their timings are recorded here.
+            for stage, seconds in scan.pop("timings").items():
+                metrics.observe_stage(stage, seconds)
+            if prefix is not None:
+                scan["records"] = prefix["records"] + scan["records"]
+                scan["message_count"] += prefix["message_count"]
+            scans[position] = scan
+            if use_cache and scan["complete"]:
+                _cache_scan(file_paths[position], scan, streaming)
+
+    return [scan["records"] for scan in scans]
+
+def analyze_html_files(file_paths: list[str], streaming: bool = ANALYZER_STREAMING,
+                       workers: int | None = ANALYZER_MAX_WORKERS, use_cache: bool = ANALYSIS_CACHE_ENABLED,
+                       use_registry: bool = LINK_REGISTRY_ENABLED) -> dict:
+    """
+    Parses a list of export files, extracts all links, filters them,
     and creates a structured list of unique download jobs for TeraBox links.
+    HTML exports (messages*.html) and JSON exports (result.json) can be mixed; each file is
+    read by the extractor for its format (see get_extractor).
+    Links are deduplicated and checked against the ban list by their canonical key (see
+    core/share_links.py), so a share reposted on several mirror domains becomes a single job.
 
-    This function reads each file only once for improved efficiency.
+    Each file is scanned on its own (in parallel worker processes when several files are given),
+    then the per-file results are merged in the order the files were given, so the first-seen,
+    banned and duplicate rules behave exactly as if the files had been read one after another.
 
     Args:
-        file_paths (list[str]): A list of paths to the HTML files.
+        file_paths (list[str]): A list of paths to the export files.
+        streaming (bool): Parse each file incrementally with bounded memory. Produces exactly
+            the same results as the in-memory BeautifulSoup mode.
+        workers (int | None): Maximum number of worker processes. None means one per CPU core,
+            1 disables parallel analysis.
+        use_cache (bool): Reuse the cached scans of export files that have not changed since
+            the last analysis, and only parse new or appended content.
+        use_registry (bool): Ask the backend's shared link registry (in one request) which TeraBox
+            links were banned on any machine or downloaded by another one, and leave those out.
+            The registry's bans are added to the local ban list. Shares this client downloaded
+            itself are not reported as seen, so re-analysing an export lists them again.
 
     Returns:
         dict: A dictionary containing comprehensive statistics and the list of download jobs.
     """
     print("[Analyzer] Starting analysis...")
+    scanned_files = _scan_files(file_paths, streaming, workers, use_cache)
     banned_links = load_banned_links()
-    
+    seen_elsewhere = frozenset()
+    if use_registry:
+        keys = sorted({canonical_link_key(link) for records in scanned_files for record in records for link in record["terabox"]})
+        with metrics.span("registry_lookup"):
+            codes = registry_client.lookup_links(keys)
+        if codes is not None:
+            shared_bans = [key for key, code in zip(keys, codes) if code == registry_client.BANNED]
+            seen_elsewhere = frozenset(key for key, code in zip(keys, codes) if code == registry_client.SEEN)
+            if shared_bans:
+                # Kept in the local ban index, so they still apply when the backend can't be reached.
+                try:
+                    added = banned_links.add_many(shared_bans)
+                    print(f"[Analyzer] {added} ban(s) from the shared link registry added to the local ban list.")
+                except OSError as e:
+                    print(f"[Analyzer] Could not save the shared link registry's bans: {e}")
+                    banned_links = _CombinedBans(banned_links, frozenset(shared_bans))
+    with metrics.span("analyzer_dedupe"):
+        return merge_scans(file_paths, scanned_files, banned_links, seen_elsewhere)
+
+class _CombinedBans:
+    """Checks a link against several ban collections (the local index, and bans it could not store)."""
+
+    def __init__(self, *collections):
+        self.collections = collections
+
+    def __contains__(self, link) -> bool:
+        return any(link in collection for collection in self.collections)
+
+def scan_export_file(file_path: str, streaming: bool = ANALYZER_STREAMING) -> list[dict]:
+    """
+    Scans a single export file on its own, without the cache, the ban list or other files.
+    Merge the records of several files with merge_scans().
+
+    Args:
+        file_path (str): Path to a Telegram export file (HTML or JSON).
+        streaming (bool): Use the bounded-memory incremental parser.
+
+    Returns:
+        list[dict]: The file's records (see _scan_file).
+    """
+    return _scan_file(file_path, streaming)["records"]
+
+def merge_scans(file_paths: list[str], scanned_files: list[list[dict]], banned_links,
+                seen_elsewhere: frozenset = frozenset()) -> dict:
+    """
+    Merges the records of scanned files, in order, into download jobs and statistics.
+
+    Args:
+        file_paths (list[str]): The scanned files (only their names are used).
+        scanned_files (list[list[dict]]): The records of each file, in the same order.
+        banned_links: A collection supporting `in` with the banned links and canonical keys.
+        seen_elsewhere (frozenset): Canonical keys of shares already downloaded by another client;
+            they are left out of the jobs and counted in "seen_elsewhere_count".
+
+    Returns:
+        dict: A dictionary containing comprehensive statistics and the list of download jobs.
+    """
+    def is_banned(link):
+        # A ban applies to every mirror of the same share, whichever spelling was banned.
+        return link in banned_links or canonical_link_key(link) in banned_links
+
     all_raw_links = []
     download_jobs = []
-    terabox_links_already_in_jobs = set()
+    # Canonical keys of the links already in a job, so each share is downloaded from one mirror only.
+    terabox_keys_already_in_jobs = set()
+    skipped_seen_keys = set()
 
-    for file_path in file_paths:
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                soup = BeautifulSoup(f.read(), "lxml")
-            
-            # Find all message containers in the Telegram export
-            message_bodies = soup.find_all('div', class_='text')
-            
-            for i, message in enumerate(message_bodies):
-                # 1. Extract all links from the current message
-                links_in_message = [a['href'] for a in message.find_all('a', href=True)]
-                if not links_in_message:
-                    continue
-                
-                all_raw_links.extend(links_in_message)
-                
-                # 2. Filter for unique, non-banned TeraBox links for this specific message
-                terabox_links_in_message = sorted(list(set(
-                    link for link in links_in_message 
-                    if _categorize_link(link) == 'TeraBox' and link not in banned_links
-                )))
-                
-                if not terabox_links_in_message:
-                    continue
+    for file_path, records in zip(file_paths, scanned_files):
+        source_file = os.path.basename(file_path)
+        for record in records:
+            # 1. Collect all links from the current message
+            all_raw_links.extend(record["links"])
 
-                # 3. Ensure these links haven't already been added from a previous message (session-wide uniqueness)
-                unique_new_links = [link for link in terabox_links_in_message if link not in terabox_links_already_in_jobs]
-                
-                if not unique_new_links:
-                    continue
-                
-                # 4. Generate a smart folder name for this job
-                folder_name = ""
-                # If there's only one new link, use its text for the folder name
-                if len(unique_new_links) == 1:
-                    link_tag = message.find('a', href=unique_new_links[0])
-                    link_text = link_tag.text.strip().replace('\n', ' ') if link_tag else ""
-                    # Sanitize the text to create a valid folder name
-                    safe_name = "".join([c for c in link_text if c.isalnum() or c in (' ', '-')]).rstrip()
-                    folder_name = safe_name if safe_name else f"Single_Download_{os.path.basename(file_path)}_{i+1}"
-                else:
-                    # If there are multiple new links, create a generic group name
-                    folder_name = f"Message_Group_{os.path.basename(file_path)}_{i+1}"
-
-                # 5. Create the download job dictionary
-                job = {
-                    "source_file": os.path.basename(file_path), 
-                    "links": unique_new_links,
-                    "type": "SINGLE" if len(unique_new_links) == 1 else "MULTI",
-                    "folder_name": folder_name
-                }
-                download_jobs.append(job)
-                
-                # 6. Add the processed links to our set to prevent future duplicates
-                terabox_links_already_in_jobs.update(unique_new_links)
-
-        except Exception as e:
-            print(f"Error processing {os.path.basename(file_path)}: {e}")
+            # 2. Filter for non-banned TeraBox links for this specific message
+            terabox_links_in_message = [link for link in record["terabox"] if not is_banned(link)]
+
+            if not terabox_links_in_message:
+                continue
+
+            # 3. Ensure these shares haven't already been added from a previous message or another
+            #    mirror (session-wide uniqueness on the canonical share key)
+            unique_new_links = []
+            for link in terabox_links_in_message:
+                key = canonical_link_key(link)
+                if key in seen_elsewhere:
+                    skipped_seen_keys.add(key)
+                elif key not in terabox_keys_already_in_jobs:
+                    terabox_keys_already_in_jobs.add(key)
+                    unique_new_links.append(link)
+
+            if not unique_new_links:
+                continue
+
+            # 4. Generate a smart folder name for this job
+            folder_name = ""
+            # If there's only one new link, use its text for the folder name
+            if len(unique_new_links) == 1:
+                link_text = record["titles"].get(unique_new_links[0], "").strip().replace('\n', ' ')
+                # Sanitize the text to create a valid folder name
+                safe_name = "".join([c for c in link_text if c.isalnum() or c in (' ', '-')]).rstrip()
+                folder_name = safe_name if safe_name else f"Single_Download_{source_file}_{record['index']+1}"
+            else:
+                # If there are multiple new links, create a generic group name
+                folder_name = f"Message_Group_{source_file}_{record['index']+1}"
+
+            # 5. Create the download job dictionary
+            job = {
+                "source_file": source_file,
+                "links": unique_new_links,
+                "type": "SINGLE" if len(unique_new_links) == 1 else "MULTI",
+                "folder_name": folder_name
+            }
+            download_jobs.append(job)
 
     # --- Final Statistics Calculation ---
-    filtered_raw_links = [link for link in all_raw_links if link not in banned_links]
+    filtered_raw_links = [link for link in all_raw_links if not is_banned(link)]
     unique_links = sorted(list(set(filtered_raw_links)))
     
-    print(f"[Analyzer] Analysis complete. Found {len(terabox_links_already_in_jobs)} unique TeraBox links to download.")
+    print(f"[Analyzer] Analysis complete. Found {len(terabox_keys_already_in_jobs)} unique TeraBox links to download.")
 
     return {
         "raw_count": len(all_raw_links),
         "banned_count": len(all_raw_links) - len(filtered_raw_links),
         "duplicate_count": len(filtered_raw_links) - len(unique_links),
         "unique_links": unique_links,
-        "terabox_count": len(terabox_links_already_in_jobs),
+        "terabox_count": len(terabox_keys_already_in_jobs),
+        "seen_elsewhere_count": len(skipped_seen_keys),
         "download_jobs": download_jobs
     }
\ No newline at end of file
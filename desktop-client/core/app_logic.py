@@ -1,20 +1,28 @@
 # core/app_logic.py
 import eel
 import os
-import tkinter as tk
-from tkinter import filedialog
 import threading
 import time
 
-from .analyzer import analyze_html_file
-from .downloader import setup_driver, download_file_locally
+# The engines (lxml and bs4 for the analyzer; Selenium, webdriver_manager and requests for downloads)
+# are imported inside the functions that use them, so the window can open before they are loaded.
+# _preload_engines() imports them in the background once the UI is up.
+from .analysis_results import analysis_results
+from .event_bus import ui_bus
+from .metrics import metrics
+from .startup import startup_timer
+from .config import (
+    DOWNLOAD_WORKERS, METRICS_TRACE_ENABLED, BROWSER_PROFILE, DRIVER_PREWARM_DURING_ANALYSIS, DOWNLOAD_ENGINE,
+    DOWNLOAD_PIPELINE_DEPTH,
+)
 
 # --- 1. Functions Exposed to the JavaScript UI ---
 
 @eel.expose
 def select_files():
     """Opens a native file dialog to select one or more files."""
-    # ... (code is complete and correct from previous version)
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk(); root.withdraw(); root.attributes('-topmost', True)
     file_paths = filedialog.askopenfilenames(title="Select your links file(s)")
     return list(file_paths) if file_paths else []
@@ -22,49 +30,160 @@ def select_files():
 @eel.expose
 def start_analysis(file_paths):
     """Starts the link analysis process in a background thread."""
-    threading.Thread(target=_run_analysis_in_background, args=(file_paths,)).start()
+    threading.Thread(target=_run_traced, args=("analysis", _run_analysis_in_background, file_paths)).start()
 
 @eel.expose
-def start_downloading(download_jobs):
-    """Starts the main download process in a background thread."""
-    threading.Thread(target=_run_download_in_background, args=(download_jobs,)).start()
+def get_analysis_page(handle, kind="jobs", offset=0, limit=100, filters=None, sort_by=None, descending=False, search=""):
+    """
+    Returns one page of the links or jobs of an analysis, filtered and sorted here so the UI never
+    holds the whole result (see AnalysisResultStore.page). Returns None if the result was released.
+    """
+    return analysis_results.page(handle, kind, offset, limit, filters, sort_by, descending, search)
+
+@eel.expose
+def get_analysis_summary(handle):
+    """Returns the counts of an analysis, or None if the result was released."""
+    return analysis_results.summary(handle)
+
+@eel.expose
+def release_analysis(handle):
+    """Frees an analysis result the UI no longer shows."""
+    analysis_results.release(handle)
+
+@eel.expose
+def start_downloading(download_jobs, job_ids=None, browser_profile=None):
+    """
+    Starts the main download process in a background thread.
+
+    `download_jobs` is either a list of jobs or the handle of an analysis result, in which case
+    its jobs are downloaded (only those in `job_ids`, if given). `browser_profile` ("lean" or
+    "full") overrides BROWSER_PROFILE for this run.
+    """
+    if isinstance(download_jobs, str):
+        download_jobs = analysis_results.jobs(download_jobs, job_ids)
+        if download_jobs is None:
+            ui_bus.log("This analysis is no longer available. Please analyze the files again.\n")
+            return
+    threading.Thread(target=_run_traced, args=("download", _run_download_in_background, download_jobs,
+                                                         browser_profile or BROWSER_PROFILE)).start()
+
+@eel.expose
+def get_log_page(after=0, limit=500):
+    """Returns recent log lines after a sequence number, so the UI can page through the log history."""
+    return ui_bus.get_log_page(after, limit)
+
+@eel.expose
+def ui_ready():
+    """Called by the UI once its page has loaded. Prints the start-up report and preloads the engines."""
+    if startup_timer.finish():
+        print(startup_timer.report())
+        threading.Thread(target=_preload_engines, name="EnginePreload", daemon=True).start()
 
 # --- 2. Internal Logic (The "Engine Room") ---
 
+def _preload_engines():
+    """Imports the analysis and download engines ahead of their first use."""
+    with startup_timer.phase("preload analyzer"):
+        from . import analyzer  # noqa: F401
+    with startup_timer.phase("preload download engine"):
+        from . import download_scheduler, registry_client  # noqa: F401
+
+def _run_traced(run_name, target, *args):
+    """Runs `target`, writing the timings of its stages to a trace file if METRICS_TRACE_ENABLED is set."""
+    trace_path = metrics.start_trace(run_name) if METRICS_TRACE_ENABLED else None
+    try:
+        target(*args)
+    finally:
+        if trace_path:
+            metrics.stop_trace()
+            ui_bus.log(f"Stage timings of this {run_name} written to {trace_path}\n")
+
 def _run_analysis_in_background(file_paths):
     """The actual analysis logic that runs in the background."""
-    results = analyze_html_file(file_paths)
-    eel.receive_analysis_results(results)
+    from .analyzer import analyze_html_files
+    if DRIVER_PREWARM_DURING_ANALYSIS and file_paths:
+        from .driver_manager import driver_pool
+        # The browsers start in their own threads while the files are analyzed. They are started
+        # like the download workers will ask for them, or the workers could not use them.
+        driver_pool.prewarm(DOWNLOAD_WORKERS, ui_bus.log, is_headless=False, profile=BROWSER_PROFILE,
+                            download_events=DOWNLOAD_ENGINE == "browser" and DOWNLOAD_PIPELINE_DEPTH > 1)
+    results = analyze_html_files(file_paths)
+    # Only the summary and a handle go to the UI; it fetches the links and jobs page by page.
+    ui_bus.emit("receive_analysis_results", analysis_results.add(results))
 
-def _run_download_in_background(download_jobs):
+def _run_download_in_background(download_jobs, browser_profile):
     """The actual download logic that runs in a separate thread."""
-    succeeded_count = 0
-    failed_count = 0
-    all_links_to_download = [link for job in download_jobs for link in job.get('links', [])]
-    total_links = len(all_links_to_download)
-    
-    eel.update_log("Initializing browser driver...")
-    driver = None
+    from .download_scheduler import DownloadScheduler
+    from .post_processing import PostProcessor
+    from .job_store import get_job_store, RESOLVING, DOWNLOADING, DONE, FAILED
+    from .share_links import canonical_link_key
+    from . import registry_client
+
+    def on_progress(done, total, succeeded_count, failed_count):
+        # Coalesced by the event bus: the UI gets the latest values about 10 times a second.
+        ui_bus.update("update_stats", succeeded_count, failed_count)
+        ui_bus.update("update_progress", (done / total) * 100)
+
+    reported_steps = {}
+
+    def on_transfer_progress(job_index, link, bytes_done, total_bytes):
+        # Byte-level progress from the HTTP engine, logged in 10% steps per link.
+        step = bytes_done * 10 // total_bytes if total_bytes else 0
+        if step > reported_steps.get(link, 0):
+            reported_steps[link] = step
+            ui_bus.log(f"  -> {step * 10}% of {bytes_done / 1024 / 1024:.1f} MB downloaded ({link})\n")
+
+    def on_job_done(job):
+        status = "SUCCESS" if job['status'] == "done" else f"FAILED ({len(job['failed_links'])} link(s))"
+        ui_bus.log(f"==> Job '{job['folder_name']}' finished: {status}\n")
+        # Tell the other clients which shares are taken care of (or broken), without waiting for the backend.
+        failed = set(job['failed_links'])
+        succeeded = [link for link in job.get('links', []) if link not in failed]
+        registry_client.mark_links_in_background({canonical_link_key(link) for link in succeeded}, registry_client.SEEN)
+        registry_client.mark_links_in_background({canonical_link_key(link) for link in failed}, registry_client.FAILED)
+
+    # Every link is tracked in the job store, so an interrupted batch can be resumed link by link.
+    # Jobs that are already stored (a resumed or repeated batch) keep their rows.
+    store = get_job_store()
+    link_ids = {
+        (job_index, link): link_id
+        for job_index, (job, ids) in enumerate(zip(download_jobs, store.add_or_reuse_jobs(download_jobs)))
+        for link, link_id in zip(job.get('links', []), ids)
+    }
+
+    def on_link_start(job_index, link):
+        store.set_link_state(link_ids[(job_index, link)], RESOLVING)
+
+    def on_transfer_start(job_index, link):
+        store.set_link_state(link_ids[(job_index, link)], DOWNLOADING)
+
+    # Finished downloads are verified, extracted and sorted while the rest of the batch downloads.
+    post_processor = PostProcessor(ui_bus.log).start()
+
+    def on_link_done(result):
+        store.set_link_state(link_ids[(result['job_index'], result['link'])], DONE if result['success'] else FAILED)
+        if result['success']:
+            post_processor.submit(download_jobs[result['job_index']], result['downloaded_paths'],
+                                  result['link'], result['share_info'])
+
+    ui_bus.log("Initializing browser workers...")
     try:
-        driver = setup_driver(lambda msg: eel.update_log(msg), is_headless=False)
-        for i, link in enumerate(all_links_to_download):
-            eel.update_log(f"--> Starting download for link {i+1}/{total_links}...")
-            downloaded_paths = download_file_locally(driver, link, lambda msg: eel.update_log(msg))
-            
-            if downloaded_paths:
-                succeeded_count += 1
-                eel.update_log(f"  -> SUCCESS!\n")
-            else:
-                failed_count += 1
-                eel.update_log(f"  -> FAILED.\n")
-
-            eel.update_stats(succeeded_count, failed_count)
-            eel.update_progress(((i + 1) / total_links) * 100)
-            
-        eel.update_log("\n--- ALL DOWNLOADS COMPLETE! ---")
+        scheduler = DownloadScheduler(
+            ui_bus.log,
+            is_headless=False,
+            browser_profile=browser_profile,
+            on_link_start=on_link_start,
+            on_transfer_start=on_transfer_start,
+            on_link_done=on_link_done,
+            on_job_done=on_job_done,
+            on_progress=on_progress,
+            on_transfer_progress=on_transfer_progress,
+        )
+        scheduler.run(download_jobs)
+        ui_bus.log("\n--- ALL DOWNLOADS COMPLETE! ---")
     except Exception as e:
-        eel.update_log(f"FATAL ERROR: {e}\n")
+        ui_bus.log(f"FATAL ERROR: {e}\n")
     finally:
-        if driver:
-            eel.update_log("Closing browser driver...")
-            driver.quit()
\ No newline at end of file
+        ui_bus.log("Finishing the sorting of the last downloads...\n")
+        post_processor.close()
+        ui_bus.log(f"--- ALL FILES SORTED ---\n{post_processor.format_summary()}\n")
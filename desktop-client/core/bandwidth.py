@@ -0,0 +1,59 @@
+# core/bandwidth.py
+# This module keeps the combined speed of all transfers under a budget with a token bucket:
+# tokens (bytes) flow in at the allowed rate, and every chunk must be paid for before it is written.
+
+import threading
+import time
+
+from .config import DOWNLOAD_BANDWIDTH_LIMIT, DOWNLOAD_BANDWIDTH_BURST
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket shared by every transfer.
+
+    The bucket holds up to `burst` tokens and refills at `rate` tokens per second. A caller taking
+    more tokens than are available goes into debt and waits until it is paid off, so chunks bigger
+    than the burst still work and the long-run rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate (float): Tokens added per second. 0 disables the limit.
+            burst (float): Maximum tokens saved up while nobody is consuming.
+        """
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate: float, burst: float) -> None:
+        """Changes the rate and burst, e.g. from a settings panel. Takes effect for the next consume()."""
+        with self._lock:
+            self.rate = max(0.0, rate)
+            self.burst = max(1.0, burst)
+            self._tokens = self.burst
+            self._updated = time.monotonic()
+
+    def consume(self, amount: int) -> float:
+        """
+        Takes `amount` tokens, sleeping until the budget allows it.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            # Sleeping outside the lock lets the other transfers queue up their own debt meanwhile.
+            time.sleep(wait)
+        return wait
+
+
+# The budget shared by every download of the process.
+download_bandwidth = TokenBucket(DOWNLOAD_BANDWIDTH_LIMIT, DOWNLOAD_BANDWIDTH_BURST)
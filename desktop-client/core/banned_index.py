@@ -0,0 +1,261 @@
+# core/banned_index.py
+# This module keeps the permanently banned links in a disk-backed index that never has to be
+# loaded into memory: a sorted file of 64-bit link fingerprints (searched through mmap) plus a
+# small append-only log of recent bans that is merged into the sorted file from time to time.
+
+import array
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable
+
+from .config import BANNED_INDEX_DIR, BANNED_COMPACT_THRESHOLD, BANNED_LINKS_FILE
+from .share_links import canonical_link_key
+
+SORTED_FILE = "fingerprints.bin"
+LOG_FILE = "pending.log"
+
+# Fingerprints are stored as unsigned 64-bit integers in native byte order (the index is local
+# application data), so the mapped file can be read as an array without any conversion.
+_FINGERPRINT = struct.Struct("=Q")
+_MERGE_CHUNK = 64 * 1024  # fingerprints per slice copied while compacting
+_INTERPOLATION_STEPS = 6
+
+
+def fingerprint(link: str) -> int:
+    """Returns the 64-bit fingerprint of a link (the chance of two links colliding is negligible)."""
+    return int.from_bytes(hashlib.blake2b(link.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class BannedLinkIndex:
+    """
+    A persistent, set-like collection of banned links.
+
+    Supports `link in index`, `len(index)` and incremental `add`/`add_many`. Lookups binary-search
+    the memory-mapped sorted file, so the operating system only pages in the few blocks a lookup
+    touches, and memory use stays flat no matter how many links are banned.
+    """
+
+    def __init__(self, directory: str = BANNED_INDEX_DIR, compact_threshold: int = BANNED_COMPACT_THRESHOLD):
+        """
+        Args:
+            directory (str): The folder holding the index files. It is created if missing.
+            compact_threshold (int): Merge the append-only log into the sorted file once it holds this many bans.
+        """
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._sorted_path = os.path.join(directory, SORTED_FILE)
+        self._log_path = os.path.join(directory, LOG_FILE)
+        self._lock = threading.RLock()
+        self._file = None
+        self._map = None
+        self._values = None
+        self._count = 0
+        self._pending: set[int] = set()
+
+        os.makedirs(directory, exist_ok=True)
+        self._open_sorted()
+        self._load_log()
+
+    # --- Files ---
+
+    def _open_sorted(self) -> None:
+        """(Re)maps the sorted fingerprint file."""
+        self._close_sorted()
+        if not os.path.exists(self._sorted_path):
+            return
+        size = os.path.getsize(self._sorted_path)
+        self._count = size // _FINGERPRINT.size
+        if self._count:
+            self._file = open(self._sorted_path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._values = memoryview(self._map)[:self._count * _FINGERPRINT.size].cast("Q")
+
+    def _close_sorted(self) -> None:
+        if self._values is not None:
+            self._values.release()
+            self._values = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._count = 0
+
+    def _load_log(self) -> None:
+        """Reads the bans that were added since the last compaction."""
+        self._pending = set()
+        try:
+            with open(self._log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._pending.add(fingerprint(json.loads(line)))
+                    except (json.JSONDecodeError, TypeError, AttributeError):
+                        pass  # A line cut short by a crash; that ban is simply lost.
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Error loading recent banned links: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_sorted()
+
+    # --- Lookups ---
+
+    def _lower_bound(self, value: int) -> int:
+        """Returns the position of the first fingerprint in the sorted file that is >= value."""
+        values = self._values
+        low, high = 0, self._count
+        # Fingerprints are uniformly distributed hashes, so interpolation search lands next to the
+        # right spot in a couple of probes instead of ~log2(n) for binary search. The last few
+        # positions (or a search that stops converging) are finished with binary search.
+        low_value, high_value = 0, 1 << 64
+        for _ in range(_INTERPOLATION_STEPS):
+            if high - low <= 8 or high_value <= low_value:
+                break
+            guess = low + (value - low_value) * (high - low) // (high_value - low_value)
+            if guess >= high:
+                guess = high - 1
+            current = values[guess]
+            if current < value:
+                low, low_value = guess + 1, current
+            else:
+                high, high_value = guess, current
+        while low < high:
+            middle = (low + high) // 2
+            if values[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _in_sorted(self, value: int) -> bool:
+        position = self._lower_bound(value)
+        return position < self._count and self._values[position] == value
+
+    def _is_banned(self, value: int) -> bool:
+        return value in self._pending or (self._count > 0 and self._in_sorted(value))
+
+    def __contains__(self, link: object) -> bool:
+        if not isinstance(link, str):
+            return False
+        value = fingerprint(link)
+        with self._lock:
+            return self._is_banned(value)
+
+    def __len__(self) -> int:
+        """The number of banned links (recent bans that are also in the sorted file count twice until compaction)."""
+        with self._lock:
+            return self._count + len(self._pending)
+
+    # --- Adding Bans ---
+
+    def add(self, link: str) -> None:
+        """Bans one link."""
+        self.add_many([link])
+
+    def add_many(self, links: Iterable[str]) -> int:
+        """
+        Bans several links with a single append to the log.
+
+        Args:
+            links (Iterable[str]): The links to ban.
+
+        Returns:
+            int: The number of links that were not banned yet.
+        """
+        with self._lock:
+            new_links = {}
+            for link in links:
+                value = fingerprint(link)
+                if value not in new_links and not self._is_banned(value):
+                    new_links[value] = link
+            if not new_links:
+                return 0
+            with open(self._log_path, "a", encoding="utf-8") as f:
+                # One JSON string per line, so any link (even one with a line break) survives the round trip.
+                f.write("".join(json.dumps(link) + "\n" for link in new_links.values()))
+            self._pending.update(new_links)
+            if len(self._pending) >= self.compact_threshold:
+                self.compact()
+            return len(new_links)
+
+    # --- Compaction ---
+
+    def _copy_sorted(self, f, start: int, end: int) -> None:
+        """Copies fingerprints [start, end) of the sorted file to f in bounded slices."""
+        step = _MERGE_CHUNK * _FINGERPRINT.size
+        for offset in range(start * _FINGERPRINT.size, end * _FINGERPRINT.size, step):
+            f.write(self._map[offset:min(offset + step, end * _FINGERPRINT.size)])
+
+    def _replace_sorted(self, temp_path: str) -> None:
+        self._close_sorted()  # Windows can't replace a file that is still mapped.
+        os.replace(temp_path, self._sorted_path)
+        self._open_sorted()
+
+    def compact(self) -> None:
+        """
+        Merges the append-only log into the sorted file and empties the log.
+
+        Only the recent bans are sorted in memory; the existing file is copied across in large
+        slices between the positions where the new fingerprints are inserted.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            temp_path = self._sorted_path + ".tmp"
+            copied = 0
+            with open(temp_path, "wb") as f:
+                for value in sorted(self._pending):
+                    position = self._lower_bound(value) if self._count else 0
+                    if position < self._count and self._values[position] == value:
+                        continue  # Already merged by a compaction that was interrupted before clearing the log.
+                    self._copy_sorted(f, copied, position)
+                    f.write(_FINGERPRINT.pack(value))
+                    copied = position
+                self._copy_sorted(f, copied, self._count)
+            self._replace_sorted(temp_path)
+            # The bans are safely in the sorted file now; a crash before this point just merges them again.
+            open(self._log_path, "w").close()
+            self._pending = set()
+
+    # --- Migration From banned_links.json ---
+
+    def import_json(self, json_path: str = BANNED_LINKS_FILE) -> None:
+        """Builds the index from the old banned_links.json, if there is one and the index is still empty."""
+        with self._lock:
+            if len(self) or not os.path.exists(json_path):
+                return
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    links = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error(f"Error importing banned links: {e}")
+                return
+            links = [link for link in links if isinstance(link, str)]
+            # Old bans only hold the exact URLs; add their canonical keys so they cover every mirror.
+            values = array.array("Q", sorted({fingerprint(text) for link in links for text in (link, canonical_link_key(link))}))
+            temp_path = self._sorted_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(values.tobytes())
+            self._replace_sorted(temp_path)
+            logging.info(f"Imported {len(links)} banned links into the banned-link index.")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_banned_index() -> BannedLinkIndex:
+    """Returns the application's banned-link index, opening (and migrating) it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BannedLinkIndex()
+            _index.import_json()
+        return _index
@@ -3,7 +3,7 @@
 # It's the "single source of truth" for paths, domains, and other constants.
 
 import os
-from typing import List
+from typing import Dict, List, Optional
 
 # --- 1. DIRECTORY CONFIGURATION ---
 # The absolute path to the 'desktop-client' folder. All other paths are built from this.
@@ -19,6 +19,17 @@ SORTED_OUTPUT_FOLDER = os.path.join(APP_DIR, "VortexFlow_Sorted")
 # IMPORTANT: This path is system-dependent. It will only work if Brave is installed here.
 # In a future version, we could make this configurable in the UI's settings panel.
 BRAVE_BROWSER_PATH = r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe"
+# "lean" loads share pages without images, fonts, ads and trackers, returns from navigation as soon
+# as the page can be scripted, and turns off browser features the downloads don't need.
+# "full" loads every page like a normal browser would (e.g. if a mirror's page breaks in lean mode).
+BROWSER_PROFILE: str = "lean"
+# Resource types the lean profile doesn't load. Known types: "image", "font", "stylesheet".
+LEAN_BLOCKED_RESOURCE_TYPES: List[str] = ["image", "font"]
+# Further URLs the lean profile doesn't load ("*" matches anything), mostly ads and trackers.
+LEAN_BLOCKED_URL_PATTERNS: List[str] = [
+    "*googletagmanager.com*", "*google-analytics.com*", "*googlesyndication.com*", "*doubleclick.net*",
+    "*adservice.google.*", "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*clarity.ms*",
+]
 
 # --- 3. LINK DETECTION CONFIGURATION ---
 # The comprehensive list of all TeraBox domains to be detected by the analyzer.
@@ -27,10 +38,204 @@ TERABOX_DOMAINS: List[str] = [
     "1024terabox.com", "terafileshare.com", "terasharelink.com",
     "teraboxshare.com", "4funbox.co", "mirrobox.com"
 ]
+# Hosts that belong to Telegram itself.
+TELEGRAM_DOMAINS: List[str] = [
+    "t.me", "telegram.me", "telegram.org", "telegram.dog", "telesco.pe"
+]
+# Link categories used by the analyzer, matched on the host (the domain or any of its subdomains).
+# Add an entry here to give another group of sites its own category; when several rules match,
+# the most specific domain wins. Links that match no rule are categorized by their host name.
+LINK_CATEGORY_RULES: Dict[str, List[str]] = {
+    "TeraBox": TERABOX_DOMAINS,
+    "Telegram": TELEGRAM_DOMAINS,
+}
 
 # --- 4. SESSION & DATA FILE CONFIGURATION ---
 # Defines the names for the files that store session data, failed links, and banned links.
 # These will be created in the APP_DIR.
 SESSION_FILE = os.path.join(APP_DIR, "session.json")
 FAILED_LINKS_FILE = os.path.join(APP_DIR, "failed_links.json")
-BANNED_LINKS_FILE = os.path.join(APP_DIR, "banned_links.json")
\ No newline at end of file
+BANNED_LINKS_FILE = os.path.join(APP_DIR, "banned_links.json")
+# Banned links are kept in an on-disk index (a sorted fingerprint file plus an append-only log).
+# The old banned_links.json is imported into it automatically the first time it is opened.
+BANNED_INDEX_DIR = os.path.join(APP_DIR, "banned_index")
+# Once this many bans are waiting in the append-only log, they are merged into the sorted file.
+BANNED_COMPACT_THRESHOLD = 100_000
+
+# --- 5. ANALYZER CONFIGURATION ---
+# When True, exports are parsed incrementally and each message is discarded once processed,
+# so memory use stays flat even for exports that are hundreds of MB.
+ANALYZER_STREAMING: bool = True
+# How many characters of an export are fed to the streaming parser at a time.
+ANALYZER_READ_CHUNK_SIZE: int = 1024 * 1024
+# Maximum number of worker processes used to parse export files in parallel.
+# None means one per CPU core; 1 disables parallel analysis.
+ANALYZER_MAX_WORKERS: Optional[int] = None
+# Keep the scan of every analyzed export on disk, so unchanged files are not parsed again.
+ANALYSIS_CACHE_ENABLED: bool = True
+ANALYSIS_CACHE_DIR = os.path.join(APP_DIR, "analysis_cache")
+# Least-recently-used cache entries are evicted once the cache grows past this size.
+ANALYSIS_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+
+# --- 6. DOWNLOAD CONFIGURATION ---
+# Number of links downloaded in parallel. Every worker runs its own browser.
+DOWNLOAD_WORKERS: int = 3
+# Maximum number of links from the same mirror domain that are downloaded at the same time.
+MAX_DOWNLOADS_PER_DOMAIN: int = 2
+# Maximum number of links waiting in the scheduler's queue.
+DOWNLOAD_QUEUE_SIZE: int = 64
+# Seconds between download-folder scans on systems without inotify (Linux detects completions instantly).
+DOWNLOAD_POLL_INTERVAL: float = 0.5
+# "browser" lets the browser transfer each file. "http" only uses the browser to resolve the file URL
+# and cookies, then downloads the file over parallel, resumable HTTP Range requests.
+DOWNLOAD_ENGINE: str = "browser"
+# Maximum parallel connections per file, and the smallest segment worth its own connection.
+HTTP_SEGMENTS: int = 4
+HTTP_MIN_SEGMENT_SIZE: int = 4 * 1024 * 1024
+# Bytes read from the network and written to disk at a time.
+HTTP_CHUNK_SIZE: int = 1024 * 1024
+# Maximum pooled connections kept open per host by the HTTP engine.
+HTTP_POOL_SIZE: int = 32
+# With the browser engine, each worker keeps up to this many downloads going at once in its browser,
+# one tab per link: the next share page is opened and clicked while earlier
+# files are still transferring. 1 downloads one link at a time.
+DOWNLOAD_PIPELINE_DEPTH: int = 1
+# Remembers the browser and driver binary that worked last time (see downloader.setup_driver).
+DRIVER_CACHE_FILE = os.path.join(APP_DIR, "driver_cache.json")
+# Maximum number of started browsers kept idle between batches.
+DRIVER_POOL_MAX_IDLE: int = DOWNLOAD_WORKERS
+# Start the download browsers when an analysis starts, so they warm up while the files are
+# scanned and are ready by the time Download is pressed. Set to False to open no browser
+# before a download starts.
+DRIVER_PREWARM_DURING_ANALYSIS: bool = True
+# A browser is replaced after this many share pages, or once it uses more memory than this (0 disables).
+DRIVER_RECYCLE_PAGES: int = 50
+DRIVER_RECYCLE_MEMORY_MB: int = 1500
+
+
+# --- 7. JOB STORE CONFIGURATION ---
+# SQLite database holding every download job and the state of each link. The old session.json and
+# failed_links.json files are imported into it automatically the first time it is opened.
+JOB_STORE_FILE = os.path.join(APP_DIR, "vortexflow_jobs.db")
+
+
+# --- 8. SORTED OUTPUT CONFIGURATION ---
+# Index of the content hashes of every file placed in SORTED_OUTPUT_FOLDER.
+CONTENT_INDEX_FILE = os.path.join(APP_DIR, "vortexflow_content.db")
+# What to do with a download whose content is already in the sorted folder:
+# "hardlink" links the existing file into the new job folder, "remove" just deletes the duplicate,
+# "off" stores every file again.
+DUPLICATE_FILE_MODE: str = "hardlink"
+# Bytes read at a time while hashing files.
+CONTENT_HASH_CHUNK_SIZE: int = 4 * 1024 * 1024
+
+
+# --- 9. UI EVENT CONFIGURATION ---
+# How many times per second queued log lines and the latest progress are pushed to the UI.
+UI_FRAME_RATE: float = 10.0
+# Number of recent log lines kept for the UI to page through.
+UI_LOG_BUFFER_SIZE: int = 10_000
+# Log lines waiting for the next frame. Beyond this, the oldest are skipped (they stay in the buffer).
+UI_MAX_PENDING_LOG_LINES: int = 2_000
+# Analysis results stay in the client and the UI fetches them page by page. This many results are
+# kept (older ones are released), and a page holds at most this many links or jobs.
+ANALYSIS_RESULTS_KEPT: int = 3
+ANALYSIS_PAGE_MAX_SIZE: int = 1_000
+
+
+# --- 10. SHARED LINK REGISTRY CONFIGURATION ---
+# The VortexFlow backend. Its link registry tells every client which links were already downloaded,
+# failed or banned on any machine, so shares aren't downloaded twice.
+BACKEND_URL: str = os.environ.get("VORTEXFLOW_BACKEND_URL", "http://127.0.0.1:8000")
+LINK_REGISTRY_ENABLED: bool = True
+# Seconds to wait for the backend to accept a connection, and for a bulk request to complete.
+LINK_REGISTRY_CONNECT_TIMEOUT: float = 2.0
+LINK_REGISTRY_TIMEOUT: float = 60.0
+# A random ID for this installation, created on first use. The registry uses it to tell this
+# client's own downloads from those of other clients.
+LINK_REGISTRY_CLIENT_ID_FILE = os.path.join(APP_DIR, "registry_client_id.txt")
+
+
+# --- 11. METRICS CONFIGURATION ---
+# While the app runs, timing metrics of every stage (page load, button wait, transfer, sorting, ...)
+# are served in the Prometheus text format at http://127.0.0.1:<METRICS_PORT>/metrics.
+METRICS_SERVER_ENABLED: bool = True
+METRICS_PORT: int = 9464
+# Also write every timed stage of a run to a trace file (Chrome trace format, opens in
+# chrome://tracing or ui.perfetto.dev).
+METRICS_TRACE_ENABLED: bool = False
+METRICS_TRACE_DIR = os.path.join(APP_DIR, "traces")
+
+
+# --- 12. RETRY & MIRROR HEALTH CONFIGURATION ---
+# A failed link is retried up to this many attempts in total, after an exponential backoff with
+# random jitter (a random wait between 0 and BASE * 2^(attempt - 1) seconds, capped at MAX).
+RETRY_MAX_ATTEMPTS: int = 3
+RETRY_BASE_DELAY: float = 5.0
+RETRY_MAX_DELAY: float = 120.0
+# Extra seconds allowed for the page and the download to start, per previous attempt of a link.
+RETRY_EXTRA_TIMEOUT: float = 10.0
+# Timeouts used for a mirror domain until its real latencies are known, and the range the learned
+# timeouts are kept in. Seconds to wait for the download button, and for the download to start.
+PAGE_TIMEOUT_DEFAULT: float = 20.0
+PAGE_TIMEOUT_RANGE: tuple = (8.0, 60.0)
+DOWNLOAD_START_TIMEOUT_DEFAULT: float = 15.0
+DOWNLOAD_START_TIMEOUT_RANGE: tuple = (5.0, 45.0)
+# Maximum seconds a single download may take once started.
+DOWNLOAD_TIMEOUT: float = 600.0
+# After this many failures in a row, no more links of a mirror domain are tried for a cooldown
+# (doubling after every failed trial, up to the maximum). After CIRCUIT_MAX_TRIPS trips in a row,
+# the domain's links wait for the maximum cooldown. Only failures of the mirror itself count (see
+# MIRROR_FAILURE_EVENTS in core/downloader.py), not share pages without a download button.
+CIRCUIT_FAILURE_THRESHOLD: int = 5
+CIRCUIT_COOLDOWN: float = 30.0
+CIRCUIT_MAX_COOLDOWN: float = 300.0
+CIRCUIT_MAX_TRIPS: int = 3
+
+
+# --- 13. STARTUP CONFIGURATION ---
+# The screen size measured on an earlier start, so opening the window doesn't need a Tk root.
+# Delete the file to measure again (e.g. after changing monitors).
+SCREEN_GEOMETRY_CACHE_FILE = os.path.join(APP_DIR, "screen_geometry.json")
+
+
+# --- 14. SHARE PREFETCH, ORDERING & BANDWIDTH CONFIGURATION ---
+# Before any browser work starts, the name, size and status of every TeraBox share are fetched
+# over plain HTTP. Dead shares fail right away instead of taking up a browser.
+SHARE_PREFETCH_ENABLED: bool = True
+# Number of share lookups made in parallel, and their (connect, read) timeouts in seconds.
+SHARE_PREFETCH_WORKERS: int = 16
+SHARE_PREFETCH_TIMEOUT: tuple = (3.0, 10.0)
+# Where share metadata is asked for. None uses the mirror domain of each link; set a base URL
+# (e.g. "http://127.0.0.1:8765") to use another server, such as benchmarks/share_server.py.
+SHARE_METADATA_API: Optional[str] = os.environ.get("VORTEXFLOW_SHARE_API")
+# The order jobs are downloaded in: "message" (as they appear in the export), "smallest_first"
+# (many small jobs finish before one huge one starts) or "largest_first". Jobs whose size is
+# unknown go last, in message order.
+DOWNLOAD_ORDER: str = "smallest_first"
+# Maximum combined download speed of the HTTP engine in bytes per second (0 = unlimited), and the
+# burst allowed on top of it.
+DOWNLOAD_BANDWIDTH_LIMIT: int = 0
+DOWNLOAD_BANDWIDTH_BURST: int = 4 * 1024 * 1024
+
+
+# --- 15. POST-DOWNLOAD PROCESSING CONFIGURATION ---
+# Finished downloads are verified, extracted and sorted while the batch is still downloading
+# (see core/post_processing.py), so the batch is sorted soon after its last download lands.
+# Check that a share's files add up to the size reported by the share lookup, and test archives.
+POSTPROCESS_VERIFY: bool = True
+# Unpack .zip archives (and .7z or .rar ones when py7zr or rarfile is installed) into a folder
+# named after the archive. The archive is deleted afterwards unless it should be kept.
+POSTPROCESS_EXTRACT_ARCHIVES: bool = True
+POSTPROCESS_KEEP_ARCHIVES: bool = False
+# Archives that would unpack to more than this many bytes (or to more than the disk has free) are
+# sorted without unpacking them. 0 only checks the free space.
+POSTPROCESS_MAX_EXTRACTED_SIZE: int = 50 * 1024 ** 3
+# Threads per stage. Each stage reads and writes whole files, so a few are enough to keep a disk busy.
+POSTPROCESS_VERIFY_WORKERS: int = 2
+POSTPROCESS_EXTRACT_WORKERS: int = 1
+POSTPROCESS_SORT_WORKERS: int = 2
+# Maximum number of downloads waiting for each stage. When a stage falls this far behind, the stage
+# before it (and finally the download workers) waits instead of piling more work on the disk.
+POSTPROCESS_QUEUE_SIZE: int = 16
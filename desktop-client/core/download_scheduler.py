@@ -0,0 +1,521 @@
+# core/download_scheduler.py
+# This module runs download jobs concurrently on a pool of workers, each owning its own browser.
+
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+from .config import (
+    LOCAL_DOWNLOAD_FOLDER, DOWNLOAD_WORKERS, MAX_DOWNLOADS_PER_DOMAIN, DOWNLOAD_QUEUE_SIZE, RETRY_EXTRA_TIMEOUT,
+    SHARE_PREFETCH_ENABLED, DOWNLOAD_ORDER, DOWNLOAD_ENGINE, DOWNLOAD_PIPELINE_DEPTH, DOWNLOAD_POLL_INTERVAL,
+    BROWSER_PROFILE,
+)
+from .downloader import download_file_locally, DriverConnectionError, TabPipeline, MIRROR_FAILURE_EVENTS
+from .driver_manager import driver_pool
+from .metrics import metrics
+from .retry_policy import RetryPolicy, MirrorHealth, mirror_health, link_domain, DEFER, REJECT
+from .share_metadata import prefetch_share_info, order_jobs, DEAD
+
+# Placed on the queue once per worker to tell it that there is no more work.
+_STOP = None
+
+
+class DownloadScheduler:
+    """
+    Downloads the links of a batch of jobs with N workers running in parallel.
+
+    Every worker owns one browser (taken from the warm driver pool) and its own download folder,
+    pulls links from a bounded queue and reports the outcome of each link. At most `max_per_domain`
+    links of the same mirror domain are downloaded at the same time. If a worker's browser crashes,
+    the link it was working on fails, the browser is replaced and the worker carries on.
+
+    A failed link is put back in the queue after an exponential backoff with jitter (see
+    core/retry_policy.py) until it runs out of attempts. Links that are due again go before new
+    links, those with fewer failed attempts first. Each mirror domain gets timeouts learned from its
+    latencies, and a domain that keeps failing is paused by its circuit breaker instead of using up
+    workers.
+
+    Before the workers start, the metadata of every share is fetched over plain HTTP (see
+    core/share_metadata.py): dead shares fail without a browser ever opening them, and jobs are
+    handed out in the order chosen by `order` (smallest first by default).
+    """
+
+    def __init__(self, log_callback: Callable[[str], None], num_workers: int = DOWNLOAD_WORKERS,
+                 max_per_domain: int = MAX_DOWNLOADS_PER_DOMAIN, queue_size: int = DOWNLOAD_QUEUE_SIZE,
+                 is_headless: bool = False, browser_profile: str = BROWSER_PROFILE,
+                 on_link_start: Callable[[int, str], None] | None = None,
+                 on_transfer_start: Callable[[int, str], None] | None = None,
+                 on_link_done: Callable[[dict], None] | None = None,
+                 on_job_done: Callable[[dict], None] | None = None,
+                 on_progress: Callable[[int, int, int, int], None] | None = None,
+                 on_transfer_progress: Callable[[int, str, int, int], None] | None = None,
+                 retry_policy: RetryPolicy | None = None, health: MirrorHealth | None = None,
+                 prefetch: bool = SHARE_PREFETCH_ENABLED, order: str = DOWNLOAD_ORDER,
+                 pipeline_depth: int = DOWNLOAD_PIPELINE_DEPTH, engine: str = DOWNLOAD_ENGINE,
+                 download_root: str = LOCAL_DOWNLOAD_FOLDER):
+        """
+        Args:
+            log_callback (function): A function to send log messages back to the UI.
+            num_workers (int): Number of parallel workers (and browsers).
+            max_per_domain (int): Maximum concurrent downloads from the same domain.
+            queue_size (int): Maximum number of links waiting in the job queue.
+            is_headless (bool): Whether to run the browsers in headless mode.
+            browser_profile (str): "lean" or "full", see BROWSER_PROFILE in core/config.py.
+            on_link_start (function): Called with (job_index, link) when a worker picks up a link.
+            on_transfer_start (function): Called with (job_index, link) once the link's file starts
+                arriving (its first byte, with either engine).
+            on_link_done (function): Called with a link result dict after every link: "job_index",
+                "link", "downloaded_paths", "success" and "share_info" (the link's share lookup, or None).
+            on_job_done (function): Called with a job result dict once all links of a job are done.
+            on_progress (function): Called with (done, total, succeeded, failed) after every link.
+            on_transfer_progress (function): Called with (job_index, link, bytes_done, total_bytes)
+                while the HTTP download engine transfers a file.
+            retry_policy (RetryPolicy | None): How often and after how long failed links are retried.
+            health (MirrorHealth | None): Learned timeouts and circuit breakers of the mirror domains.
+                Defaults to the application-wide one, so what was learned carries over between batches.
+            prefetch (bool): Whether to look up every share before downloading.
+            order (str): The order jobs are downloaded in, see DOWNLOAD_ORDER in core/config.py.
+                Only used with prefetch, since the sizes come from it.
+            pipeline_depth (int): Downloads each worker keeps going at once in its browser. Only
+                used with the browser engine; the HTTP engine transfers outside the browser anyway.
+            engine (str): The download engine, "browser" or "http" (see DOWNLOAD_ENGINE).
+            download_root (str): The folder the workers' download folders ("worker_<n>") are made in.
+                Schedulers that run at the same time need different ones, or their workers would
+                share a folder and pick up each other's files.
+        """
+        self.log_callback = log_callback
+        self.num_workers = max(1, num_workers)
+        self.max_per_domain = max(1, max_per_domain)
+        self.is_headless = is_headless
+        self.browser_profile = browser_profile
+        self.on_link_start = on_link_start
+        self.on_transfer_start = on_transfer_start
+        self.on_link_done = on_link_done
+        self.on_job_done = on_job_done
+        self.on_progress = on_progress
+        self.on_transfer_progress = on_transfer_progress
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.health = health or mirror_health
+        self.prefetch = prefetch
+        self.order = order
+        self.engine = engine
+        self.pipeline_depth = max(1, pipeline_depth) if engine == "browser" else 1
+        self.download_root = download_root
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        # Signalled whenever a link is rescheduled or reaches its final outcome.
+        self._changed = threading.Condition(self._lock)
+        self._delayed: list[tuple] = []  # Heap of (due time, sequence, item) for links waiting to be retried.
+        self._due: list[tuple] = []      # Heap of (priority, sequence, item) for retries that are due.
+        self._sequence = itertools.count()
+        self._domain_slots: dict[str, threading.Semaphore] = {}
+        self._job_results: list[dict] = []
+        self._share_info: dict[str, dict] = {}
+        self._done = 0
+        self._total = 0
+        self.succeeded_count = 0
+        self.failed_count = 0
+
+    # --- Public API ---
+
+    def run(self, download_jobs: list[dict]) -> list[dict]:
+        """
+        Downloads every link of every job and blocks until the whole batch is finished.
+
+        Args:
+            download_jobs (list[dict]): The download jobs created by the analyzer.
+
+        Returns:
+            list[dict]: One result per job, with the job's keys plus "downloaded_paths",
+                "failed_links" and "status" ("done" or "failed").
+        """
+        self._job_results = [
+            dict(job, downloaded_paths=[], failed_links=[], status="pending", pending=len(job.get('links', [])))
+            for job in download_jobs
+        ]
+        self._total = sum(result['pending'] for result in self._job_results)
+        self._done = self.succeeded_count = self.failed_count = 0
+        self._delayed, self._due = [], []
+        share_info = self._share_info = self._prefetch(download_jobs) if self.prefetch else {}
+        job_order = order_jobs(download_jobs, share_info, self.order)
+
+        # Dead shares fail right away; no browser needs to see them.
+        dead_links = [
+            (job_index, link) for job_index, job in enumerate(download_jobs) for link in job.get('links', [])
+            if share_info.get(link, {}).get("state") == DEAD
+        ]
+        log = lambda msg: self.log_callback(f"[Prefetch] {msg}")
+        for job_index, link in dead_links:
+            log(f"  -> Skipping {link}: the share no longer exists.\n")
+            self._finish_link(job_index, link, [], log)
+
+        workers = [
+            threading.Thread(target=self._pipelined_worker_loop if self.pipeline_depth > 1 else self._worker_loop,
+                             args=(n,), name=f"DownloadWorker-{n}", daemon=True)
+            for n in range(1, min(self.num_workers, self._total - len(dead_links)) + 1)
+        ]
+        for worker in workers:
+            worker.start()
+
+        # Feeding the bounded queue blocks while the workers are busy, so memory stays flat for huge batches.
+        # Queue items are (job_index, link, attempt).
+        new_links = (
+            (job_index, link, 1) for job_index in job_order for link in download_jobs[job_index].get('links', [])
+            if share_info.get(link, {}).get("state") != DEAD
+        )
+        while True:
+            item = self._next_item(new_links)
+            if item is None:
+                break
+            self._queue.put(item)
+        for _ in workers:
+            self._queue.put(_STOP)
+        for worker in workers:
+            worker.join()
+
+        for result in self._job_results:
+            if result.pop('pending') == 0 and result['status'] == "pending":
+                result['status'] = "done"  # A job without links has nothing to do.
+        return self._job_results
+
+    def _prefetch(self, download_jobs: list[dict]) -> dict[str, dict]:
+        """Looks up every share of the batch. A failed lookup only means the links are downloaded as usual."""
+        links = [link for job in download_jobs for link in job.get('links', [])]
+        self.log_callback(f"Looking up {len(links)} link(s) before downloading...\n")
+        try:
+            share_info = prefetch_share_info(links)
+        except Exception as e:
+            self.log_callback(f"Share lookup failed, downloading in message order: {e}\n")
+            return {}
+        dead = sum(1 for info in share_info.values() if info["state"] == DEAD)
+        known = [info["size"] for info in share_info.values() if info["size"] is not None]
+        self.log_callback(f"{dead} dead share(s) will be skipped; {sum(known) / 1024 ** 3:.2f} GB known to download.\n")
+        return share_info
+
+    # --- Retry Queue ---
+
+    def _next_item(self, new_links) -> tuple | None:
+        """
+        Waits for the next link to hand to the workers: a retry that is due, otherwise a new link.
+
+        Returns:
+            tuple | None: A (job_index, link, attempt) item, or None once every link has its final outcome.
+        """
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, sequence, item = heapq.heappop(self._delayed)
+                    job_index, _, attempt = item
+                    heapq.heappush(self._due, ((attempt, job_index), sequence, item))
+                if self._due:
+                    return heapq.heappop(self._due)[2]
+                item = next(new_links, None)
+                if item is not None:
+                    return item
+                if self._done >= self._total:
+                    return None
+                self._changed.wait(self._delayed[0][0] - now if self._delayed else None)
+
+    def _schedule(self, item: tuple, delay: float) -> None:
+        """Puts a link back in line, to be handed out again after `delay` seconds."""
+        with self._changed:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), item))
+            self._changed.notify_all()
+
+    # --- Worker Internals ---
+
+    def _domain_slot(self, link: str) -> threading.Semaphore:
+        # Keyed like mirror health, so "www." and case variants of a host share their slots.
+        domain = link_domain(link)
+        with self._lock:
+            if domain not in self._domain_slots:
+                self._domain_slots[domain] = threading.Semaphore(self.max_per_domain)
+            return self._domain_slots[domain]
+
+    def _start_driver(self, log: Callable[[str], None], download_dir: str):
+        try:
+            # Only a pipelining worker reads the browser's download events (see TabPipeline).
+            return driver_pool.acquire(log, download_dir, is_headless=self.is_headless, profile=self.browser_profile,
+                                       download_events=self.pipeline_depth > 1)
+        except DriverConnectionError as e:
+            log(f"{e}\n")
+            return None
+
+    def _worker_loop(self, worker_id: int) -> None:
+        """Processes links from the queue until told to stop. Never lets an exception escape."""
+        download_dir = os.path.join(self.download_root, f"worker_{worker_id}")
+        os.makedirs(download_dir, exist_ok=True)
+        driver = None
+
+        def log(msg):
+            self.log_callback(f"[Worker {worker_id}] {msg}")
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                job_index, link, attempt = item
+                slot = self._domain_slot(link)
+                # A full domain must not hold up the worker: the link goes back in line and the
+                # worker takes the next one, which may be of another domain.
+                if not slot.acquire(blocking=False):
+                    self._schedule(item, DOWNLOAD_POLL_INTERVAL)
+                    continue
+                domain = self._admit(item, log)
+                if domain is None:
+                    slot.release()
+                    continue
+
+                downloaded_paths = []
+                timings = {}
+                attempted = False
+                try:
+                    if self.on_link_start:
+                        self.on_link_start(job_index, link)
+                    driver = self._ready_driver(driver, log, download_dir)
+                    if driver is not None:
+                        page_timeout, start_timeout = self.health.timeouts(domain)
+                        log(f"--> Starting download: {link}" + (f" (attempt {attempt})\n" if attempt > 1 else "\n"))
+                        downloaded_paths = download_file_locally(
+                            driver, link, log, download_dir=download_dir, engine=self.engine,
+                            retry_delay=RETRY_EXTRA_TIMEOUT * (attempt - 1),
+                            page_timeout=page_timeout, start_timeout=start_timeout,
+                            progress_callback=self._transfer_progress_callback(job_index, link),
+                            timing_callback=self._timing_callback(job_index, link, timings),
+                        )
+                        attempted = True
+                        driver_pool.note_page(driver)
+                except Exception as e:
+                    log(f"  -> Worker error while downloading {link}: {e}\n")
+                    downloaded_paths = []
+                finally:
+                    slot.release()
+
+                self._complete_try(item, domain, attempted, downloaded_paths, timings, log)
+        finally:
+            if driver is not None:
+                # Keep the browser warm for the next batch (the pool closes it if it shouldn't be reused).
+                driver_pool.release(driver)
+
+    def _pipelined_worker_loop(self, worker_id: int) -> None:
+        """
+        Like _worker_loop, but keeps up to `pipeline_depth` downloads going at once in the worker's
+        browser (see downloader.TabPipeline): while files transfer, the next links are opened and clicked.
+        """
+        download_dir = os.path.join(self.download_root, f"worker_{worker_id}")
+        os.makedirs(download_dir, exist_ok=True)
+        driver = None
+        pipeline = None
+        stopping = False
+
+        def log(msg):
+            self.log_callback(f"[Worker {worker_id}] {msg}")
+
+        def fail_in_flight():
+            # The browser is gone, so are its downloads; none of this says anything about the mirrors.
+            for item, domain, slot, timings in pipeline.abandon():
+                slot.release()
+                self._complete_try(item, domain, False, [], timings, log)
+
+        try:
+            while not stopping or (pipeline is not None and pipeline.in_flight):
+                # 1. Hand on the downloads that ended.
+                if pipeline is not None:
+                    try:
+                        ended = pipeline.poll()
+                    except Exception as e:
+                        log(f"  -> Worker error while checking downloads: {e}\n")
+                        fail_in_flight()
+                        ended = []
+                    for (item, domain, slot, timings), downloaded_paths in ended:
+                        slot.release()
+                        self._complete_try(item, domain, True, downloaded_paths, timings, log)
+
+                # 2. Open another link while there is room, otherwise wait a moment.
+                in_flight = pipeline.in_flight if pipeline is not None else 0
+                if stopping or in_flight >= self.pipeline_depth:
+                    time.sleep(DOWNLOAD_POLL_INTERVAL)
+                    continue
+                try:
+                    # Block only when nothing is running; otherwise the wait doubles as the poll interval.
+                    item = self._queue.get(timeout=DOWNLOAD_POLL_INTERVAL) if in_flight else self._queue.get()
+                except queue.Empty:
+                    continue
+                if item is _STOP:
+                    stopping = True
+                    continue
+
+                job_index, link, attempt = item
+                slot = self._domain_slot(link)
+                # Never block on a slot while holding others: this worker's own downloads may be holding it.
+                if not slot.acquire(blocking=in_flight == 0):
+                    self._schedule(item, DOWNLOAD_POLL_INTERVAL)
+                    continue
+                domain = self._admit(item, log)
+                if domain is None:
+                    slot.release()
+                    continue
+
+                timings = {}
+                downloaded_paths = []
+                attempted = False
+                try:
+                    if self.on_link_start:
+                        self.on_link_start(job_index, link)
+                    if (driver is not None and pipeline is not None and pipeline.in_flight
+                            and not driver_pool.is_healthy(driver)):
+                        # Fail the running downloads while their tabs can still be looked at.
+                        fail_in_flight()
+                    driver = self._ready_driver(driver, log, download_dir, may_recycle=not in_flight)
+                    if driver is not None and (pipeline is None or pipeline.driver is not driver):
+                        if pipeline is not None and pipeline.in_flight:
+                            fail_in_flight()
+                        pipeline = None
+                        try:
+                            pipeline = TabPipeline(driver, download_dir, log)
+                        except Exception:
+                            # The browser and its pipeline go together: without one, the other is no use.
+                            driver_pool.discard(driver)
+                            driver = None
+                            raise
+                    if driver is not None:
+                        page_timeout, start_timeout = self.health.timeouts(domain)
+                        log(f"--> Starting download: {link}" + (f" (attempt {attempt})\n" if attempt > 1 else "\n"))
+                        result = pipeline.start(
+                            link, context=(item, domain, slot, timings),
+                            retry_delay=RETRY_EXTRA_TIMEOUT * (attempt - 1),
+                            page_timeout=page_timeout, start_timeout=start_timeout,
+                            timing_callback=self._timing_callback(job_index, link, timings),
+                        )
+                        attempted = True
+                        driver_pool.note_page(driver)
+                        if result is None:
+                            continue  # Running; poll() reports it.
+                        downloaded_paths = result
+                except Exception as e:
+                    log(f"  -> Worker error while downloading {link}: {e}\n")
+                    downloaded_paths = []
+
+                slot.release()
+                self._complete_try(item, domain, attempted, downloaded_paths, timings, log)
+        finally:
+            if pipeline is not None and pipeline.in_flight:
+                fail_in_flight()
+            if driver is not None:
+                driver_pool.release(driver)
+
+    def _admit(self, item: tuple, log: Callable[[str], None]) -> str | None:
+        """Asks the circuit breaker about a link. Returns its domain if it may be tried now."""
+        job_index, link, _ = item
+        domain = link_domain(link)
+        decision, wait = self.health.admit(domain)
+        if decision == REJECT:
+            log(f"  -> Postponing {link} by {wait:.0f} s: {domain} keeps failing, its circuit breaker is open.\n")
+        if decision in (DEFER, REJECT):
+            self._schedule(item, wait)
+            return None
+        return domain
+
+    def _ready_driver(self, driver, log: Callable[[str], None], download_dir: str, may_recycle: bool = True):
+        """Returns a working browser: `driver` itself, or a new one if it was lost or due for recycling."""
+        if driver is not None and may_recycle and driver_pool.needs_recycling(driver):
+            log("Recycling browser...\n")
+            driver_pool.discard(driver)
+            driver = None
+        if driver is not None and not driver_pool.is_healthy(driver):
+            log("Browser session was lost, starting a new one...\n")
+            driver_pool.discard(driver)
+            driver = None
+        if driver is None:
+            driver = self._start_driver(log, download_dir)
+        return driver
+
+    def _complete_try(self, item: tuple, domain: str, attempted: bool, downloaded_paths: list[str], timings: dict,
+                      log: Callable[[str], None]) -> None:
+        """Records the outcome of one try of a link: it is either put back in line for a retry or finished."""
+        job_index, link, attempt = item
+        self._update_health(domain, attempted, downloaded_paths, timings, log)
+        if not downloaded_paths and self.retry_policy.should_retry(attempt):
+            delay = self.retry_policy.delay(attempt)
+            log(f"  -> FAILED, retrying in {delay:.0f} s (attempt {attempt + 1} of {self.retry_policy.max_attempts}).\n")
+            metrics.inc("download_retries_total")
+            self._schedule((job_index, link, attempt + 1), delay)
+            return
+        self._finish_link(job_index, link, downloaded_paths, log)
+
+    def _update_health(self, domain: str, attempted: bool, downloaded_paths: list[str], timings: dict,
+                       log: Callable[[str], None]) -> None:
+        """Feeds the outcome of one try into the domain's learned timeouts and circuit breaker."""
+        if not attempted:
+            # The browser failed, not the mirror.
+            self.health.abandon(domain)
+        elif downloaded_paths:
+            self.health.record_success(domain, timings.get("page_ready"), timings.get("first_byte"))
+        else:
+            timed_out = "page" if "page_timeout" in timings else "start" if "start_timeout" in timings else None
+            if not any(event in timings for event in MIRROR_FAILURE_EVENTS):
+                # E.g. no download button: the share is gone, the mirror may be fine.
+                self.health.record_inconclusive(domain, timed_out)
+            elif self.health.record_failure(domain, timed_out):
+                log(f"  -> {domain} keeps failing, pausing its links for a while.\n")
+                metrics.inc("circuit_breaker_trips_total", domain=domain)
+
+    def _finish_link(self, job_index: int, link: str, downloaded_paths: list[str], log: Callable[[str], None]) -> None:
+        try:
+            self._record(job_index, link, downloaded_paths, log)
+        except Exception as e:
+            # A failing progress callback must not take the worker (and the batch) down with it.
+            log(f"  -> Could not report progress for {link}: {e}\n")
+
+    def _timing_callback(self, job_index: int, link: str, timings: dict):
+        """Collects the timing events of one try into `timings`, and reports the start of the transfer."""
+        def record(event, seconds):
+            timings[event] = seconds
+            if event == "first_byte" and self.on_transfer_start:
+                try:
+                    self.on_transfer_start(job_index, link)
+                except Exception as e:
+                    # Must not break the transfer that is under way.
+                    self.log_callback(f"  -> Could not report the start of {link}: {e}\n")
+        return record
+
+    def _transfer_progress_callback(self, job_index: int, link: str):
+        if self.on_transfer_progress is None:
+            return None
+        return lambda done, total: self.on_transfer_progress(job_index, link, done, total)
+
+    def _record(self, job_index: int, link: str, downloaded_paths: list[str], log: Callable[[str], None]) -> None:
+        """Records the outcome of one link and fires the progress callbacks."""
+        with self._lock:
+            result = self._job_results[job_index]
+            if downloaded_paths:
+                self.succeeded_count += 1
+                result['downloaded_paths'].extend(downloaded_paths)
+            else:
+                self.failed_count += 1
+                result['failed_links'].append(link)
+            result['pending'] -= 1
+            job_finished = result['pending'] == 0
+            if job_finished:
+                result['status'] = "failed" if result['failed_links'] else "done"
+            self._done += 1
+            progress = (self._done, self._total, self.succeeded_count, self.failed_count)
+            self._changed.notify_all()
+
+        log("  -> SUCCESS!\n" if downloaded_paths else "  -> FAILED.\n")
+        if self.on_link_done:
+            self.on_link_done({"job_index": job_index, "link": link, "downloaded_paths": downloaded_paths,
+                               "success": bool(downloaded_paths), "share_info": self._share_info.get(link)})
+        if job_finished and self.on_job_done:
+            finished_job = dict(result, job_index=job_index)
+            finished_job.pop('pending')
+            self.on_job_done(finished_job)
+        if self.on_progress:
+            self.on_progress(*progress)
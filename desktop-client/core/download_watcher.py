@@ -0,0 +1,171 @@
+# core/download_watcher.py
+# This module detects finished browser downloads in a folder as soon as they happen.
+# On Linux it listens to inotify events; everywhere else it falls back to polling.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable
+
+from .config import DOWNLOAD_POLL_INTERVAL, DOWNLOAD_TIMEOUT, DOWNLOAD_START_TIMEOUT_DEFAULT
+
+# Browsers write into a temporary file and rename it to its final name once the transfer is done.
+TEMP_DOWNLOAD_SUFFIXES = ('.crdownload', '.tmp')
+
+# --- inotify constants (see <sys/inotify.h>) ---
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _load_libc():
+    """Returns libc if inotify is available on this system, otherwise None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1  # Raises AttributeError if the symbol is missing
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+_libc = _load_libc()
+
+
+def _is_temp_file(name: str) -> bool:
+    return name.endswith(TEMP_DOWNLOAD_SUFFIXES)
+
+
+class DownloadWatcher:
+    """
+    Watches a download folder for files that appear after the watcher was created.
+
+    Create the watcher *before* starting a download, so nothing that happens in between is missed.
+    Use it as a context manager so the inotify handle is always released.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = DOWNLOAD_POLL_INTERVAL,
+                 files_before: set[str] | None = None):
+        """
+        Args:
+            directory (str): The folder the browser saves its downloads to.
+            poll_interval (float): Seconds between folder scans when inotify is not available.
+            files_before (set[str] | None): Files to ignore. Defaults to the folder's current content.
+        """
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._fd = None
+        if _libc is not None:
+            fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                mask = _IN_CREATE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_CLOSE_WRITE | _IN_DELETE
+                if _libc.inotify_add_watch(fd, os.fsencode(directory), mask) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        self._files_before = set(files_before) if files_before is not None else set(os.listdir(directory))
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def close(self) -> None:
+        """Releases the inotify handle."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _new_files(self) -> set[str]:
+        return set(os.listdir(self.directory)) - self._files_before
+
+    def _wait_for_changes(self, timeout: float) -> list[str]:
+        """
+        Blocks until something changes in the folder (or the timeout expires).
+
+        Returns:
+            list[str]: The names of files that just reached their final name, if the backend can tell.
+        """
+        if self._fd is None:
+            time.sleep(max(0.0, min(timeout, self.poll_interval)))
+            return []
+
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        finished = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0").decode(sys.getfilesystemencoding(), "replace")
+            offset += name_length
+            # A temp file renamed to its final name, or a file written directly under its final name.
+            if mask & (_IN_MOVED_TO | _IN_CLOSE_WRITE) and name and not _is_temp_file(name):
+                finished.append(name)
+        return finished
+
+    def wait_for_downloads(self, log_callback: Callable[[str], None], timeout: float = DOWNLOAD_TIMEOUT,
+                           start_timeout: float = DOWNLOAD_START_TIMEOUT_DEFAULT,
+                           on_file_complete: Callable[[str], None] | None = None,
+                           on_download_started: Callable[[], None] | None = None) -> list[str]:
+        """
+        Waits until the downloads started after the watcher was created have completed.
+        A download is complete when its '.crdownload' or '.tmp' file is gone.
+
+        Args:
+            log_callback (function): Function to send log messages to the UI.
+            timeout (float): Maximum seconds to wait for all downloads to finish.
+            start_timeout (float): Give up if no new file has appeared after this many seconds.
+            on_file_complete (function): Called with the path of each file the moment it gets its final name.
+            on_download_started (function): Called once, when the first new file appears.
+
+        Returns:
+            list[str]: The paths of the completed files, or an empty list on failure.
+        """
+        start_time = time.monotonic()
+        started = False
+        while True:
+            new_files = self._new_files()
+            if new_files and not started:
+                started = True
+                if on_download_started:
+                    on_download_started()
+            still_downloading = any(_is_temp_file(f) for f in new_files)
+
+            if new_files and not still_downloading:
+                completed_paths = [os.path.join(self.directory, f) for f in new_files]
+                log_callback(f"  -> Detected {len(completed_paths)} completed download(s).\n")
+                return completed_paths
+
+            elapsed = time.monotonic() - start_time
+            # Smart Exit: If no new file has even started after start_timeout, assume failure.
+            if not new_files and elapsed > start_timeout:
+                return []
+            if elapsed > timeout:
+                log_callback(f"  -> ERROR: Download timed out after {int(timeout)} seconds.\n")
+                return []
+
+            deadline = timeout if new_files else start_timeout
+            for name in self._wait_for_changes(deadline - elapsed):
+                if on_file_complete:
+                    on_file_complete(os.path.join(self.directory, name))
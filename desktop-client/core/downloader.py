@@ -1,17 +1,16 @@
 # core/downloader.py
 # This module handles all browser automation and file downloading tasks.
 
+import json
 import os
+import threading
 import time
-import shutil
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException, InvalidSessionIdException
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 
 # Try to import Brave support, but don't crash if it's not there
 try:
@@ -20,25 +19,134 @@ except ImportError:
     BraveDriverManager = None
 
 # Assumes these are defined in your core.config file
-from .config import LOCAL_DOWNLOAD_FOLDER, SORTED_OUTPUT_FOLDER, BRAVE_BROWSER_PATH, APP_DIR
+from .config import LOCAL_DOWNLOAD_FOLDER, SORTED_OUTPUT_FOLDER, BRAVE_BROWSER_PATH, APP_DIR, DOWNLOAD_ENGINE, DRIVER_CACHE_FILE
+from .config import BROWSER_PROFILE, LEAN_BLOCKED_RESOURCE_TYPES, LEAN_BLOCKED_URL_PATTERNS
+from .config import PAGE_TIMEOUT_DEFAULT, DOWNLOAD_START_TIMEOUT_DEFAULT, DOWNLOAD_TIMEOUT
+from .download_watcher import DownloadWatcher
+from .file_placement import place_file, claim_destination
+from . import http_transfer
+from .metrics import metrics
 
 # --- Constants ---
 # Centralize the locator for the main download button for easy updates
 TERABOX_DOWNLOAD_BUTTON_LOCATOR = (By.XPATH, "//div[contains(@class, 'btn-text') and normalize-space()='Downloads']")
 
+# Reads the browser's download list from chrome://downloads (used by the HTTP engine to find the file URL).
+# Depending on the browser version, item.url is either a string or a {url: ...} object.
+_DOWNLOAD_ITEMS_SCRIPT = """
+const manager = document.querySelector('downloads-manager');
+const list = manager && manager.shadowRoot && manager.shadowRoot.querySelector('#downloadsList');
+if (!list || !list.items) return null;
+return list.items.map(item => ({
+    id: String(item.id),
+    url: typeof item.url === 'string' ? item.url : (item.url && item.url.url) || ''
+}));
+"""
+
+
+# Browser profiles (see BROWSER_PROFILE in core/config.py).
+PROFILE_LEAN = "lean"
+PROFILE_FULL = "full"
+
+# timing_callback events that mean the mirror itself failed: it could not be reached, the transfer
+# broke off or got an HTTP error, or the download did not start after the click. A page without a
+# download button is not one of them; that is usually the share, not the mirror.
+MIRROR_FAILURE_EVENTS = ("connection_error", "transfer_error", "start_timeout")
+
+# URL patterns of the resource types the lean profile can block. Patterns only match a file name at
+# the end of the path, so a download link that carries a file name in its query is never blocked.
+# Images are turned off with a content setting instead (see setup_driver): that stops the page from
+# requesting them at all, and image shares still download.
+_RESOURCE_TYPE_PATTERNS = {
+    "font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "stylesheet": ("css",),
+}
+
+# Browser features the downloads never use; off in the lean profile.
+_LEAN_ARGUMENTS = (
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+)
+
+
+def blocked_url_patterns(resource_types=LEAN_BLOCKED_RESOURCE_TYPES, url_patterns=LEAN_BLOCKED_URL_PATTERNS):
+    """
+    Returns the URL patterns (for the DevTools Network.setBlockedURLs command) the lean profile blocks.
+
+    Args:
+        resource_types (list[str]): Resource types to block, e.g. "font". "image" needs no pattern.
+        url_patterns (list[str]): Further patterns, used as they are.
+    """
+    patterns = []
+    for resource_type in resource_types:
+        for extension in _RESOURCE_TYPE_PATTERNS.get(resource_type, ()):
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+    return patterns + list(url_patterns)
+
 
 class DriverConnectionError(Exception):
     """Custom exception for when the WebDriver fails to initialize."""
     pass
 
 
-def setup_driver(log_callback, is_headless=False):
+# --- Driver Resolution Cache ---
+# Remembers which browser and driver binary worked last time, so later runs can start the
+# browser straight away instead of walking the fallbacks and asking webdriver-manager online.
+
+def _load_driver_choice():
+    """Returns the cached browser/driver choice, or None if there is no usable one."""
+    try:
+        with open(DRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+            choice = json.load(f)
+        if not os.path.exists(choice["driver_path"]):
+            return None
+        if choice.get("binary_location") and not os.path.exists(choice["binary_location"]):
+            return None
+        return choice
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _save_driver_choice(browser, driver_path, binary_location=None):
+    # Written to a temporary file and renamed into place, so browsers started at the same time
+    # (or a crash) never leave a half-written cache behind.
+    temp_path = f"{DRIVER_CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"browser": browser, "driver_path": driver_path, "binary_location": binary_location}, f)
+        os.replace(temp_path, DRIVER_CACHE_FILE)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+def _clear_driver_choice():
+    try:
+        os.remove(DRIVER_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def setup_driver(log_callback, is_headless=False, download_dir=LOCAL_DOWNLOAD_FOLDER, profile=BROWSER_PROFILE,
+                 download_events=False):
     """
-    Sets up the WebDriver with a priority list: Local Brave -> Edge -> Chrome -> Online Fallbacks.
+    Sets up the WebDriver with a priority list: Last working choice -> Local Brave -> Edge -> Chrome -> Online Fallbacks.
+    The browser and driver binary that worked are cached, so later runs skip the fallbacks and the online lookup.
     
     Args:
         log_callback (function): A function to send log messages back to the UI.
         is_headless (bool): Whether to run the browser in headless mode.
+        download_dir (str): The folder this browser saves its downloads to.
+        profile (str): PROFILE_LEAN or PROFILE_FULL (see BROWSER_PROFILE in core/config.py).
+        download_events (bool): Record the page events (among them the download events) in
+            ChromeDriver's performance log, as TabPipeline needs. Off otherwise: nobody would read them.
 
     Returns:
         A Selenium WebDriver instance, or raises DriverConnectionError if all attempts fail.
@@ -48,20 +156,64 @@ def setup_driver(log_callback, is_headless=False):
         options.add_argument("--headless")
     options.add_argument("--disable-gpu")
     options.add_argument("--window-size=1280,720")
+    prefs = {
+        "download.default_directory": os.path.abspath(download_dir),
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        # Shares with several files start several downloads; never ask whether that is allowed.
+        "profile.default_content_setting_values.automatic_downloads": 1,
+    }
+    if profile == PROFILE_LEAN:
+        # Return from driver.get() once the page can be scripted; the button wait covers the rest.
+        options.page_load_strategy = "eager"
+        for argument in _LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        prefs.update({
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_setting_values.geolocation": 2,
+        })
+        if "image" in LEAN_BLOCKED_RESOURCE_TYPES:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            prefs["profile.managed_default_content_settings.images"] = 2
+    elif profile != PROFILE_FULL:
+        log_callback(f"Unknown browser profile '{profile}', using the full profile.\n")
+        profile = PROFILE_FULL
+    options.add_experimental_option("prefs", prefs)
+    if download_events:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": False, "enablePage": True})
     
     driver = None
+
+    # --- Priority 0: The browser and driver that worked last time ---
+    cached_choice = _load_driver_choice()
+    if cached_choice:
+        try:
+            log_callback(f"Using cached {cached_choice['browser']} driver...\n")
+            if cached_choice.get("binary_location"):
+                options.binary_location = cached_choice["binary_location"]
+            service = Service(executable_path=cached_choice["driver_path"])
+            driver = webdriver.Chrome(service=service, options=options)
+            log_callback(f"Successfully connected using cached {cached_choice['browser']} driver!\n")
+        except Exception as e:
+            log_callback(f"Cached driver failed: {e}\n")
+            _clear_driver_choice()
+            options.binary_location = ""
+            driver = None
     
     # --- Priority 1: Local Brave Driver ---
     local_chrome_driver_path = os.path.join(APP_DIR, "drivers", "chromedriver.exe")
-    if BraveDriverManager and os.path.exists(local_chrome_driver_path) and os.path.exists(BRAVE_BROWSER_PATH):
+    if driver is None and BraveDriverManager and os.path.exists(local_chrome_driver_path) and os.path.exists(BRAVE_BROWSER_PATH):
         try:
             log_callback("Attempting to use local driver with Brave Browser...\n")
             options.binary_location = BRAVE_BROWSER_PATH
             service = Service(executable_path=local_chrome_driver_path)
             driver = webdriver.Chrome(service=service, options=options)
+            _save_driver_choice("Brave", local_chrome_driver_path, BRAVE_BROWSER_PATH)
             log_callback("Successfully connected using local driver for Brave!\n")
         except Exception as e:
             log_callback(f"Local Brave driver failed: {e}\n")
+            options.binary_location = ""
             driver = None
 
     # --- Other browser priorities would follow the same pattern... ---
@@ -72,8 +224,12 @@ def setup_driver(log_callback, is_headless=False):
         log_callback("Local drivers failed. Falling back to online webdriver-manager...\n")
         try:
             log_callback("Attempting to connect with Chrome (online)...\n")
-            service = Service(ChromeDriverManager().install())
+            # Imported here: webdriver-manager is slow to import and only needed for this last resort.
+            from webdriver_manager.chrome import ChromeDriverManager
+            driver_path = ChromeDriverManager().install()
+            service = Service(driver_path)
             driver = webdriver.Chrome(service=service, options=options)
+            _save_driver_choice("Chrome", driver_path)
             log_callback("Successfully connected to Chrome (online)!\n")
         except Exception as e:
             log_callback(f"Chrome (online) also failed: {e}\n")
@@ -82,6 +238,10 @@ def setup_driver(log_callback, is_headless=False):
     if driver is None:
         raise DriverConnectionError("FATAL: Could not connect to any browser.")
 
+    # DevTools settings only apply to one tab, so _prepare_tab() applies these to every new tab.
+    driver.browser_profile = profile
+    driver.blocked_url_patterns = blocked_url_patterns() if profile == PROFILE_LEAN else []
+
     if not is_headless:
         driver.minimize_window()
         log_callback("Browser launched and minimized.\n")
@@ -89,7 +249,171 @@ def setup_driver(log_callback, is_headless=False):
     return driver
 
 
-def download_file_locally(driver, url, log_callback, retry_delay=0):
+def point_downloads_to(driver, download_dir):
+    """Makes a running browser save its downloads into the given folder, without prompting."""
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": os.path.abspath(download_dir)})
+
+
+class _TransferTimer:
+    """Times one download from the click to its first byte, and from there to the end of the transfer."""
+
+    def __init__(self, engine, timing_callback=None):
+        self.engine = engine
+        self.timing_callback = timing_callback
+        self.clicked = time.perf_counter()
+        self.first_byte = None
+        self._lock = threading.Lock()
+
+    def mark_click(self):
+        self.clicked = time.perf_counter()
+
+    def mark_first_byte(self):
+        with self._lock:
+            if self.first_byte is not None:
+                return
+            self.first_byte = time.perf_counter()
+        metrics.observe_stage("click_to_first_byte", self.first_byte - self.clicked, self.clicked, engine=self.engine)
+        if self.timing_callback:
+            self.timing_callback("first_byte", self.first_byte - self.clicked)
+
+    def finish(self, paths):
+        """Records the transfer time and throughput of the completed files."""
+        if self.first_byte is None or not paths:
+            return
+        seconds = time.perf_counter() - self.first_byte
+        metrics.observe_stage("transfer", seconds, self.first_byte, engine=self.engine)
+        size = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        metrics.record_transfer(size, seconds, engine=self.engine)
+
+
+def _resolve_direct_download(driver, download_button, download_dir, log_callback, timeout=20, timer=None):
+    """
+    Clicks the download button with browser downloads disabled and reads the real file URL
+    from the browser's download list, together with the session cookies and headers.
+
+    Returns:
+        tuple | None: (file_url, cookies, headers), or None if no download was started in time.
+    """
+    share_tab = driver.current_window_handle
+    share_url = driver.current_url
+    downloads_tab = None
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "deny"})
+    try:
+        driver.switch_to.new_window('tab')
+        downloads_tab = driver.current_window_handle
+        driver.get("chrome://downloads")
+        known_ids = {item['id'] for item in driver.execute_script(_DOWNLOAD_ITEMS_SCRIPT) or []}
+
+        driver.switch_to.window(share_tab)
+        if timer:
+            timer.mark_click()
+        download_button.click()
+        driver.switch_to.window(downloads_tab)
+
+        deadline = time.monotonic() + timeout
+        file_url = None
+        while file_url is None and time.monotonic() < deadline:
+            new_items = [item for item in driver.execute_script(_DOWNLOAD_ITEMS_SCRIPT) or []
+                         if item['id'] not in known_ids and item['url']]
+            if new_items:
+                file_url = new_items[0]['url']
+            else:
+                time.sleep(0.2)
+        if file_url is None:
+            return None
+
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+        headers = {"User-Agent": driver.execute_script("return navigator.userAgent"), "Referer": share_url}
+        log_callback("  -> Resolved the direct file URL.\n")
+        return file_url, cookies, headers
+    finally:
+        if downloads_tab and downloads_tab in driver.window_handles:
+            driver.switch_to.window(downloads_tab)
+            driver.close()
+        driver.switch_to.window(share_tab)
+        point_downloads_to(driver, download_dir)
+
+
+def _download_over_http(driver, download_button, download_dir, log_callback, progress_callback,
+                        start_timeout=DOWNLOAD_START_TIMEOUT_DEFAULT, timing_callback=None):
+    """
+    Lets the browser resolve the file URL, then transfers the file with the HTTP engine.
+
+    Returns:
+        list[str] | None: The downloaded file paths, an empty list if the transfer failed,
+            or None if the URL could not be resolved (the browser should download it instead).
+    """
+    timer = _TransferTimer("http", timing_callback)
+    resolved = _resolve_direct_download(driver, download_button, download_dir, log_callback, start_timeout, timer)
+    if resolved is None:
+        return None
+    file_url, cookies, headers = resolved
+
+    def on_progress(bytes_done, total_bytes):
+        timer.mark_first_byte()
+        if progress_callback:
+            progress_callback(bytes_done, total_bytes)
+
+    try:
+        paths = [http_transfer.download_file(file_url, download_dir, log_callback, headers=headers,
+                                             cookies=cookies, progress_callback=on_progress)]
+        timer.finish(paths)
+        return paths
+    except http_transfer.TransferError as e:
+        log_callback(f"  -> ERROR: {e}\n")
+        if timing_callback:
+            timing_callback("transfer_error", None)
+        return []
+
+
+def _prepare_tab(driver):
+    """Makes the current tab skip the resources its browser's profile blocks."""
+    patterns = getattr(driver, "blocked_url_patterns", None)
+    if patterns:
+        # No response buffers: nothing ever reads the bodies, and they would only take up memory.
+        driver.execute_cdp_cmd("Network.enable", {"maxTotalBufferSize": 0, "maxResourceBufferSize": 0})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+def _open_share_page(driver, url, log_callback, page_timeout, report):
+    """
+    Loads a share page in the current tab and waits for its download button. The time from
+    navigation to a clickable button is recorded per browser profile (the "page_to_button" stage).
+
+    Returns:
+        WebElement: The clickable download button.
+
+    Raises:
+        TimeoutException: If the button did not become clickable within page_timeout seconds.
+    """
+    _prepare_tab(driver)
+    opened = time.perf_counter()
+    with metrics.span("page_load"):
+        try:
+            driver.get(url)
+        except WebDriverException as e:
+            if "net::ERR_" in str(e):
+                report("connection_error")  # The mirror could not be reached.
+            raise
+
+    wait = WebDriverWait(driver, page_timeout)
+    log_callback(f"  -> Waiting for download button...\n")
+    with metrics.span("button_wait"):
+        try:
+            download_button = wait.until(EC.element_to_be_clickable(TERABOX_DOWNLOAD_BUTTON_LOCATOR))
+        except TimeoutException:
+            report("page_timeout")
+            raise
+    seconds = time.perf_counter() - opened
+    metrics.observe_stage("page_to_button", seconds, opened, profile=getattr(driver, "browser_profile", PROFILE_FULL))
+    report("page_ready", seconds)
+    return download_button
+
+
+def download_file_locally(driver, url, log_callback, retry_delay=0, download_dir=LOCAL_DOWNLOAD_FOLDER,
+                          engine=DOWNLOAD_ENGINE, progress_callback=None, page_timeout=PAGE_TIMEOUT_DEFAULT,
+                          start_timeout=DOWNLOAD_START_TIMEOUT_DEFAULT, download_timeout=DOWNLOAD_TIMEOUT,
+                          timing_callback=None):
     """
     Navigates to a TeraBox URL in a new tab, clicks the download button,
     and waits for the file to finish downloading.
@@ -98,11 +422,30 @@ def download_file_locally(driver, url, log_callback, retry_delay=0):
         driver: The active Selenium WebDriver instance.
         url (str): The TeraBox URL to download from.
         log_callback (function): Function to send log messages to the UI.
-        retry_delay (int): Optional extra delay for retry attempts.
+        retry_delay (float): Extra seconds allowed for the page and the download to start, giving slow
+            mirrors more time on retry attempts.
+        download_dir (str): The folder the driver saves its downloads to.
+        engine (str): "browser" to let the browser transfer the file, or "http" to only resolve the
+            file URL in the browser and transfer it with the segmented, resumable HTTP engine.
+        progress_callback (function): Called with (bytes_done, total_bytes) by the HTTP engine.
+        page_timeout (float): Seconds to wait for the download button (the scheduler learns them per mirror).
+        start_timeout (float): Seconds to wait for the download to start after the click.
+        download_timeout (float): Maximum seconds the download may take once started.
+        timing_callback (function): Called with (event, seconds) as the download progresses:
+            ("page_ready", seconds from opening the page to a clickable button), ("first_byte",
+            seconds from the click to the first data), ("page_timeout", None) and
+            ("start_timeout", None) when a timeout expired, ("connection_error", None) if the
+            share page could not be reached, or ("transfer_error", None) if a started transfer failed.
 
     Returns:
         list[str]: A list of paths to the newly downloaded files, or an empty list on failure.
     """
+    def report(event, seconds=None):
+        if timing_callback:
+            timing_callback(event, seconds)
+
+    page_timeout += retry_delay
+    start_timeout += retry_delay
     original_window = driver.current_window_handle
     new_tab = None
     try:
@@ -110,20 +453,34 @@ def download_file_locally(driver, url, log_callback, retry_delay=0):
         log_callback(f"  -> Opening URL in new tab...\n")
         driver.switch_to.new_window('tab')
         new_tab = driver.current_window_handle
-        driver.get(url)
-        
+
         # 2. Intelligently wait for the download button to be ready
-        wait = WebDriverWait(driver, 20) # 20-second timeout
-        log_callback(f"  -> Waiting for download button...\n")
-        download_button = wait.until(EC.element_to_be_clickable(TERABOX_DOWNLOAD_BUTTON_LOCATOR))
+        download_button = _open_share_page(driver, url, log_callback, page_timeout, report)
         
         # 3. Click the button and start monitoring
         log_callback(f"  -> Clicking download button...\n")
-        files_before = set(os.listdir(LOCAL_DOWNLOAD_FOLDER))
-        download_button.click()
-        
-        log_callback(f"  -> Monitoring download folder for new files...\n")
-        return _wait_for_downloads_and_get_paths(LOCAL_DOWNLOAD_FOLDER, files_before)
+        if engine == "http":
+            downloaded_paths = _download_over_http(driver, download_button, download_dir, log_callback,
+                                                   progress_callback, start_timeout, timing_callback)
+            if downloaded_paths is not None:
+                return downloaded_paths
+            log_callback("  -> Could not resolve a direct file URL, letting the browser download it...\n")
+            download_button = driver.find_element(*TERABOX_DOWNLOAD_BUTTON_LOCATOR)
+
+        # Start watching before the click, so the download can't start unnoticed.
+        with DownloadWatcher(download_dir) as watcher:
+            timer = _TransferTimer("browser", timing_callback)
+            download_button.click()
+
+            log_callback(f"  -> Monitoring download folder for new files...\n")
+            downloaded_paths = watcher.wait_for_downloads(log_callback, timeout=download_timeout, start_timeout=start_timeout,
+                                                          on_download_started=timer.mark_first_byte)
+            if timer.first_byte is None:
+                report("start_timeout")
+            elif not downloaded_paths:
+                report("transfer_error")
+            timer.finish(downloaded_paths)
+            return downloaded_paths
 
     except TimeoutException:
         log_callback(f"  -> ERROR: Page timed out or download button not found for {url}\n")
@@ -149,49 +506,274 @@ def download_file_locally(driver, url, log_callback, retry_delay=0):
             log_callback("  -> Could not clean up tabs, session may have been closed.\n")
 
 
-def _wait_for_downloads_and_get_paths(download_path, files_before, timeout=600):
+class _TabDownload:
+    """One download running in its own tab, as tracked by TabPipeline."""
+
+    def __init__(self, context, url, tab, timer, start_timeout, download_timeout, report):
+        self.context = context
+        self.url = url
+        self.tab = tab
+        self.timer = timer
+        self.report = report
+        # The files this tab started, by download GUID: {"name": suggested file name, "state": "inProgress",
+        # "completed" or "canceled"}.
+        self.files: dict[str, dict] = {}
+        now = time.monotonic()
+        self.start_deadline = now + start_timeout
+        self.deadline = now + download_timeout
+
+    def check(self, log_callback):
+        """Returns True once every file of the download ended, False if it failed, or None while it is running."""
+        if self.files and all(f["state"] != "inProgress" for f in self.files.values()):
+            if any(f["state"] == "completed" for f in self.files.values()):
+                return True
+            self.report("transfer_error")
+            log_callback(f"  -> ERROR: The download of {self.url} was interrupted.\n")
+            return False
+        now = time.monotonic()
+        if not self.files and now > self.start_deadline:
+            self.report("start_timeout")
+            log_callback(f"  -> ERROR: The download of {self.url} did not start.\n")
+            return False
+        if now > self.deadline:
+            self.report("transfer_error")
+            log_callback(f"  -> ERROR: The download of {self.url} timed out.\n")
+            return False
+        return None
+
+
+def _target_id(window_handle):
+    """The DevTools target ID of a window handle (old ChromeDriver versions prefix it with "CDwindow-")."""
+    return window_handle[len("CDwindow-"):] if window_handle.startswith("CDwindow-") else window_handle
+
+
+class TabPipeline:
+    """
+    Keeps several browser downloads going at once in one browser session.
+
+    Every link gets its own tab. After the click, start() returns right away and the next link can
+    be opened while the earlier files are still transferring; poll() hands back the downloads that
+    ended and closes their tabs.
+
+    Downloads are told apart by the browser's own download events rather than by folder: the
+    browser saves every file under its download GUID (Browser.setDownloadBehavior "allowAndName"),
+    and the Page.downloadWillBegin event, read from ChromeDriver's performance log, says which tab
+    started it. The browser must be started with download_events=True (see setup_driver). A file
+    started by a tab that was already given up on is cancelled, so it is never taken for another
+    link's file.
+
+    A WebDriver must only be used by one thread, so the owner calls start() and poll() in turn.
+    """
+
+    def __init__(self, driver, download_dir, log_callback):
+        """
+        Args:
+            driver: The Selenium WebDriver instance this pipeline drives.
+            download_dir (str): The worker's download folder.
+            log_callback (function): Function to send log messages to the UI.
+        """
+        self.driver = driver
+        self.download_dir = download_dir
+        self.log_callback = log_callback
+        self._home = driver.current_window_handle
+        self._downloads: list[_TabDownload] = []
+        self._by_guid: dict[str, _TabDownload] = {}
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior",
+                               {"behavior": "allowAndName", "downloadPath": os.path.abspath(download_dir)})
+        driver.get_log("performance")  # Skip the events of pages opened before.
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._downloads)
+
+    def _close_tab(self, tab) -> None:
+        try:
+            if tab in self.driver.window_handles:
+                self.driver.switch_to.window(tab)
+                self.driver.close()
+            self.driver.switch_to.window(self._home)
+        except (WebDriverException, InvalidSessionIdException):
+            self.log_callback("  -> Could not clean up tabs, session may have been closed.\n")
+
+    def _cancel(self, guid) -> None:
+        try:
+            self.driver.execute_cdp_cmd("Browser.cancelDownload", {"guid": guid})
+        except WebDriverException:
+            pass  # Already finished; the file is removed below.
+        path = os.path.join(self.download_dir, guid)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _read_events(self) -> None:
+        """Assigns the download events the browser sent since the last call to their tabs."""
+        downloads_by_tab = {_target_id(download.tab): download for download in self._downloads}
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])
+                event = message["message"]
+                method, params = event["method"], event.get("params", {})
+            except (KeyError, TypeError, ValueError):
+                continue
+            if method == "Page.downloadWillBegin":
+                download = downloads_by_tab.get(message.get("webview") or params.get("frameId"))
+                if download is None:
+                    self._cancel(params["guid"])
+                    continue
+                download.files[params["guid"]] = {"name": params.get("suggestedFilename") or params["guid"],
+                                                  "state": "inProgress"}
+                self._by_guid[params["guid"]] = download
+                download.timer.mark_first_byte()
+            elif method == "Page.downloadProgress" and params.get("state") in ("completed", "canceled"):
+                download = self._by_guid.get(params.get("guid"))
+                if download is not None:
+                    download.files[params["guid"]]["state"] = params["state"]
+
+    def _finish(self, download, succeeded) -> list[str]:
+        """Gives the completed files of a download their real names, and drops the rest."""
+        paths = []
+        for guid, file in download.files.items():
+            self._by_guid.pop(guid, None)
+            path = os.path.join(self.download_dir, guid)
+            if not succeeded or file["state"] != "completed":
+                self._cancel(guid)
+            elif os.path.exists(path):
+                final_path = claim_destination(self.download_dir, os.path.basename(file["name"].replace("\\", "/")) or guid)
+                os.replace(path, final_path)
+                paths.append(final_path)
+        return paths
+
+    def start(self, url, context=None, retry_delay=0, page_timeout=PAGE_TIMEOUT_DEFAULT,
+              start_timeout=DOWNLOAD_START_TIMEOUT_DEFAULT, download_timeout=DOWNLOAD_TIMEOUT, timing_callback=None):
+        """
+        Opens a share in a new tab and clicks its download button, without waiting for the file.
+
+        Args:
+            url (str): The TeraBox URL to download from.
+            context: Any value; poll() returns it with the download's result.
+            retry_delay, page_timeout, start_timeout, download_timeout, timing_callback:
+                As for download_file_locally().
+
+        Returns:
+            list[str] | None: None if the download is now running (its result comes from poll()),
+                or an empty list if it failed before it could start.
+        """
+        def report(event, seconds=None):
+            if timing_callback:
+                timing_callback(event, seconds)
+
+        tab = None
+        try:
+            self.log_callback(f"  -> Opening URL in new tab...\n")
+            self.driver.switch_to.new_window('tab')
+            tab = self.driver.current_window_handle
+            download_button = _open_share_page(self.driver, url, self.log_callback, page_timeout + retry_delay, report)
+            timer = _TransferTimer("browser", timing_callback)
+            # Tracked before the click, so a download that begins right away is already assigned to this tab.
+            self._downloads.append(_TabDownload(context, url, tab, timer, start_timeout + retry_delay,
+                                                download_timeout, report))
+            self.log_callback(f"  -> Clicking download button...\n")
+            download_button.click()
+        except TimeoutException:
+            self.log_callback(f"  -> ERROR: Page timed out or download button not found for {url}\n")
+        except Exception as e:
+            self.log_callback(f"  -> FATAL ERROR during download for {url}: {e}\n")
+        else:
+            try:
+                self.driver.switch_to.window(self._home)
+            except (WebDriverException, InvalidSessionIdException):
+                pass  # The next call on the driver will report the lost session.
+            return None
+        self._downloads = [download for download in self._downloads if download.tab != tab]
+        if tab is not None:
+            self._close_tab(tab)
+        return []
+
+    def poll(self) -> list[tuple]:
+        """
+        Checks every running download without waiting.
+
+        Returns:
+            list[tuple]: (context, paths) for each download that ended since the last call;
+                paths is empty if the download failed.
+        """
+        self._read_events()
+        ended = []
+        for download in list(self._downloads):
+            succeeded = download.check(self.log_callback)
+            if succeeded is None:
+                continue
+            self._downloads.remove(download)
+            self._close_tab(download.tab)
+            paths = self._finish(download, succeeded)
+            if paths:
+                self.log_callback(f"  -> Detected {len(paths)} completed download(s) for {download.url}.\n")
+                download.timer.finish(paths)
+            ended.append((download.context, paths))
+        return ended
+
+    def abandon(self) -> list:
+        """
+        Gives up on every running download, e.g. when the browser crashed.
+
+        Returns:
+            list: The contexts of the abandoned downloads.
+        """
+        contexts = []
+        for download in self._downloads:
+            self._close_tab(download.tab)
+            try:
+                self._finish(download, False)
+            except OSError:
+                pass
+            contexts.append(download.context)
+        self._downloads = []
+        return contexts
+
+
+def _wait_for_downloads_and_get_paths(download_path, files_before, log_callback, timeout=DOWNLOAD_TIMEOUT):
     """
-    Monitors the download directory for new files and waits for them to complete.
+    Waits for new files in the download directory to complete.
     A file is considered complete when its '.crdownload' or '.tmp' extension is gone.
+
+    Prefer creating a DownloadWatcher before starting the download; this helper
+    exists for callers that only have a snapshot of the folder.
     """
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        files_after = set(os.listdir(download_path))
-        new_files = files_after - files_before
-        
-        # Smart Exit: If no new file has even started after 15s, assume failure.
-        if not new_files and (time.time() - start_time) > 15:
-            return []
-        
-        # Check if any of the new files are still being downloaded
-        is_still_downloading = any(f.endswith(('.crdownload', '.tmp')) for f in new_files)
-        
-        if new_files and not is_still_downloading:
-            completed_paths = [os.path.join(download_path, f) for f in new_files if not f.endswith(('.crdownload', '.tmp'))]
-            log_callback(f"  -> Detected {len(completed_paths)} completed download(s).\n")
-            return completed_paths
-            
-        time.sleep(2)
-        
-    log_callback("  -> ERROR: Download timed out after 10 minutes.\n")
-    return []
+    with DownloadWatcher(download_path, files_before=files_before) as watcher:
+        return watcher.wait_for_downloads(log_callback, timeout=timeout)
+
+
+def sorted_folder(job_details):
+    """Returns the folder a job's files are sorted into: by job type, then by the job's folder name."""
+    job_type_folder = "Single_File_Downloads" if job_details['type'] == 'SINGLE' else "Multi_File_Downloads"
+    return os.path.join(SORTED_OUTPUT_FOLDER, job_type_folder, job_details['folder_name'])
 
 
 def sort_downloaded_files(downloaded_paths, job_details):
     """
     Moves completed downloads to a structured folder based on job details.
+
+    Files are renamed into place (no copying on the same drive), and a file whose content is
+    already in the sorted folder is hard-linked or removed instead of being stored again
+    (see core/file_placement.py).
+
+    Returns:
+        list[str]: The paths of the placed files.
     """
     if not downloaded_paths:
-        return
-    
-    job_type_folder = "Single_File_Downloads" if job_details['type'] == 'SINGLE' else "Multi_File_Downloads"
-    destination_folder = os.path.join(SORTED_OUTPUT_FOLDER, job_type_folder, job_details['folder_name'])
-    
-    os.makedirs(destination_folder, exist_ok=True)
+        return []
+    with metrics.span("sort"):
+        destination_folder = sorted_folder(job_details)
+        os.makedirs(destination_folder, exist_ok=True)
 
-    for source_path in downloaded_paths:
-        if os.path.exists(source_path):
-            try:
-                shutil.move(source_path, destination_folder)
-            except Exception as e:
-                print(f"ERROR moving file '{os.path.basename(source_path)}': {e}")
\ No newline at end of file
+        placed_paths = []
+        for source_path in downloaded_paths:
+            if os.path.exists(source_path):
+                try:
+                    placed_path = place_file(source_path, destination_folder)
+                    if placed_path is None:
+                        print(f"Skipped '{os.path.basename(source_path)}': the same file is already in the sorted folder.")
+                    else:
+                        placed_paths.append(placed_path)
+                except Exception as e:
+                    print(f"ERROR moving file '{os.path.basename(source_path)}': {e}")
+        return placed_paths
@@ -0,0 +1,200 @@
+# core/driver_manager.py
+# This module keeps a pool of ready-to-use browsers, so downloads never wait for a cold browser start.
+# Browsers are pre-warmed in the background, health-checked before reuse and recycled when they
+# have served too many pages or grown too big.
+
+import atexit
+import threading
+from typing import Callable
+
+from .config import DRIVER_POOL_MAX_IDLE, DRIVER_RECYCLE_PAGES, DRIVER_RECYCLE_MEMORY_MB, BROWSER_PROFILE
+from .downloader import setup_driver, point_downloads_to
+
+# psutil gives the real memory use of the whole browser process tree, but it is optional.
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _quit(driver) -> None:
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class DriverPool:
+    """
+    A pool of idle, already-started browsers.
+
+    `acquire` hands out a warm browser when one is available (or being started), and only
+    starts a new one otherwise. `release` puts a browser back for the next batch.
+    """
+
+    def __init__(self, max_idle: int = DRIVER_POOL_MAX_IDLE, recycle_pages: int = DRIVER_RECYCLE_PAGES,
+                 recycle_memory_mb: int = DRIVER_RECYCLE_MEMORY_MB):
+        """
+        Args:
+            max_idle (int): Maximum number of idle browsers kept open.
+            recycle_pages (int): Replace a browser after it has loaded this many share pages.
+            recycle_memory_mb (int): Replace a browser once it uses more memory than this.
+        """
+        self.max_idle = max_idle
+        self.recycle_pages = recycle_pages
+        self.recycle_memory_mb = recycle_memory_mb
+        self._idle: list = []
+        # Per-browser bookkeeping, keyed by id(driver): {"pages": int, "kind": (headless, profile, download_events)}
+        self._info: dict[int, dict] = {}
+        self._warming = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    # --- Pre-warming ---
+
+    def prewarm(self, count: int, log_callback: Callable[[str], None], is_headless: bool = False,
+                profile: str = BROWSER_PROFILE, download_events: bool = False) -> None:
+        """
+        Starts browsers in the background until `count` are idle or being started.
+
+        Args:
+            count (int): How many browsers should be ready.
+            log_callback (function): A function to send log messages back to the UI.
+            is_headless (bool): Whether to run the browsers in headless mode.
+            profile (str): The browser profile to start them with (see BROWSER_PROFILE).
+            download_events (bool): Whether they report download events (see setup_driver).
+        """
+        kind = (is_headless, profile, download_events)
+        with self._lock:
+            ready = sum(1 for driver in self._idle if self._info[id(driver)]["kind"] == kind)
+            needed = min(count, self.max_idle) - ready - self._warming
+            if needed <= 0:
+                return
+            self._warming += needed
+        for _ in range(needed):
+            threading.Thread(target=self._warm_one, args=(log_callback, kind), daemon=True).start()
+
+    def _warm_one(self, log_callback: Callable[[str], None], kind: tuple) -> None:
+        is_headless, profile, download_events = kind
+        try:
+            driver = setup_driver(log_callback, is_headless=is_headless, profile=profile, download_events=download_events)
+        except Exception as e:
+            log_callback(f"Could not pre-warm a browser: {e}\n")
+            driver = None
+        with self._lock:
+            self._warming -= 1
+            if driver is not None:
+                self._info[id(driver)] = {"pages": 0, "kind": kind}
+                self._idle.append(driver)
+            self._changed.notify_all()
+
+    # --- Checking Out and Returning Browsers ---
+
+    def acquire(self, log_callback: Callable[[str], None], download_dir: str, is_headless: bool = False,
+                profile: str = BROWSER_PROFILE, download_events: bool = False):
+        """
+        Returns a healthy browser that saves its downloads into `download_dir`, started with the
+        given headless mode, browser profile and download events setting.
+
+        Raises:
+            DriverConnectionError: If no browser could be started.
+        """
+        kind = (is_headless, profile, download_events)
+        while True:
+            driver = None
+            with self._lock:
+                while driver is None:
+                    for n, idle_driver in enumerate(self._idle):
+                        if self._info[id(idle_driver)]["kind"] == kind:
+                            driver = self._idle.pop(n)
+                            break
+                    # A browser that is already starting will be ready sooner than a new one.
+                    if driver is None and self._warming > self._waiting:
+                        self._waiting += 1
+                        self._changed.wait()
+                        self._waiting -= 1
+                    elif driver is None:
+                        break
+
+            if driver is None:
+                driver = setup_driver(log_callback, is_headless=is_headless, download_dir=download_dir, profile=profile,
+                                      download_events=download_events)
+                with self._lock:
+                    self._info[id(driver)] = {"pages": 0, "kind": kind}
+                return driver
+
+            if self.is_healthy(driver):
+                try:
+                    point_downloads_to(driver, download_dir)
+                    log_callback("Using a pre-warmed browser.\n")
+                    return driver
+                except Exception:
+                    pass
+            self.discard(driver)
+
+    def release(self, driver) -> None:
+        """Returns a browser to the pool, or closes it if it should not be reused."""
+        with self._lock:
+            keep = len(self._idle) < self.max_idle
+        if keep and self.is_healthy(driver) and not self.needs_recycling(driver):
+            with self._lock:
+                self._idle.append(driver)
+                self._changed.notify_all()
+        else:
+            self.discard(driver)
+
+    def discard(self, driver) -> None:
+        """Closes a browser for good."""
+        with self._lock:
+            self._info.pop(id(driver), None)
+        _quit(driver)
+
+    def shutdown(self) -> None:
+        """Closes every idle browser."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self.discard(driver)
+
+    # --- Health and Recycling ---
+
+    def note_page(self, driver) -> None:
+        """Records that a browser has loaded another share page."""
+        with self._lock:
+            if id(driver) in self._info:
+                self._info[id(driver)]["pages"] += 1
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        """Checks that a browser session still responds before it is reused."""
+        try:
+            return driver.execute_script("return 1") == 1 and bool(driver.window_handles)
+        except Exception:
+            return False
+
+    @staticmethod
+    def memory_mb(driver) -> float:
+        """Returns the memory used by a browser, in MB (the whole process tree if psutil is installed)."""
+        try:
+            if psutil is not None:
+                process = psutil.Process(driver.service.process.pid)
+                processes = [process] + process.children(recursive=True)
+                return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+            heap = driver.execute_script("return performance.memory ? performance.memory.totalJSHeapSize : 0")
+            return (heap or 0) / 1024 / 1024
+        except Exception:
+            return 0.0
+
+    def needs_recycling(self, driver) -> bool:
+        """True if a browser has served too many pages or grown past the memory limit."""
+        with self._lock:
+            pages = self._info.get(id(driver), {}).get("pages", 0)
+        if self.recycle_pages and pages >= self.recycle_pages:
+            return True
+        return bool(self.recycle_memory_mb) and self.memory_mb(driver) > self.recycle_memory_mb
+
+
+# The application's shared pool. Idle browsers are closed when the app exits.
+driver_pool = DriverPool()
+atexit.register(driver_pool.shutdown)
@@ -0,0 +1,156 @@
+# core/event_bus.py
+# This module sits between the engine threads and the Eel UI. Engine code only appends to
+# in-memory queues (it never waits for the websocket); a single flusher thread pushes the queued
+# log lines and the latest progress values to the UI at a fixed frame rate.
+
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Callable
+
+from .config import UI_FRAME_RATE, UI_LOG_BUFFER_SIZE, UI_MAX_PENDING_LOG_LINES
+
+
+def _send_to_eel(function_name: str, *args) -> None:
+    """Calls a function exposed by the JavaScript UI."""
+    import eel  # Imported here so the engine modules stay importable (and testable) without a UI.
+    getattr(eel, function_name)(*args)
+
+
+class EventBus:
+    """
+    Batches UI updates and delivers them from one background thread, about UI_FRAME_RATE times a second.
+
+    - log(): lines are queued and sent together as one update_log call per frame.
+    - update(): only the latest arguments of each UI function are kept, so 1000 progress
+      updates between two frames become a single call.
+    - emit(): one-off events that must all be delivered, in order.
+
+    Every recent log line is also kept in a bounded ring buffer that the UI can page through
+    with get_log_page(). If the UI falls behind, the oldest queued lines are skipped instead of
+    the engine being slowed down.
+    """
+
+    def __init__(self, send: Callable[..., None] = _send_to_eel, frame_rate: float = UI_FRAME_RATE,
+                 buffer_size: int = UI_LOG_BUFFER_SIZE, max_pending: int = UI_MAX_PENDING_LOG_LINES):
+        """
+        Args:
+            send (function): Called as send(function_name, *args) to deliver an update to the UI.
+            frame_rate (float): Maximum number of deliveries per second.
+            buffer_size (int): Number of recent log lines kept for get_log_page().
+            max_pending (int): Maximum number of log lines waiting for the next frame.
+        """
+        self._send = send
+        self._interval = 1.0 / frame_rate
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffer: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        self._sequence = 0
+        self._pending_lines: deque[str] = deque()
+        self._skipped_lines = 0
+        self._latest: dict[str, tuple] = {}
+        self._events: deque[tuple[str, tuple]] = deque()
+        self._thread = None
+        self._closed = False
+
+    # --- Producer API (called from engine threads, never blocks on the UI) ---
+
+    def log(self, message: str) -> None:
+        """Queues a log message for the UI."""
+        with self._lock:
+            self._sequence += 1
+            self._buffer.append((self._sequence, message))
+            self._pending_lines.append(message)
+            if len(self._pending_lines) > self._max_pending:
+                self._pending_lines.popleft()
+                self._skipped_lines += 1
+        self._ensure_started()
+
+    def update(self, function_name: str, *args) -> None:
+        """Sets the latest state of a UI function (e.g. "update_progress"); older unsent values are dropped."""
+        with self._lock:
+            self._latest[function_name] = args
+        self._ensure_started()
+
+    def emit(self, function_name: str, *args) -> None:
+        """Queues a one-off call of a UI function. Unlike update(), every emitted event is delivered."""
+        with self._lock:
+            self._events.append((function_name, args))
+        self._ensure_started()
+
+    # --- Log History ---
+
+    def get_log_page(self, after: int = 0, limit: int = 500) -> dict[str, Any]:
+        """
+        Returns buffered log lines with a sequence number greater than `after`.
+
+        Args:
+            after (int): The last sequence number the caller already has (0 for the oldest buffered line).
+            limit (int): Maximum number of lines to return.
+
+        Returns:
+            dict: {"lines": [[sequence, message], ...], "first": oldest buffered sequence, "last": newest sequence}
+        """
+        with self._lock:
+            first = self._buffer[0][0] if self._buffer else self._sequence + 1
+            # Sequence numbers are consecutive, so the start of the page can be found by arithmetic.
+            start = max(0, after + 1 - first)
+            lines = [list(entry) for entry in islice(self._buffer, start, start + limit)]
+            return {"lines": lines, "first": first, "last": self._sequence}
+
+    # --- Delivery ---
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._closed:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="UIEventBus", daemon=True)
+                    self._thread.start()
+
+    def _take_frame(self) -> list[tuple[str, tuple]]:
+        """Collects everything queued since the last frame as a list of UI calls."""
+        with self._lock:
+            calls = []
+            if self._pending_lines or self._skipped_lines:
+                lines = list(self._pending_lines)
+                if self._skipped_lines:
+                    lines.insert(0, f"[... {self._skipped_lines} log line(s) skipped, see the full log ...]")
+                # Every message becomes its own line, whether or not it ended with a newline.
+                text = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+                calls.append(("update_log", (text,)))
+                self._pending_lines.clear()
+                self._skipped_lines = 0
+            calls.extend(self._latest.items())
+            self._latest.clear()
+            calls.extend(self._events)
+            self._events.clear()
+            return calls
+
+    def flush(self) -> None:
+        """Delivers everything queued so far right away, from the calling thread."""
+        for function_name, args in self._take_frame():
+            try:
+                self._send(function_name, *args)
+            except Exception:
+                pass  # The UI may have been closed; the engine must keep going regardless.
+
+    def _run(self) -> None:
+        while not self._closed:
+            started = time.monotonic()
+            self._wakeup.clear()
+            self.flush()
+            self._wakeup.wait(max(0.0, self._interval - (time.monotonic() - started)))
+
+    def close(self) -> None:
+        """Delivers what is still queued and stops the flusher thread."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.flush()
+
+
+# The bus used by the whole application to talk to the Eel UI.
+ui_bus = EventBus()
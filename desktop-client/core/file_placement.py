@@ -0,0 +1,211 @@
+# core/file_placement.py
+# This module places finished downloads into the sorted output folder. Files are moved with an
+# atomic rename whenever possible, and a content-hash index makes sure the same file is only
+# stored once, however many links or names it arrives under.
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+
+from .config import CONTENT_INDEX_FILE, DUPLICATE_FILE_MODE, CONTENT_HASH_CHUNK_SIZE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_size ON files(size, hash);
+"""
+
+
+def hash_file(path: str, chunk_size: int = CONTENT_HASH_CHUNK_SIZE) -> str:
+    """
+    Hashes a file's content in one streaming pass, reading a chunk at a time into a reused buffer.
+
+    Args:
+        path (str): The file to hash.
+        chunk_size (int): Bytes read at a time.
+
+    Returns:
+        str: The hex digest of the content.
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+def _candidate_names(destination_folder: str, name: str):
+    """Yields paths in the folder for the name: the name itself, then with " (1)", " (2)", ... added."""
+    base, extension = os.path.splitext(name)
+    yield os.path.join(destination_folder, name)
+    counter = 1
+    while True:
+        yield os.path.join(destination_folder, f"{base} ({counter}){extension}")
+        counter += 1
+
+
+def claim_destination(destination_folder: str, name: str) -> str:
+    """
+    Reserves a free path in the folder for the name, adding " (n)" if that name is taken.
+
+    The path is claimed by creating an empty file there (an atomic, exclusive create), so two
+    threads or processes placing a file of the same name never pick the same path. The caller
+    replaces the placeholder with the real file, or removes it if that fails.
+    """
+    for candidate in _candidate_names(destination_folder, name):
+        try:
+            with open(candidate, "xb"):
+                return candidate
+        except FileExistsError:
+            continue
+
+
+def _link_to_free_name(existing_path: str, destination_folder: str, name: str) -> str:
+    """Hard-links a file into the folder under the first free variant of the name."""
+    for candidate in _candidate_names(destination_folder, name):
+        try:
+            os.link(existing_path, candidate)
+            return candidate
+        except FileExistsError:
+            continue
+
+
+def move_file(source_path: str, destination_path: str) -> None:
+    """
+    Moves a file, as an atomic rename when source and destination are on the same filesystem.
+    Only moves across filesystems fall back to copying. A file at the destination (such as the
+    placeholder left by claim_destination) is replaced.
+    """
+    try:
+        same_device = os.stat(source_path).st_dev == os.stat(os.path.dirname(destination_path)).st_dev
+    except OSError:
+        same_device = False
+    if same_device:
+        os.replace(source_path, destination_path)
+    else:
+        shutil.move(source_path, destination_path)
+
+
+class ContentIndex:
+    """
+    Remembers the size and content hash of every file placed in the sorted folder.
+
+    Hashes are computed lazily: a file is only hashed once another file of exactly the same size
+    shows up, so unique files (the vast majority) are never read back.
+    """
+
+    def __init__(self, db_path: str = CONTENT_INDEX_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, path: str, size: int, content_hash: str | None = None) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (path, size, hash) VALUES (?, ?, ?)",
+                               (os.path.abspath(path), size, content_hash))
+
+    def find_duplicate(self, path: str, size: int) -> tuple[str | None, str | None]:
+        """
+        Looks for an indexed file with the same content as the given file.
+
+        Args:
+            path (str): The new file.
+            size (int): Its size in bytes.
+
+        Returns:
+            tuple: (path of the existing copy or None, content hash of the new file or None if
+                no file of the same size exists and the file was therefore not hashed)
+        """
+        with self._lock:
+            candidates = self._conn.execute("SELECT path, hash FROM files WHERE size = ?", (size,)).fetchall()
+        if not candidates:
+            return None, None
+
+        content_hash = hash_file(path)
+        for existing_path, existing_hash in candidates:
+            try:
+                if os.path.getsize(existing_path) != size:
+                    raise FileNotFoundError(existing_path)  # Replaced by a different file since it was indexed.
+                if existing_hash is None:
+                    existing_hash = hash_file(existing_path)
+                    self.add(existing_path, size, existing_hash)
+            except OSError:
+                with self._lock:
+                    self._conn.execute("DELETE FROM files WHERE path = ?", (existing_path,))
+                continue
+            if existing_hash == content_hash:
+                return existing_path, content_hash
+        return None, content_hash
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_content_index() -> ContentIndex:
+    """Returns the application's content index, opening it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ContentIndex()
+        return _index
+
+
+def place_file(source_path: str, destination_folder: str, duplicate_mode: str = DUPLICATE_FILE_MODE) -> str | None:
+    """
+    Places one downloaded file into a folder, deduplicating it against everything placed before.
+
+    Args:
+        source_path (str): The downloaded file.
+        destination_folder (str): The folder it belongs in (must exist).
+        duplicate_mode (str): "hardlink", "remove" or "off" (see DUPLICATE_FILE_MODE in the config).
+
+    Returns:
+        str | None: The path of the file in the destination folder, or None if it was a duplicate
+            that was removed.
+    """
+    size = os.path.getsize(source_path)
+    index = get_content_index()
+    existing_path, content_hash = (None, None)
+    if duplicate_mode != "off":
+        existing_path, content_hash = index.find_duplicate(source_path, size)
+
+    name = os.path.basename(source_path)
+    if existing_path is not None:
+        if duplicate_mode == "hardlink":
+            try:
+                destination_path = _link_to_free_name(existing_path, destination_folder, name)
+                os.remove(source_path)
+                index.add(destination_path, size, content_hash)
+                return destination_path
+            except OSError as e:
+                # Different filesystems or no hard-link support: keep the file itself where it belongs.
+                logging.warning(f"Could not hard-link '{name}' to its existing copy, placing it as it is: {e}")
+        else:
+            os.remove(source_path)
+            return None
+
+    destination_path = claim_destination(destination_folder, name)
+    try:
+        move_file(source_path, destination_path)
+    except BaseException:
+        os.remove(destination_path)
+        raise
+    index.add(destination_path, size, content_hash)
+    return destination_path
@@ -0,0 +1,310 @@
+# core/http_transfer.py
+# This module transfers files over plain HTTP once the browser has resolved the real file URL.
+# Files are fetched in parallel Range segments, written into a preallocated file and can be
+# resumed after a crash from a small state file kept next to the partial download.
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .bandwidth import download_bandwidth
+from .config import HTTP_SEGMENTS, HTTP_CHUNK_SIZE, HTTP_MIN_SEGMENT_SIZE, HTTP_POOL_SIZE
+from .file_placement import claim_destination
+
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+# How often the resume state is written to disk while a transfer is running.
+_STATE_SAVE_INTERVAL = 1.0
+_SEGMENT_ATTEMPTS = 3
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TransferError(Exception):
+    """Raised when a file could not be transferred over HTTP."""
+    pass
+
+
+def get_http_session() -> requests.Session:
+    """Returns the application's shared, connection-pooled HTTP session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _filename_from_response(response: requests.Response, url: str) -> str:
+    """Picks the file name from the Content-Disposition header, or from the URL."""
+    disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r"filename\*\s*=\s*[^']*'[^']*'([^;]+)", disposition)
+    if match:
+        name = unquote(match.group(1).strip().strip('"'))
+    else:
+        match = re.search(r'filename\s*=\s*"?([^";]+)"?', disposition)
+        name = match.group(1).strip() if match else unquote(os.path.basename(urlparse(url).path))
+    # Never let a server choose a path outside the download folder.
+    name = os.path.basename(name.replace("\\", "/")).strip()
+    return name or "download"
+
+
+def _cookie_header(cookies: list[dict], url: str) -> str:
+    """Builds a Cookie header from the browser cookies that apply to the URL's host."""
+    host = (urlparse(url).hostname or "").lower()
+    matching = []
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lower().lstrip(".")
+        if not domain or host == domain or host.endswith("." + domain):
+            matching.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(matching)
+
+
+def _validator(response: requests.Response) -> str | None:
+    """The strong ETag of a response, or its Last-Modified date: what identifies this version of the file."""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _probe(session: requests.Session, url: str, headers: dict) -> tuple[int | None, bool, str, str | None]:
+    """
+    Asks the server for the file size and whether it supports Range requests.
+
+    Returns:
+        tuple: (size in bytes or None if unknown, True if Range requests work, file name,
+            validator (ETag or Last-Modified) or None)
+    """
+    with session.get(url, headers=dict(headers, Range="bytes=0-0"), stream=True, timeout=30) as response:
+        if response.status_code == 206:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rpartition("/")[2]
+            size = int(total) if total.isdigit() else None
+            return size, size is not None, _filename_from_response(response, response.url), _validator(response)
+        if response.status_code == 200:
+            length = response.headers.get("Content-Length")
+            size = int(length) if length and length.isdigit() else None
+            return size, False, _filename_from_response(response, response.url), _validator(response)
+        raise TransferError(f"Server answered HTTP {response.status_code} for {url}")
+
+
+def _plan_segments(size: int, segments: int) -> list[list[int]]:
+    """Splits [0, size) into segments of [start, end_inclusive, bytes_done]."""
+    count = max(1, min(segments, size // HTTP_MIN_SEGMENT_SIZE))
+    step = size // count
+    plan = []
+    for n in range(count):
+        start = n * step
+        end = size - 1 if n == count - 1 else start + step - 1
+        plan.append([start, end, 0])
+    return plan
+
+
+class _TransferState:
+    """Tracks the progress of every segment and persists it for resuming."""
+
+    def __init__(self, state_path: str, url: str, size: int, validator: str | None, segments: list[list[int]],
+                 progress_callback: Callable[[int, int], None] | None):
+        self.state_path = state_path
+        self.url = url
+        self.size = size
+        self.validator = validator
+        self.segments = segments
+        self.progress_callback = progress_callback
+        self.lock = threading.Lock()
+        self._last_save = 0.0
+
+    @property
+    def bytes_done(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+    def add(self, index: int, count: int) -> None:
+        with self.lock:
+            self.segments[index][2] += count
+            done = self.bytes_done
+            now = time.monotonic()
+            save = now - self._last_save >= _STATE_SAVE_INTERVAL
+            if save:
+                self._last_save = now
+        if save:
+            self.save()
+        if self.progress_callback:
+            self.progress_callback(done, self.size)
+
+    def save(self) -> None:
+        with self.lock:
+            data = {"url": self.url, "size": self.size, "validator": self.validator,
+                    "segments": [list(s) for s in self.segments]}
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.state_path)
+
+    @classmethod
+    def load(cls, state_path: str, url: str, size: int, validator: str | None, progress_callback) -> "_TransferState | None":
+        """
+        Loads a previous transfer's state if it belongs to the same version of the same file: the
+        size must match, and so must the ETag (or Last-Modified date). Without a validator on
+        either side only a transfer of the very same URL is resumed.
+        """
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["size"] != size:
+                return None
+            if data.get("validator") or validator:
+                if data.get("validator") != validator:
+                    return None
+            elif data["url"] != url:
+                return None
+            return cls(state_path, url, size, validator, data["segments"], progress_callback)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def _download_segment(session: requests.Session, url: str, headers: dict, part_path: str,
+                      state: _TransferState, index: int) -> None:
+    """Downloads the remaining bytes of one segment, retrying a few times on network errors."""
+    for attempt in range(1, _SEGMENT_ATTEMPTS + 1):
+        start, end, done = state.segments[index]
+        if start + done > end:
+            return
+        try:
+            range_headers = dict(headers, Range=f"bytes={start + done}-{end}")
+            if state.validator:
+                # If the file changed since the transfer started, the server answers 200 with the new file instead.
+                range_headers["If-Range"] = state.validator
+            with session.get(url, headers=range_headers, stream=True, timeout=60) as response:
+                if response.status_code != 206:
+                    raise TransferError(f"Range request answered HTTP {response.status_code}")
+                with open(part_path, "r+b") as f:
+                    f.seek(start + done)
+                    for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        remaining = end - (start + state.segments[index][2]) + 1
+                        chunk = chunk[:remaining]
+                        download_bandwidth.consume(len(chunk))
+                        f.write(chunk)
+                        f.flush()  # The resume state must never count bytes that aren't in the file yet.
+                        state.add(index, len(chunk))
+                        if len(chunk) == remaining:
+                            break
+            if start + state.segments[index][2] > end:
+                return
+            raise TransferError("Connection closed before the segment was complete")
+        except (requests.RequestException, TransferError):
+            if attempt == _SEGMENT_ATTEMPTS:
+                raise
+            time.sleep(attempt)
+
+
+def _download_single_stream(session: requests.Session, url: str, headers: dict, part_path: str,
+                            size: int | None, progress_callback) -> None:
+    """Downloads a file in one request, for servers that don't support Range."""
+    done = 0
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+                if chunk:
+                    download_bandwidth.consume(len(chunk))
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress_callback:
+                        progress_callback(done, size or done)
+    if size is not None and done != size:
+        raise TransferError(f"Expected {size} bytes but received {done}")
+
+
+def download_file(url: str, download_dir: str, log_callback: Callable[[str], None],
+                  headers: dict | None = None, cookies: list[dict] | None = None,
+                  progress_callback: Callable[[int, int], None] | None = None,
+                  segments: int = HTTP_SEGMENTS, session: requests.Session | None = None) -> str:
+    """
+    Downloads a file over HTTP into a folder, using parallel Range segments when possible.
+
+    If an earlier attempt at the same file was interrupted, the transfer resumes from where
+    it stopped instead of starting over (only if the server still has the same version of the
+    file). The completed file never replaces an existing one: it gets a " (n)" name instead.
+
+    Args:
+        url (str): The direct file URL.
+        download_dir (str): The folder to save the file into.
+        log_callback (function): Function to send log messages to the UI.
+        headers (dict | None): Extra request headers (e.g. User-Agent and Referer of the browser).
+        cookies (list[dict] | None): Browser cookies in Selenium's format ({"name", "value", "domain", ...}).
+        progress_callback (function): Called with (bytes_done, total_bytes) as data arrives.
+        segments (int): Maximum number of parallel connections for this file.
+        session (requests.Session | None): The HTTP session to use. Defaults to the shared pooled session.
+
+    Returns:
+        str: The path of the completed file.
+
+    Raises:
+        TransferError: If the file could not be downloaded.
+    """
+    session = session or get_http_session()
+    headers = dict(headers or {})
+    if cookies:
+        # Send the cookies with every request without touching the shared session's cookie jar.
+        headers["Cookie"] = _cookie_header(cookies, url)
+
+    try:
+        size, supports_ranges, filename, validator = _probe(session, url, headers)
+    except requests.RequestException as e:
+        raise TransferError(f"Could not reach {url}: {e}") from e
+
+    final_path = os.path.join(download_dir, filename)
+    part_path = final_path + PART_SUFFIX
+    state_path = final_path + STATE_SUFFIX
+
+    try:
+        if not supports_ranges or not size:
+            log_callback("  -> Server does not support ranged downloads, using a single connection...\n")
+            _download_single_stream(session, url, headers, part_path, size, progress_callback)
+        else:
+            state = None
+            if os.path.exists(part_path) and os.path.getsize(part_path) == size:
+                state = _TransferState.load(state_path, url, size, validator, progress_callback)
+            if state is not None:
+                log_callback(f"  -> Resuming download at {state.bytes_done * 100 // size}%...\n")
+            else:
+                state = _TransferState(state_path, url, size, validator, _plan_segments(size, segments), progress_callback)
+                with open(part_path, "wb") as f:
+                    f.truncate(size)  # Preallocate, so every segment can write at its own offset.
+                state.save()
+
+            log_callback(f"  -> Downloading {filename} ({size / 1024 / 1024:.1f} MB) over {len(state.segments)} connection(s)...\n")
+            with ThreadPoolExecutor(max_workers=len(state.segments)) as executor:
+                futures = [
+                    executor.submit(_download_segment, session, url, headers, part_path, state, index)
+                    for index in range(len(state.segments))
+                ]
+                try:
+                    for future in futures:
+                        future.result()
+                finally:
+                    state.save()
+            if state.bytes_done != size:
+                raise TransferError(f"Expected {size} bytes but received {state.bytes_done}")
+    except (requests.RequestException, OSError) as e:
+        raise TransferError(f"Transfer of {filename} failed: {e}") from e
+
+    final_path = claim_destination(download_dir, filename)
+    os.replace(part_path, final_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return final_path
@@ -0,0 +1,377 @@
+# core/job_store.py
+# This module stores download jobs and the state of every link in a SQLite database (WAL mode).
+# Every state change is a small, atomic transaction, so updates cost the same no matter how many
+# jobs there are, and a crash can never leave a half-written file behind.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable
+
+from .config import JOB_STORE_FILE, SESSION_FILE, FAILED_LINKS_FILE
+from .share_links import canonical_link_key
+
+# --- Link States ---
+PENDING = "pending"
+RESOLVING = "resolving"
+DOWNLOADING = "downloading"
+DONE = "done"
+FAILED = "failed"
+BANNED = "banned"
+
+# Links in these states still have to be downloaded when a session is resumed.
+ACTIVE_STATES = (PENDING, RESOLVING, DOWNLOADING)
+
+# Which state a link may move to from each state.
+ALLOWED_TRANSITIONS: dict[str, set[str]] = {
+    PENDING: {RESOLVING, DOWNLOADING, DONE, FAILED, BANNED},
+    RESOLVING: {PENDING, DOWNLOADING, DONE, FAILED, BANNED},
+    DOWNLOADING: {PENDING, RESOLVING, DONE, FAILED},
+    FAILED: {PENDING, BANNED},
+    DONE: {PENDING},
+    BANNED: set(),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    source_file TEXT,
+    type TEXT,
+    folder_name TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    link_key TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+CREATE INDEX IF NOT EXISTS idx_links_state ON links(state);
+CREATE INDEX IF NOT EXISTS idx_links_job ON links(job_id, position);
+CREATE INDEX IF NOT EXISTS idx_links_url ON links(url);
+"""
+
+# Indexes on columns that older databases get through _upgrade_schema.
+_UPGRADED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_links_key ON links(link_key, state);
+CREATE INDEX IF NOT EXISTS idx_jobs_folder ON jobs(folder_name);
+"""
+
+
+class InvalidTransitionError(ValueError):
+    """Raised when a link is moved to a state it cannot reach from its current state."""
+    pass
+
+
+class JobStore:
+    """A transactional store of download jobs and per-link states."""
+
+    def __init__(self, db_path: str = JOB_STORE_FILE):
+        """
+        Args:
+            db_path (str): Path to the SQLite database file. It is created if missing.
+        """
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL + synchronous=NORMAL: atomic, crash-safe commits without an fsync per update.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._upgrade_schema()
+        self._conn.executescript(_UPGRADED_INDEXES)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _upgrade_schema(self) -> None:
+        """Adds the columns that databases created by older versions are missing."""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(links)")}
+        if "link_key" not in columns:
+            with self._transaction() as conn:
+                conn.execute("ALTER TABLE links ADD COLUMN link_key TEXT")
+                rows = conn.execute("SELECT id, url FROM links").fetchall()
+                conn.executemany("UPDATE links SET link_key = ? WHERE id = ?",
+                                 [(canonical_link_key(row["url"]), row["id"]) for row in rows])
+
+    @contextmanager
+    def _transaction(self):
+        """Runs the block as one atomic transaction, rolled back if it raises."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # --- Metadata ---
+
+    def get_meta(self, key: str, default: str | None = None) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key: str, value: str | None) -> None:
+        with self._transaction() as conn:
+            if value is None:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- Adding Jobs ---
+
+    @staticmethod
+    def _insert_jobs(conn: sqlite3.Connection, jobs: Iterable[dict], state: str) -> list[list[int]]:
+        now = time.time()
+        link_ids = []
+        for job in jobs:
+            cursor = conn.execute(
+                "INSERT INTO jobs (source_file, type, folder_name, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job.get("source_file"), job.get("type"), job.get("folder_name"), state, now),
+            )
+            job_id = cursor.lastrowid
+            ids = []
+            for position, url in enumerate(job.get("links", [])):
+                cursor = conn.execute(
+                    "INSERT INTO links (job_id, position, url, link_key, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, position, url, canonical_link_key(url), state, now),
+                )
+                ids.append(cursor.lastrowid)
+            link_ids.append(ids)
+        return link_ids
+
+    def add_jobs(self, jobs: Iterable[dict], state: str = PENDING) -> list[list[int]]:
+        """
+        Adds download jobs in one transaction.
+
+        Args:
+            jobs (Iterable[dict]): Job dictionaries as produced by the analyzer.
+            state (str): The initial state of every link.
+
+        Returns:
+            list[list[int]]: The ids of each job's links, in the same order as the jobs and links.
+        """
+        with self._transaction() as conn:
+            return self._insert_jobs(conn, jobs, state)
+
+    def add_or_reuse_jobs(self, jobs: Iterable[dict], state: str = PENDING) -> list[list[int]]:
+        """
+        Like add_jobs, but a job that is already stored (same source file, type, folder name and
+        links, e.g. from a resumed session or a batch that is run again) keeps its rows: its links
+        are moved back to `state`, except banned ones, instead of being added a second time.
+
+        Returns:
+            list[list[int]]: The ids of each job's links, in the same order as the jobs and links.
+        """
+        now = time.time()
+        link_ids = []
+        with self._transaction() as conn:
+            # Jobs added by this call are never reused by it: identical jobs of one batch get their own rows.
+            last_stored_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+            reused_job_ids = set()
+            for job in jobs:
+                links = list(job.get("links", []))
+                job_id, ids = self._find_job(conn, job, links, last_stored_id, reused_job_ids)
+                if job_id is None:
+                    link_ids += self._insert_jobs(conn, [job], state)
+                    continue
+                conn.executemany(
+                    "UPDATE links SET state = ?, error = NULL, updated_at = ? WHERE id = ? AND state != ?",
+                    [(state, now, link_id, BANNED) for link_id in ids],
+                )
+                self._refresh_job_state(conn, job_id, now)
+                link_ids.append(ids)
+        return link_ids
+
+    @staticmethod
+    def _find_job(conn: sqlite3.Connection, job: dict, links: list[str], last_id: int, exclude: set[int]) -> tuple:
+        """
+        Finds a stored job identical to `job`, with an id up to `last_id` and not in `exclude`,
+        and adds it to `exclude`.
+
+        Returns:
+            tuple: (job id, its link ids in order), or (None, None) if there is no such job.
+        """
+        candidates = conn.execute(
+            "SELECT id FROM jobs WHERE folder_name IS ? AND type IS ? AND source_file IS ? AND id <= ? ORDER BY id",
+            (job.get("folder_name"), job.get("type"), job.get("source_file"), last_id),
+        ).fetchall()
+        for (job_id,) in candidates:
+            if job_id in exclude:
+                continue
+            rows = conn.execute("SELECT id, url FROM links WHERE job_id = ? ORDER BY position", (job_id,)).fetchall()
+            if [row["url"] for row in rows] == links:
+                exclude.add(job_id)
+                return job_id, [row["id"] for row in rows]
+        return None, None
+
+    # --- State Transitions ---
+
+    @staticmethod
+    def _refresh_job_state(conn: sqlite3.Connection, job_id: int, now: float) -> None:
+        """Derives a job's state from its links: active while any link is, then failed or done."""
+        states = {row[0] for row in conn.execute("SELECT DISTINCT state FROM links WHERE job_id = ?", (job_id,))}
+        if states & set(ACTIVE_STATES):
+            job_state = PENDING
+        elif FAILED in states:
+            job_state = FAILED
+        elif states == {BANNED}:
+            job_state = BANNED
+        else:
+            job_state = DONE
+        conn.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (job_state, now, job_id))
+
+    def set_link_state(self, link_id: int, state: str, error: str | None = None) -> None:
+        """
+        Moves one link to a new state.
+
+        Args:
+            link_id (int): The id returned by add_jobs.
+            state (str): The new state.
+            error (str | None): An optional error message to keep with the link.
+
+        Raises:
+            InvalidTransitionError: If the link can't move to that state from its current one.
+            KeyError: If there is no such link.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT job_id, state FROM links WHERE id = ?", (link_id,)).fetchone()
+            if row is None:
+                raise KeyError(link_id)
+            if state != row["state"] and state not in ALLOWED_TRANSITIONS[row["state"]]:
+                raise InvalidTransitionError(f"Link {link_id} cannot go from '{row['state']}' to '{state}'")
+            # Every time a link starts being resolved counts as a download attempt.
+            attempts = ", attempts = attempts + 1" if state == RESOLVING else ""
+            conn.execute(f"UPDATE links SET state = ?, error = ?, updated_at = ?{attempts} WHERE id = ?",
+                         (state, error, now, link_id))
+            self._refresh_job_state(conn, row["job_id"], now)
+
+    # --- Queries ---
+
+    def count_links(self, state: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM links WHERE state = ?", (state,)).fetchone()[0]
+
+    def jobs_with_links_in(self, states: Iterable[str], limit: int | None = None) -> list[dict]:
+        """
+        Returns jobs that have links in the given states, with only those links.
+
+        Args:
+            states (Iterable[str]): The link states to select.
+            limit (int | None): Maximum number of jobs to return.
+
+        Returns:
+            list[dict]: Job dictionaries in insertion order, each with an extra "id" and "link_ids".
+        """
+        states = tuple(states)
+        placeholders = ", ".join("?" for _ in states)
+        query = (
+            f"SELECT j.id, j.source_file, j.type, j.folder_name, l.id AS link_id, l.url "
+            f"FROM links l JOIN jobs j ON j.id = l.job_id "
+            f"WHERE l.state IN ({placeholders}) ORDER BY j.id, l.position"
+        )
+        return self._group_jobs(query, states, limit)
+
+    def _group_jobs(self, query: str, params: tuple, limit: int | None = None) -> list[dict]:
+        """Runs a query over (job, link) rows ordered by job and groups the links into job dictionaries."""
+        jobs: list[dict] = []
+        with self._lock:
+            for row in self._conn.execute(query, params):
+                if not jobs or jobs[-1]["id"] != row["id"]:
+                    if limit is not None and len(jobs) == limit:
+                        break
+                    jobs.append({
+                        "id": row["id"], "source_file": row["source_file"], "links": [], "link_ids": [],
+                        "type": row["type"], "folder_name": row["folder_name"],
+                    })
+                jobs[-1]["links"].append(row["url"])
+                jobs[-1]["link_ids"].append(row["link_id"])
+        return jobs
+
+    def jobs_to_retry(self) -> list[dict]:
+        """
+        Returns the failed links that are worth retrying, grouped into their jobs.
+
+        Failed links are compared by canonical share key: a share that failed on several mirrors
+        is retried once, and a share that was downloaded from another mirror is not retried at all.
+
+        Returns:
+            list[dict]: Job dictionaries like jobs_with_links_in returns.
+        """
+        query = (
+            "SELECT j.id, j.source_file, j.type, j.folder_name, l.id AS link_id, l.url "
+            "FROM links l JOIN jobs j ON j.id = l.job_id "
+            "WHERE l.state = ? "
+            "AND l.id = (SELECT MIN(f.id) FROM links f WHERE f.link_key = l.link_key AND f.state = ?) "
+            "AND NOT EXISTS (SELECT 1 FROM links d WHERE d.link_key = l.link_key AND d.state = ?) "
+            "ORDER BY j.id, l.position"
+        )
+        return self._group_jobs(query, (FAILED, FAILED, DONE))
+
+    # --- Replacing Whole Collections (used by the session_manager compatibility functions) ---
+
+    def replace_links_in(self, states: Iterable[str], jobs: Iterable[dict], new_state: str) -> None:
+        """
+        Atomically removes every link in the given states and adds the given jobs in new_state.
+        Jobs that are left without any link are removed as well.
+        """
+        states = tuple(states)
+        placeholders = ", ".join("?" for _ in states)
+        with self._transaction() as conn:
+            conn.execute(f"DELETE FROM links WHERE state IN ({placeholders})", states)
+            conn.execute("DELETE FROM jobs WHERE NOT EXISTS (SELECT 1 FROM links WHERE links.job_id = jobs.id)")
+            self._insert_jobs(conn, jobs, new_state)
+
+    # --- Migration From The Old JSON Files ---
+
+    def migrate_json_files(self) -> None:
+        """Imports session.json and failed_links.json once, the first time the store is opened."""
+        if self.get_meta("json_migrated"):
+            return
+        try:
+            if os.path.exists(SESSION_FILE):
+                with open(SESSION_FILE, "r", encoding="utf-8") as f:
+                    session = json.load(f)
+                self.add_jobs(session.get("remaining_jobs", []), PENDING)
+                if session.get("output_folder"):
+                    self.set_meta("output_folder", session["output_folder"])
+            if os.path.exists(FAILED_LINKS_FILE):
+                with open(FAILED_LINKS_FILE, "r", encoding="utf-8") as f:
+                    self.add_jobs(json.load(f), FAILED)
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            logging.error(f"Error migrating old session files: {e}")
+        self.set_meta("json_migrated", "1")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """Returns the application's job store, opening (and migrating) it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+            _store.migrate_json_files()
+        return _store
@@ -0,0 +1,256 @@
+# core/metrics.py
+# This module records how long each stage of the pipeline takes (analysis, page load, waiting for
+# the download button, transfer, sorting, ...). Timings are kept as Prometheus histograms that can be
+# scraped over HTTP, and can also be written to a per-run trace file for a timeline view.
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+from .config import METRICS_PORT, METRICS_TRACE_DIR
+
+# Upper bounds (seconds) of the stage duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Upper bounds (bytes per second) of the transfer throughput histogram buckets: 64 KB/s to 1 GB/s.
+THROUGHPUT_BUCKETS = tuple(64 * 1024 * 4 ** n for n in range(8))
+
+_PREFIX = "vortexflow_"
+_HELP = {
+    "stage_duration_seconds": "Time spent in each pipeline stage.",
+    "stage_errors_total": "Stages that ended with an exception.",
+    "transfer_bytes_total": "Bytes downloaded.",
+    "transfer_throughput_bytes_per_second": "Average speed of each completed file transfer.",
+    "download_retries_total": "Failed links put back in the queue for another try.",
+    "circuit_breaker_trips_total": "Times a mirror domain was paused after failing repeatedly.",
+    "prefetch_shares_total": "Shares looked up before downloading, by state (alive, dead, unknown).",
+    "postprocess_bytes_total": "Bytes of finished downloads that went through each post-processing stage.",
+    "postprocess_failures_total": "Downloads that failed a post-processing stage (verify, extract, sort).",
+}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf.
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _format_labels(labels: tuple) -> str:
+    """Formats (name, value) pairs as a Prometheus label set, e.g. {stage="page_load"}."""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms, keyed by metric name and a set of labels.
+
+    Use span() around a stage to time it; the duration goes into the vortexflow_stage_duration_seconds
+    histogram and, while a trace is open, into the trace file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._trace = None
+        self._trace_start = 0.0
+        self._traced_threads: set[int] = set()
+
+    # --- Recording ---
+
+    def observe(self, name: str, value: float, buckets: tuple = DURATION_BUCKETS, **labels) -> None:
+        """Adds a value to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Increases a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_stage(self, stage: str, seconds: float, started: float | None = None, **labels) -> None:
+        """
+        Records the duration of a stage that was timed by the caller.
+
+        Args:
+            stage (str): The stage name, e.g. "page_load".
+            seconds (float): How long it took.
+            started (float | None): time.perf_counter() at the start of the stage, to place it
+                in the trace. Defaults to `seconds` before now.
+            **labels: Extra labels, e.g. engine="http".
+        """
+        self.observe("stage_duration_seconds", seconds, stage=stage, **labels)
+        if self._trace is not None:
+            if started is None:
+                started = time.perf_counter() - seconds
+            self._write_trace_event(stage, started, seconds, labels)
+
+    @contextmanager
+    def span(self, stage: str, **labels) -> Iterator[None]:
+        """
+        Times the enclosed block as one stage. Exceptions are counted in vortexflow_stage_errors_total
+        and passed on.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("stage_errors_total", stage=stage, **labels)
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started, started, **labels)
+
+    def record_transfer(self, size: int, seconds: float, **labels) -> None:
+        """Records a completed file transfer: its size and average speed."""
+        self.inc("transfer_bytes_total", size, **labels)
+        if seconds > 0:
+            self.observe("transfer_throughput_bytes_per_second", size / seconds, THROUGHPUT_BUCKETS, **labels)
+
+    # --- Prometheus Export ---
+
+    def render_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (histogram.buckets, list(histogram.counts), histogram.total, histogram.count))
+                for key, histogram in self._histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {_PREFIX}{name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {_PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{_PREFIX}{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{_PREFIX}{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{_PREFIX}{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{_PREFIX}{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    # --- Trace Files ---
+
+    def start_trace(self, run_name: str, directory: str = METRICS_TRACE_DIR) -> str | None:
+        """
+        Starts writing every stage to a new trace file until stop_trace() is called.
+
+        Args:
+            run_name (str): Used in the file name, e.g. "download".
+            directory (str): The folder trace files are written to.
+
+        Returns:
+            str | None: The path of the trace file, or None if it could not be created.
+        """
+        path = os.path.join(directory, f"{run_name}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            trace = open(path, "w", encoding="utf-8")
+        except OSError as e:
+            logging.error(f"Could not create the trace file {path}: {e}")
+            return None
+        # A JSON array of events; viewers accept the file even if the run ends before "]" is written.
+        trace.write("[\n")
+        with self._lock:
+            self._close_trace()
+            self._trace = trace
+            self._trace_start = time.perf_counter()
+            self._traced_threads = set()
+        return path
+
+    def stop_trace(self) -> None:
+        """Finishes the current trace file, if any."""
+        with self._lock:
+            self._close_trace()
+
+    def _close_trace(self) -> None:
+        if self._trace is not None:
+            self._trace.write('{"name": "end", "ph": "i", "s": "g", "ts": %d, "pid": 1, "tid": 0}\n]\n'
+                              % ((time.perf_counter() - self._trace_start) * 1e6))
+            self._trace.close()
+            self._trace = None
+
+    def _write_trace_event(self, stage: str, started: float, seconds: float, labels: dict) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": stage, "cat": "stage", "ph": "X", "pid": 1, "tid": thread.ident,
+            "ts": round((started - self._trace_start) * 1e6), "dur": round(seconds * 1e6),
+            "args": {name: str(value) for name, value in labels.items()},
+        }
+        with self._lock:
+            if self._trace is None:
+                return
+            if thread.ident not in self._traced_threads:
+                # Label the timeline row with the thread's name (e.g. "DownloadWorker-2").
+                self._traced_threads.add(thread.ident)
+                self._trace.write(json.dumps({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread.ident,
+                                              "args": {"name": thread.name}}) + ",\n")
+            self._trace.write(json.dumps(event) + ",\n")
+
+
+# The metrics of the whole process.
+metrics = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the console.
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer | None:
+    """
+    Serves the metrics at http://host:port/metrics from a background thread.
+
+    Returns:
+        ThreadingHTTPServer | None: The server, or None if the port could not be opened.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.error(f"Could not start the metrics server on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
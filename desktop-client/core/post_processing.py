@@ -0,0 +1,350 @@
+# core/post_processing.py
+# This module processes finished downloads while the rest of the batch is still downloading.
+# Every download goes through three stages: it is verified, its archives are extracted, and its
+# files are sorted into SORTED_OUTPUT_FOLDER. Each stage has its own threads and a bounded queue
+# in front of it, so a stage that falls behind holds back the stages before it (and finally the
+# download workers) instead of letting half-processed files pile up on the disk.
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from typing import Callable
+
+from .config import (
+    POSTPROCESS_VERIFY, POSTPROCESS_EXTRACT_ARCHIVES, POSTPROCESS_KEEP_ARCHIVES, POSTPROCESS_MAX_EXTRACTED_SIZE,
+    POSTPROCESS_QUEUE_SIZE, POSTPROCESS_VERIFY_WORKERS, POSTPROCESS_EXTRACT_WORKERS, POSTPROCESS_SORT_WORKERS,
+)
+from .downloader import sorted_folder
+from .file_placement import place_file
+from .metrics import metrics
+
+# py7zr and rarfile add .7z and .rar support, but they are optional. Without them such archives
+# are sorted as they are.
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+try:
+    import rarfile
+except ImportError:
+    rarfile = None
+
+# Stages, in the order every download goes through them.
+VERIFY = "verify"
+EXTRACT = "extract"
+SORT = "sort"
+STAGES = (VERIFY, EXTRACT, SORT)
+
+_STOP = object()
+
+
+class PostProcessingError(Exception):
+    """A download failed verification or could not be extracted."""
+    pass
+
+
+# --- Archives ---
+
+def archive_kind(path: str) -> str | None:
+    """Returns "zip", "7z" or "rar" for an archive this installation can open, otherwise None."""
+    name = path.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith(".7z") and py7zr is not None:
+        return "7z"
+    if name.endswith(".rar") and rarfile is not None:
+        return "rar"
+    return None
+
+
+def _open_archive(path: str, kind: str):
+    if kind == "zip":
+        return zipfile.ZipFile(path)
+    if kind == "7z":
+        return py7zr.SevenZipFile(path, mode="r")
+    return rarfile.RarFile(path)
+
+
+def test_archive(path: str, kind: str) -> None:
+    """
+    Reads every member of an archive and checks it against its stored checksum.
+
+    Raises:
+        PostProcessingError: If the archive is damaged.
+    """
+    try:
+        with _open_archive(path, kind) as archive:
+            damaged = archive.testrar() if kind == "rar" else archive.testzip()
+    except Exception as e:
+        raise PostProcessingError(f"'{os.path.basename(path)}' is damaged: {e}") from e
+    if damaged:
+        raise PostProcessingError(f"'{os.path.basename(path)}' is damaged: '{damaged}' does not match its checksum")
+
+
+def _uncompressed_size(archive, kind: str) -> int:
+    if kind == "7z":
+        return sum(member.uncompressed or 0 for member in archive.list())
+    return sum(member.file_size for member in archive.infolist())
+
+
+def extract_archive(path: str, kind: str, destination: str, max_size: int = POSTPROCESS_MAX_EXTRACTED_SIZE) -> None:
+    """
+    Unpacks an archive into a folder. Member checksums are checked while unpacking, so a damaged
+    archive is noticed without reading it twice.
+
+    Args:
+        path (str): The archive.
+        kind (str): Its archive_kind().
+        destination (str): The folder to unpack it into.
+        max_size (int): The most bytes it may unpack to (0 for no limit). It must also fit into
+            the free space of the destination's disk.
+
+    Raises:
+        PostProcessingError: If the archive is too big, damaged or can't be unpacked (e.g. it is
+            password-protected or one volume of a multi-volume archive).
+    """
+    name = os.path.basename(path)
+    try:
+        with _open_archive(path, kind) as archive:
+            # Checked up front, so a huge archive (or a zip bomb) can't fill the disk.
+            size = _uncompressed_size(archive, kind)
+            if max_size and size > max_size:
+                raise PostProcessingError(f"'{name}' would unpack to {size} bytes, more than the limit of {max_size}")
+            free = shutil.disk_usage(destination).free
+            if size > free:
+                raise PostProcessingError(f"'{name}' would unpack to {size} bytes, but only {free} are free")
+            # All three libraries keep members from escaping the folder ("../", absolute paths).
+            archive.extractall(destination)
+    except PostProcessingError:
+        raise
+    except Exception as e:
+        raise PostProcessingError(f"Could not extract '{name}': {e}") from e
+
+
+def _remove_empty_folders(folder: str) -> None:
+    for root, _, _ in os.walk(folder, topdown=False):
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass  # Not empty: a file could not be sorted and stays where it is.
+
+
+# --- Pipeline ---
+
+class PostProcessor:
+    """
+    Verifies, extracts and sorts finished downloads on background threads.
+
+    Call start(), then submit() the files of every download as it lands, and close() once the
+    batch is done; close() returns when everything submitted is sorted. submit() waits while the
+    verify stage's queue is full.
+    """
+
+    def __init__(self, log_callback: Callable[[str], None], verify: bool = POSTPROCESS_VERIFY,
+                 extract: bool = POSTPROCESS_EXTRACT_ARCHIVES, keep_archives: bool = POSTPROCESS_KEEP_ARCHIVES,
+                 max_extracted_size: int = POSTPROCESS_MAX_EXTRACTED_SIZE,
+                 workers: dict[str, int] | None = None, queue_size: int = POSTPROCESS_QUEUE_SIZE):
+        """
+        Args:
+            log_callback (function): A function to send log messages back to the UI.
+            verify (bool): Check file sizes against the share lookup and test archives.
+            extract (bool): Unpack archives into a folder named after them. An archive that can't
+                be unpacked is sorted as it is.
+            keep_archives (bool): Sort extracted archives too, instead of deleting them.
+            max_extracted_size (int): The most bytes one archive may unpack to (0 for no limit).
+            workers (dict[str, int] | None): Threads per stage, e.g. {EXTRACT: 2}. Stages not
+                given use the POSTPROCESS_*_WORKERS settings.
+            queue_size (int): Maximum number of downloads waiting in front of each stage.
+        """
+        self.log_callback = log_callback
+        self.verify = verify
+        self.extract = extract
+        self.keep_archives = keep_archives
+        self.max_extracted_size = max_extracted_size
+        self.workers = {VERIFY: POSTPROCESS_VERIFY_WORKERS, EXTRACT: POSTPROCESS_EXTRACT_WORKERS,
+                        SORT: POSTPROCESS_SORT_WORKERS}
+        self.workers.update(workers or {})
+        self._handlers = {VERIFY: self._verify, EXTRACT: self._extract, SORT: self._sort}
+        self._queues = {stage: queue.Queue(maxsize=max(1, queue_size)) for stage in STAGES}
+        self._threads: dict[str, list[threading.Thread]] = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+        # Per stage: downloads, files and bytes that went in, failures, and when the stage first
+        # started and last finished work (time.perf_counter()), for its throughput.
+        self._stats = {stage: {"downloads": 0, "files": 0, "bytes": 0, "failed": 0, "first": None, "last": None}
+                       for stage in STAGES}
+
+    def start(self) -> "PostProcessor":
+        """Starts the threads of every stage."""
+        for stage in STAGES:
+            for n in range(max(1, self.workers[stage])):
+                thread = threading.Thread(target=self._stage_loop, args=(stage,), name=f"PostProcess-{stage}-{n + 1}",
+                                          daemon=True)
+                thread.start()
+                self._threads[stage].append(thread)
+        return self
+
+    def submit(self, job: dict, paths: list[str], link: str | None = None, share_info: dict | None = None) -> None:
+        """
+        Hands over the files of one finished download.
+
+        Args:
+            job (dict): The download job the files belong to (its "type" and "folder_name" decide
+                where they are sorted).
+            paths (list[str]): The downloaded files.
+            link (str | None): The link they came from, for log messages.
+            share_info (dict | None): The link's share lookup (see core/share_metadata.py). For a
+                single-file share its size is checked against the downloaded file.
+        """
+        expected_size = None
+        if share_info and share_info.get("name") and len(paths) == 1:
+            expected_size = share_info.get("size")
+        item = {"job": job, "link": link or job.get('folder_name', ""), "expected_size": expected_size,
+                # (path, subfolder of the job's sorted folder) of every file, and the extraction folders to clean up.
+                "files": [(path, "") for path in paths], "staging": []}
+        self._queues[VERIFY].put(item)
+
+    def close(self) -> dict[str, dict]:
+        """
+        Waits until every submitted download went through all stages, then stops the threads.
+
+        Returns:
+            dict[str, dict]: The summary() of the run.
+        """
+        for stage in STAGES:
+            for _ in self._threads[stage]:
+                self._queues[stage].put(_STOP)
+            for thread in self._threads[stage]:
+                thread.join()
+            self._threads[stage] = []
+        return self.summary()
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Returns per stage: "downloads", "files" and "bytes" processed, "failed" downloads, and
+        "throughput" in bytes per second from the stage's first to its last piece of work.
+        """
+        with self._lock:
+            stats = {stage: dict(values) for stage, values in self._stats.items()}
+        for values in stats.values():
+            first, last = values.pop("first"), values.pop("last")
+            elapsed = (last - first) if first is not None and last is not None else 0.0
+            values["throughput"] = values["bytes"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def format_summary(self) -> str:
+        """Returns the summary as log lines, one per stage."""
+        lines = []
+        for stage, values in self.summary().items():
+            lines.append(f"  {stage:<8} {values['downloads']} download(s), {values['files']} file(s), "
+                         f"{values['bytes'] / 1024 ** 2:.1f} MB at {values['throughput'] / 1024 ** 2:.1f} MB/s"
+                         + (f", {values['failed']} failed" if values['failed'] else ""))
+        return "\n".join(lines)
+
+    # --- Stages ---
+
+    def _stage_loop(self, stage: str) -> None:
+        handler = self._handlers[stage]
+        next_queue = self._queues[STAGES[STAGES.index(stage) + 1]] if stage != STAGES[-1] else None
+        while True:
+            item = self._queues[stage].get()
+            if item is _STOP:
+                break
+            size = sum(os.path.getsize(path) for path, _ in item["files"] if os.path.isfile(path))
+            started = time.perf_counter()
+            try:
+                with metrics.span(stage):
+                    result = handler(item)
+            except Exception as e:
+                self.log_callback(f"  -> {e} ({item['link']}); its files stay in the download folder.\n")
+                metrics.inc("postprocess_failures_total", stage=stage)
+                result = None
+            with self._lock:
+                stats = self._stats[stage]
+                stats["downloads"] += 1
+                stats["files"] += len(item["files"])
+                stats["bytes"] += size
+                stats["failed"] += result is None
+                stats["first"] = started if stats["first"] is None else stats["first"]
+                stats["last"] = time.perf_counter()
+            metrics.inc("postprocess_bytes_total", size, stage=stage)
+            if result is not None and next_queue is not None:
+                # Waits while the next stage is behind.
+                next_queue.put(result)
+
+    def _verify(self, item: dict) -> dict:
+        missing = [path for path, _ in item["files"] if not os.path.isfile(path)]
+        if missing:
+            raise PostProcessingError(f"'{os.path.basename(missing[0])}' is missing")
+        if not self.verify:
+            return item
+        if item["expected_size"] is not None:
+            path = item["files"][0][0]
+            size = os.path.getsize(path)
+            if size != item["expected_size"]:
+                raise PostProcessingError(f"'{os.path.basename(path)}' has {size} bytes, but the share has {item['expected_size']}")
+        if not self.extract:
+            # Extracting checks every archive anyway; only test them here when nothing else will.
+            for path, _ in item["files"]:
+                kind = archive_kind(path)
+                if kind is not None:
+                    test_archive(path, kind)
+        return item
+
+    def _extract(self, item: dict) -> dict:
+        if not self.extract:
+            return item
+        files, archives = [], []
+        for path, subfolder in item["files"]:
+            kind = archive_kind(path)
+            if kind is None:
+                files.append((path, subfolder))
+                continue
+            # Unpacked next to the archive, so sorting the members is a rename on the same drive.
+            staging = tempfile.mkdtemp(prefix=".extract_", dir=os.path.dirname(path))
+            try:
+                extract_archive(path, kind, staging, self.max_extracted_size)
+            except PostProcessingError as e:
+                # E.g. password-protected or one volume of a multi-volume archive: sorted as it is.
+                shutil.rmtree(staging, ignore_errors=True)
+                self.log_callback(f"  -> {e} ({item['link']}); sorting the archive without unpacking it.\n")
+                metrics.inc("postprocess_failures_total", stage=EXTRACT)
+                files.append((path, subfolder))
+                continue
+            item["staging"].append(staging)
+            name = os.path.splitext(os.path.basename(path))[0]
+            extracted = [
+                (os.path.join(root, file_name), os.path.normpath(os.path.join(subfolder, name, os.path.relpath(root, staging))))
+                for root, _, file_names in os.walk(staging) for file_name in file_names
+            ]
+            self.log_callback(f"  -> Extracted {len(extracted)} file(s) from '{os.path.basename(path)}'.\n")
+            files += extracted
+            archives.append((path, subfolder))
+        for path, subfolder in archives:
+            if self.keep_archives:
+                files.append((path, subfolder))
+            else:
+                os.remove(path)
+        item["files"] = files
+        return item
+
+    def _sort(self, item: dict) -> dict:
+        destination = sorted_folder(item["job"])
+        placed = []
+        for path, subfolder in item["files"]:
+            folder = os.path.normpath(os.path.join(destination, subfolder))
+            try:
+                os.makedirs(folder, exist_ok=True)
+                placed_path = place_file(path, folder)
+            except Exception as e:
+                self.log_callback(f"  -> ERROR moving file '{os.path.basename(path)}': {e}\n")
+                continue
+            if placed_path is not None:
+                placed.append(placed_path)
+        for staging in item["staging"]:
+            _remove_empty_folders(staging)
+        item["placed"] = placed
+        return item
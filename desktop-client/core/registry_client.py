@@ -0,0 +1,114 @@
+# core/registry_client.py
+# This module talks to the shared link registry on the VortexFlow backend. Lookups are made in
+# bulk (one request for a whole analysis); reports are sent from a background thread so the
+# download workers never wait for the network. Every call degrades gracefully when the backend
+# can't be reached.
+
+import base64
+import logging
+import os
+import threading
+import uuid
+from typing import Iterable
+
+import requests
+
+from .config import (
+    BACKEND_URL, LINK_REGISTRY_ENABLED, LINK_REGISTRY_CONNECT_TIMEOUT, LINK_REGISTRY_TIMEOUT, LINK_REGISTRY_CLIENT_ID_FILE,
+)
+from .http_transfer import get_http_session
+
+# State codes returned by the registry (one per link).
+UNKNOWN = 0
+SEEN = 1     # Downloaded by another client; this client's own downloads come back as UNKNOWN.
+FAILED = 2
+BANNED = 3
+
+_STATE_NAMES = {SEEN: "seen", FAILED: "failed", BANNED: "banned"}
+
+_client_id = None
+_client_id_lock = threading.Lock()
+
+
+def client_id() -> str:
+    """Returns this installation's registry client ID, creating it on first use."""
+    global _client_id
+    with _client_id_lock:
+        if _client_id is None:
+            try:
+                with open(LINK_REGISTRY_CLIENT_ID_FILE, "r", encoding="utf-8") as f:
+                    _client_id = f.read().strip()
+            except OSError:
+                pass
+            if not _client_id:
+                _client_id = uuid.uuid4().hex
+                try:
+                    temp_path = LINK_REGISTRY_CLIENT_ID_FILE + ".tmp"
+                    with open(temp_path, "w", encoding="utf-8") as f:
+                        f.write(_client_id)
+                    os.replace(temp_path, LINK_REGISTRY_CLIENT_ID_FILE)
+                except OSError as e:
+                    # Still usable for this run; the next run gets a new ID.
+                    logging.warning(f"Could not save the registry client ID: {e}")
+        return _client_id
+
+
+def lookup_links(keys: list[str]) -> list[int] | None:
+    """
+    Asks the registry about many canonical link keys in a single round trip.
+
+    Args:
+        keys (list[str]): Canonical link keys (see core/share_links.py).
+
+    Returns:
+        list[int] | None: One state code per key, or None if the registry could not be reached.
+    """
+    if not keys:
+        return []
+    try:
+        response = get_http_session().post(
+            f"{BACKEND_URL}/registry/lookup", json={"links": keys, "client": client_id()},
+            timeout=(LINK_REGISTRY_CONNECT_TIMEOUT, LINK_REGISTRY_TIMEOUT),
+        )
+        response.raise_for_status()
+        codes = base64.b64decode(response.json()["codes"])
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logging.info(f"Shared link registry unavailable, using local data only: {e}")
+        return None
+    if len(codes) != len(keys):
+        logging.error("Shared link registry returned a malformed answer; ignoring it.")
+        return None
+    return list(codes)
+
+
+def mark_links(keys: Iterable[str], state: int) -> bool:
+    """
+    Records the state of links in the registry.
+
+    Args:
+        keys (Iterable[str]): Canonical link keys.
+        state (int): SEEN, FAILED or BANNED.
+
+    Returns:
+        bool: True if the registry stored the update.
+    """
+    keys = list(keys)
+    if not keys:
+        return True
+    try:
+        response = get_http_session().post(
+            f"{BACKEND_URL}/registry/mark", json={"state": _STATE_NAMES[state], "links": keys, "client": client_id()},
+            timeout=(LINK_REGISTRY_CONNECT_TIMEOUT, LINK_REGISTRY_TIMEOUT),
+        )
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        logging.info(f"Could not report {len(keys)} link(s) to the shared link registry: {e}")
+        return False
+
+
+def mark_links_in_background(keys: Iterable[str], state: int) -> None:
+    """Like mark_links, but returns immediately and sends the update from a background thread."""
+    keys = list(keys)
+    if keys and LINK_REGISTRY_ENABLED:
+        threading.Thread(target=mark_links, args=(keys, state), name="RegistryReport", daemon=True).start()
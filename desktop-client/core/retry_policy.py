@@ -0,0 +1,208 @@
+# core/retry_policy.py
+# This module decides when a failed link is tried again and how long to wait for each mirror.
+# Every mirror domain gets timeouts learned from its observed latencies and a circuit breaker,
+# so a mirror that keeps failing stops taking up download slots.
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from .config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+    PAGE_TIMEOUT_DEFAULT, PAGE_TIMEOUT_RANGE, DOWNLOAD_START_TIMEOUT_DEFAULT, DOWNLOAD_START_TIMEOUT_RANGE,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN, CIRCUIT_MAX_COOLDOWN, CIRCUIT_MAX_TRIPS,
+)
+
+# Circuit breaker decisions.
+ALLOW = "allow"    # Go ahead.
+DEFER = "defer"    # The domain is cooling down; try the link again later.
+REJECT = "reject"  # The domain is down for a longer while; try the link again once that is over.
+
+
+def link_domain(link: str) -> str:
+    """The mirror domain of a link, without "www." (the key used for health tracking)."""
+    host = (urlparse(link).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class RetryPolicy:
+    """Exponential backoff with "full jitter": each retry waits a random time up to the backoff."""
+
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, rng: random.Random | None = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def should_retry(self, attempt: int) -> bool:
+        """Whether a link that just failed its `attempt`-th try (1-based) gets another one."""
+        return attempt < self.max_attempts
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before the next try of a link that failed its `attempt`-th try."""
+        # Randomizing the whole wait spreads the retries of links that failed together.
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class LatencyEstimator:
+    """
+    Learns a timeout from observed latencies, like TCP's retransmission timer: a smoothed mean plus
+    four smoothed deviations, doubled after every timeout until a success comes in.
+    """
+
+    def __init__(self, default: float, bounds: tuple):
+        self.default = default
+        self.low, self.high = bounds
+        self.mean = None
+        self.deviation = 0.0
+        self.backoff = 1.0
+
+    def observe(self, seconds: float) -> None:
+        if self.mean is None:
+            self.mean, self.deviation = seconds, seconds / 2
+        else:
+            self.deviation += 0.25 * (abs(seconds - self.mean) - self.deviation)
+            self.mean += 0.125 * (seconds - self.mean)
+        self.backoff = 1.0
+
+    def timed_out(self) -> None:
+        self.backoff = min(self.backoff * 2, 4.0)
+
+    def timeout(self) -> float:
+        base = self.default if self.mean is None else self.mean + 4 * self.deviation
+        return min(self.high, max(self.low, base * self.backoff))
+
+
+class _DomainState:
+    def __init__(self):
+        self.page = LatencyEstimator(PAGE_TIMEOUT_DEFAULT, PAGE_TIMEOUT_RANGE)
+        self.start = LatencyEstimator(DOWNLOAD_START_TIMEOUT_DEFAULT, DOWNLOAD_START_TIMEOUT_RANGE)
+        self.consecutive_failures = 0
+        self.trips = 0            # Times the circuit opened since the last success.
+        self.open_until = 0.0     # time.monotonic() at which a trial is allowed again.
+        self.trial_running = False
+
+
+class MirrorHealth:
+    """
+    Tracks every mirror domain: learned timeouts and a circuit breaker.
+
+    The circuit opens after `failure_threshold` failures in a row. While it is open, links of
+    that domain are deferred. Once the cooldown is over, one trial link is let through: success
+    closes the circuit, failure opens it again with a doubled cooldown. After `max_trips` trips
+    in a row, the domain's links are rejected: like deferring, but for the maximum cooldown.
+
+    Only failures of the mirror itself count: it could not be reached, answered with an HTTP
+    error, or did not start the download. A share page without a download button (e.g. a removed
+    share) says nothing about the mirror; see record_inconclusive().
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN,
+                 max_cooldown: float = CIRCUIT_MAX_COOLDOWN, max_trips: int = CIRCUIT_MAX_TRIPS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max(1, max_trips)
+        self._lock = threading.Lock()
+        self._domains: dict[str, _DomainState] = {}
+
+    def _state(self, domain: str) -> _DomainState:
+        state = self._domains.get(domain)
+        if state is None:
+            state = self._domains[domain] = _DomainState()
+        return state
+
+    def timeouts(self, domain: str) -> tuple[float, float]:
+        """Returns (seconds to wait for the download button, seconds to wait for the download to start)."""
+        with self._lock:
+            state = self._state(domain)
+            return state.page.timeout(), state.start.timeout()
+
+    def admit(self, domain: str) -> tuple[str, float]:
+        """
+        Asks the circuit breaker whether a link of `domain` may be tried now.
+
+        Returns:
+            tuple[str, float]: (ALLOW, 0), or (DEFER or REJECT, seconds until the link may be tried).
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(domain)
+            if state.trips == 0:
+                return ALLOW, 0.0
+            if now < state.open_until:
+                return (REJECT if state.trips >= self.max_trips else DEFER), state.open_until - now
+            if state.trial_running:
+                return DEFER, min(self.cooldown, 5.0)
+            state.trial_running = True  # Half-open: this link is the trial.
+            return ALLOW, 0.0
+
+    def record_success(self, domain: str, page_seconds: float | None = None, start_seconds: float | None = None) -> None:
+        """Records a successful download and the latencies observed on the way."""
+        with self._lock:
+            state = self._state(domain)
+            if page_seconds is not None:
+                state.page.observe(page_seconds)
+            if start_seconds is not None:
+                state.start.observe(start_seconds)
+            state.consecutive_failures = 0
+            state.trips = 0
+            state.trial_running = False
+
+    def abandon(self, domain: str) -> None:
+        """Forgets an admitted link that ended without saying anything about the domain (e.g. the browser crashed)."""
+        with self._lock:
+            self._state(domain).trial_running = False
+
+    def record_inconclusive(self, domain: str, timed_out_stage: str | None = None) -> None:
+        """
+        Records a failed download that was not the mirror's fault, e.g. its share page had no
+        download button. It neither counts against the circuit breaker nor ends a trial.
+
+        Args:
+            domain (str): The mirror domain.
+            timed_out_stage (str | None): "page" or "start" if a timeout expired on the way, which
+                lengthens the domain's timeout for the next try.
+        """
+        with self._lock:
+            state = self._state(domain)
+            if timed_out_stage == "page":
+                state.page.timed_out()
+            elif timed_out_stage == "start":
+                state.start.timed_out()
+            state.trial_running = False
+
+    def record_failure(self, domain: str, timed_out_stage: str | None = None) -> bool:
+        """
+        Records a download that failed because of the mirror (see the class docstring).
+
+        Args:
+            domain (str): The mirror domain.
+            timed_out_stage (str | None): "page" or "start" if the failure was that timeout expiring,
+                which lengthens the domain's timeout for the next try.
+
+        Returns:
+            bool: True if this failure opened the circuit.
+        """
+        with self._lock:
+            state = self._state(domain)
+            if timed_out_stage == "page":
+                state.page.timed_out()
+            elif timed_out_stage == "start":
+                state.start.timed_out()
+            state.consecutive_failures += 1
+            was_trial = state.trial_running
+            state.trial_running = False
+            if was_trial or (state.trips == 0 and state.consecutive_failures >= self.failure_threshold):
+                state.trips += 1
+                state.open_until = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** (state.trips - 1))
+                if state.trips >= self.max_trips:
+                    state.open_until = time.monotonic() + self.max_cooldown
+                return True
+            return False
+
+
+# Mirror health is shared by all batches of a run, so what was learned carries over.
+mirror_health = MirrorHealth()
@@ -1,10 +1,9 @@
 # core/session_manager.py
 # This module handles saving and loading the download session and failed/banned links.
 
-import json
-import os
 import logging
-from typing import Any
+import sqlite3
+from typing import Any, Iterable
 
 # --- Setup a basic logger ---
 # In a larger app, this would be configured in your main.py
@@ -12,113 +11,123 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # --- All file paths should be managed in the config file for professional code ---
 # We assume these are defined in your core.config
-from .config import SESSION_FILE, FAILED_LINKS_FILE, BANNED_LINKS_FILE
+from .banned_index import get_banned_index, BannedLinkIndex
+from .share_links import canonical_link_key
+from . import registry_client
+from .job_store import get_job_store, ACTIVE_STATES, PENDING, FAILED
 
 
 # --- Session Management ---
+# The session and the failed links live in the transactional job store (see core/job_store.py).
+# These functions keep the original JSON-era interface as views over that store.
+
+def _as_plain_job(job: dict) -> dict:
+    """Drops the store's bookkeeping keys, leaving the job dictionary the rest of the app expects."""
+    return {key: value for key, value in job.items() if key not in ("id", "link_ids")}
 
 def save_session(remaining_jobs: list[dict], output_folder: str) -> None:
     """
-    Saves the list of remaining download jobs and the output folder to a JSON file.
+    Saves the list of remaining download jobs and the output folder.
+
+    The remaining jobs replace the previous session's unfinished links in one atomic transaction.
+    While downloading, prefer updating single links with JobStore.set_link_state.
 
     Args:
         remaining_jobs (list[dict]): A list of download job dictionaries that are yet to be processed.
         output_folder (str): The path to the root output folder for this session.
     """
-    session_data = {
-        "remaining_jobs": remaining_jobs,
-        "output_folder": output_folder
-    }
     try:
-        with open(SESSION_FILE, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=4)
+        store = get_job_store()
+        store.replace_links_in(ACTIVE_STATES, remaining_jobs, PENDING)
+        store.set_meta("output_folder", output_folder)
         logging.info("Session saved successfully.")
     except Exception as e:
         logging.error(f"Error saving session: {e}")
 
 def load_session() -> dict[str, Any] | None:
     """
-    Loads session data from the session JSON file if it exists.
+    Loads the unfinished jobs of the current session.
 
     Returns:
-        dict | None: The loaded session data as a dictionary, or None if the file doesn't exist or an error occurs.
+        dict | None: {"remaining_jobs": [...], "output_folder": ...}, or None if there is no session or an error occurs.
     """
-    if os.path.exists(SESSION_FILE):
-        try:
-            with open(SESSION_FILE, "r", encoding="utf-8") as f:
-                logging.info("Previous session found. Loading...")
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logging.error(f"Error loading session file: {e}")
-            return None
-    return None
+    try:
+        store = get_job_store()
+        remaining_jobs = [_as_plain_job(job) for job in store.jobs_with_links_in(ACTIVE_STATES)]
+        output_folder = store.get_meta("output_folder")
+    except sqlite3.Error as e:
+        logging.error(f"Error loading session: {e}")
+        return None
+    if not remaining_jobs and output_folder is None:
+        return None
+    logging.info("Previous session found. Loading...")
+    return {"remaining_jobs": remaining_jobs, "output_folder": output_folder}
 
 def clear_session() -> None:
-    """Deletes the session file if it exists."""
-    if os.path.exists(SESSION_FILE):
-        try:
-            os.remove(SESSION_FILE)
-            logging.info("Session file cleared successfully.")
-        except OSError as e:
-            logging.error(f"Error clearing session file: {e}")
+    """Removes the unfinished jobs and the output folder of the current session."""
+    try:
+        store = get_job_store()
+        store.replace_links_in(ACTIVE_STATES, [], PENDING)
+        store.set_meta("output_folder", None)
+        logging.info("Session cleared successfully.")
+    except sqlite3.Error as e:
+        logging.error(f"Error clearing session: {e}")
 
 
 # --- Failed & Banned Link Management ---
 
 def save_failed_links(failed_jobs: list[dict]) -> None:
     """
-    Saves the list of failed link jobs to a JSON file.
+    Replaces the stored failed links with the given jobs.
 
     Args:
         failed_jobs (list[dict]): A list of job dictionaries that failed to download.
     """
     try:
-        with open(FAILED_LINKS_FILE, "w", encoding="utf-8") as f:
-            json.dump(failed_jobs, f, indent=4)
-    except IOError as e:
+        get_job_store().replace_links_in((FAILED,), failed_jobs, FAILED)
+    except sqlite3.Error as e:
         logging.error(f"Error saving failed links: {e}")
 
 def load_failed_links() -> list[dict]:
     """
-    Loads the list of failed link jobs from a JSON file.
+    Loads the failed links to retry, grouped into their jobs.
+
+    Each share is retried once even if it failed on several mirror domains, and shares that were
+    already downloaded from another mirror are left out.
 
     Returns:
         list[dict]: A list of failed jobs, or an empty list if none are found or an error occurs.
     """
-    if os.path.exists(FAILED_LINKS_FILE):
-        try:
-            with open(FAILED_LINKS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logging.error(f"Error loading failed links: {e}")
-            return []
-    return []
-
-def save_banned_links(banned_links_set: set[str]) -> None:
+    try:
+        return [_as_plain_job(job) for job in get_job_store().jobs_to_retry()]
+    except sqlite3.Error as e:
+        logging.error(f"Error loading failed links: {e}")
+        return []
+
+def save_banned_links(banned_links_set: Iterable[str]) -> None:
     """
-    Saves the set of permanently banned links to a JSON file.
+    Permanently bans links. Bans are appended to the banned-link index, so only the new links are written.
 
     Args:
-        banned_links_set (set[str]): A set of URL strings to ban.
+        banned_links_set (Iterable[str]): The URL strings to ban.
     """
     try:
-        with open(BANNED_LINKS_FILE, "w", encoding="utf-8") as f:
-            json.dump(list(banned_links_set), f, indent=4)
-    except IOError as e:
+        links = list(banned_links_set)
+        keys = {canonical_link_key(link) for link in links}
+        # Ban the canonical key as well, so the ban covers the same share on every mirror domain.
+        get_banned_index().add_many(links + list(keys))
+    except OSError as e:
         logging.error(f"Error saving banned links: {e}")
+        return
+    # Share the ban with the other clients through the backend's link registry.
+    registry_client.mark_links_in_background(keys, registry_client.BANNED)
 
-def load_banned_links() -> set[str]:
+def load_banned_links() -> BannedLinkIndex:
     """
-    Loads the set of permanently banned links from a JSON file.
+    Returns the permanently banned links.
 
     Returns:
-        set[str]: A set of banned links, or an empty set if none are found or an error occurs.
+        BannedLinkIndex: A set-like, disk-backed index that supports `link in banned_links`
+            without loading the whole ban list into memory.
     """
-    if os.path.exists(BANNED_LINKS_FILE):
-        try:
-            with open(BANNED_LINKS_FILE, "r", encoding="utf-8") as f:
-                return set(json.load(f))
-        except (json.JSONDecodeError, IOError) as e:
-            logging.error(f"Error loading banned links: {e}")
-            return set()
-    return set()
\ No newline at end of file
+    return get_banned_index()
@@ -0,0 +1,90 @@
+# core/share_links.py
+# This module maps every spelling of a link to one canonical key, so the same TeraBox share
+# posted on different mirror domains (or with different query strings) is only handled once.
+
+import re
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .link_classifier import classify_link
+
+# Canonical keys of TeraBox shares look like "terabox:s/1AbCdEf".
+TERABOX_KEY_PREFIX = "terabox:s/"
+
+# "/s/1AbCdEf" (optionally with a trailing slash or more path segments).
+_SHARE_PATH_PATTERN = re.compile(r"/s/([A-Za-z0-9_\-]+)")
+# The "surl" parameter of "/sharing/link?surl=AbCdEf" style links is the share ID without its leading "1".
+_SURL_PATTERN = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# How many distinct links are remembered by the memo cache.
+KEY_CACHE_SIZE = 100_000
+
+
+def extract_share_id(url: str) -> str | None:
+    """
+    Extracts the share ID of a TeraBox link, whichever mirror domain and URL form it uses.
+
+    Args:
+        url (str): The link to inspect.
+
+    Returns:
+        str | None: The share ID (e.g. "1AbCdEf"), or None if the link is not a TeraBox share.
+    """
+    if classify_link(url) != "TeraBox":
+        return None
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    match = _SHARE_PATH_PATTERN.match(parts.path)
+    if match:
+        return match.group(1)
+    for name, value in parse_qsl(parts.query):
+        if name.lower() == "surl" and _SURL_PATTERN.match(value):
+            return "1" + value
+    return None
+
+
+def _normalize_url(url: str) -> str:
+    """Lower-cases scheme and host, drops "www.", default ports and the fragment, and sorts the query."""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and str(port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{scheme}://{host}{path}" + (f"?{query}" if query else "")
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def canonical_link_key(url: str) -> str:
+    """
+    Returns the key under which a link is deduplicated, banned and retried.
+
+    TeraBox shares are keyed by their share ID, so "terabox.com/s/1abc", "1024terabox.com/s/1abc?x=y"
+    and "terafileshare.com/sharing/link?surl=abc" all map to the same key. Every other link is keyed
+    by its normalized URL.
+
+    Args:
+        url (str): The link to canonicalize.
+
+    Returns:
+        str: The canonical key.
+    """
+    share_id = extract_share_id(url)
+    if share_id is not None:
+        return TERABOX_KEY_PREFIX + share_id
+    return _normalize_url(url)
@@ -0,0 +1,155 @@
+# core/share_metadata.py
+# This module looks up the file name, size and status of TeraBox shares over plain HTTP, for a
+# whole batch at once and before any browser is involved. The scheduler uses the results to fail
+# dead shares right away and to choose the order jobs are downloaded in.
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from .config import SHARE_PREFETCH_WORKERS, SHARE_PREFETCH_TIMEOUT, SHARE_METADATA_API
+from .http_transfer import get_http_session
+from .metrics import metrics
+from .share_links import extract_share_id
+
+# Share states.
+ALIVE = "alive"
+DEAD = "dead"
+UNKNOWN = "unknown"  # Not a TeraBox share, or the lookup failed. Such links are always downloaded.
+
+# Order policies (see DOWNLOAD_ORDER in core/config.py).
+ORDER_MESSAGE = "message"
+ORDER_SMALLEST_FIRST = "smallest_first"
+ORDER_LARGEST_FIRST = "largest_first"
+
+# "errno" values of the share info API meaning the share was deleted, expired or never existed.
+_DEAD_ERRNOS = {-9, 105}
+_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"}
+
+
+def _unknown() -> dict:
+    return {"state": UNKNOWN, "name": None, "size": None}
+
+
+def fetch_share_info(link: str, session: requests.Session | None = None, api_base: str | None = SHARE_METADATA_API,
+                     timeout: tuple = SHARE_PREFETCH_TIMEOUT) -> dict:
+    """
+    Looks up one share without opening its page.
+
+    Args:
+        link (str): The share link.
+        session (requests.Session | None): The HTTP session to use. Defaults to the shared pooled session.
+        api_base (str | None): Base URL of the share info API. None uses the link's own mirror domain.
+        timeout (tuple): (connect, read) timeouts in seconds.
+
+    Returns:
+        dict: {"state": ALIVE, DEAD or UNKNOWN, "name": file name or None, "size": total bytes or None}.
+            The size is None when it is unknown, e.g. for a share containing folders.
+    """
+    share_id = extract_share_id(link)
+    if share_id is None:
+        return _unknown()
+    if api_base is None:
+        parts = urlsplit(link.strip())
+        api_base = f"{parts.scheme}://{parts.netloc}"
+    try:
+        response = (session or get_http_session()).get(
+            f"{api_base.rstrip('/')}/api/shorturlinfo", params={"shorturl": share_id, "root": 1},
+            headers=_HEADERS, timeout=timeout,
+        )
+        # Any HTTP error, 404 included, says something about the mirror or the API, not the share.
+        response.raise_for_status()
+        data = response.json()
+        errno = int(data.get("errno", 0))
+    except (requests.RequestException, ValueError, TypeError, AttributeError) as e:
+        logging.info(f"Could not look up {link}: {e}")
+        return _unknown()
+    if errno in _DEAD_ERRNOS:
+        return {"state": DEAD, "name": None, "size": None}
+    files = data.get("list")
+    if errno != 0 or not isinstance(files, list):
+        # E.g. rate limiting or a captcha: say nothing rather than drop a share that may be fine.
+        return _unknown()
+    if not files:
+        return {"state": DEAD, "name": None, "size": None}
+    try:
+        size = None if any(str(f.get("isdir", 0)) == "1" for f in files) else sum(int(f.get("size", 0)) for f in files)
+        name = files[0].get("server_filename") if len(files) == 1 else None
+    except (ValueError, TypeError, AttributeError):
+        return _unknown()
+    return {"state": ALIVE, "name": name, "size": size}
+
+
+def prefetch_share_info(links, workers: int = SHARE_PREFETCH_WORKERS, session: requests.Session | None = None,
+                        api_base: str | None = SHARE_METADATA_API) -> dict[str, dict]:
+    """
+    Looks up many shares in parallel over pooled connections. Every share is asked for once,
+    however many times and on however many mirror domains it is linked.
+
+    Args:
+        links (iterable[str]): The links of a batch.
+        workers (int): Number of lookups made in parallel.
+        session (requests.Session | None): The HTTP session to use. Defaults to the shared pooled session.
+        api_base (str | None): Base URL of the share info API. None uses each link's mirror domain.
+
+    Returns:
+        dict[str, dict]: The fetch_share_info() result of every link.
+    """
+    by_share: dict[str, list[str]] = {}
+    results = {}
+    for link in links:
+        share_id = extract_share_id(link)
+        if share_id is None:
+            results[link] = _unknown()
+        else:
+            by_share.setdefault(share_id, []).append(link)
+    if not by_share:
+        return results
+
+    session = session or get_http_session()
+    with metrics.span("prefetch"), ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="Prefetch") as executor:
+        infos = executor.map(lambda share_links: fetch_share_info(share_links[0], session, api_base), by_share.values())
+        for share_links, info in zip(by_share.values(), infos):
+            metrics.inc("prefetch_shares_total", state=info["state"])
+            for link in share_links:
+                results[link] = info
+    return results
+
+
+def job_size(job: dict, infos: dict[str, dict]) -> int | None:
+    """The total size of a job's live shares in bytes, or None if any of them is unknown."""
+    total = 0
+    for link in job.get('links', []):
+        info = infos.get(link) or _unknown()
+        if info["state"] == DEAD:
+            continue
+        if info["size"] is None:
+            return None
+        total += info["size"]
+    return total
+
+
+def order_jobs(jobs: list[dict], infos: dict[str, dict], policy: str = ORDER_MESSAGE) -> list[int]:
+    """
+    Decides the order a batch of jobs is downloaded in.
+
+    Args:
+        jobs (list[dict]): The download jobs.
+        infos (dict[str, dict]): Share info per link, from prefetch_share_info().
+        policy (str): ORDER_MESSAGE, ORDER_SMALLEST_FIRST or ORDER_LARGEST_FIRST.
+
+    Returns:
+        list[int]: The indices of the jobs, in download order. Jobs of unknown size come last,
+            in their original order.
+    """
+    if policy == ORDER_MESSAGE or not infos:
+        return list(range(len(jobs)))
+    if policy not in (ORDER_SMALLEST_FIRST, ORDER_LARGEST_FIRST):
+        logging.error(f"Unknown download order '{policy}', keeping the message order.")
+        return list(range(len(jobs)))
+    sign = 1 if policy == ORDER_SMALLEST_FIRST else -1
+    sizes = [job_size(job, infos) for job in jobs]
+    # sorted() is stable, so jobs of the same size keep their message order.
+    return sorted(range(len(jobs)), key=lambda n: (sizes[n] is None, 0 if sizes[n] is None else sign * sizes[n]))
@@ -0,0 +1,62 @@
+# core/startup.py
+# This module measures where the desktop client's start-up time goes. main.py and the start-up
+# tasks record named phases; once the UI reports that it is ready, a report of every phase
+# (with its thread, start offset and duration) is printed to the console.
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StartupTimer:
+    """Records the phases of the application start, relative to the moment the timer was created."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: list[tuple[float, float, str, str]] = []  # (start, end, name, thread)
+        self._finished_at = None
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """Records a phase that ran from `start` to `end` (time.perf_counter() values)."""
+        with self._lock:
+            self._phases.append((start, end, name, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block as one start-up phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def finish(self) -> bool:
+        """
+        Marks the application as started.
+
+        Returns:
+            bool: True the first time it is called (later calls, e.g. after a page reload, change nothing).
+        """
+        with self._lock:
+            if self._finished_at is not None:
+                return False
+            self._finished_at = time.perf_counter()
+            return True
+
+    def report(self) -> str:
+        """Returns a table of every recorded phase, in the order they started."""
+        with self._lock:
+            phases = sorted(self._phases)
+            finished_at = self._finished_at
+        lines = ["--- Start-up timings ---", f"{'start':>9}  {'duration':>9}  {'thread':<16} phase"]
+        for start, end, name, thread in phases:
+            lines.append(f"{(start - self.started) * 1000:7.1f}ms  {(end - start) * 1000:7.1f}ms  {thread:<16} {name}")
+        if finished_at is not None:
+            lines.append(f"UI ready {(finished_at - self.started) * 1000:.1f} ms after start.")
+        return "\n".join(lines)
+
+
+# The timer of this process, started when the application first imports this module.
+startup_timer = StartupTimer()
@@ -1,7 +1,49 @@
 # core/utils.py
 # A toolbox for helper functions that can be used across the application.
 
-import tkinter as tk
+import json
+import logging
+import sys
+from functools import lru_cache
+
+from .config import SCREEN_GEOMETRY_CACHE_FILE
+
+
+@lru_cache(maxsize=1)
+def get_screen_size() -> tuple[int, int]:
+    """
+    Returns the (width, height) of the primary screen.
+
+    Creating a Tk root only to read the screen size costs a noticeable part of the start-up time,
+    so on Windows the size is read straight from the system, and elsewhere it is measured once and
+    kept in SCREEN_GEOMETRY_CACHE_FILE.
+
+    Returns:
+        tuple: The screen's (width, height) in pixels.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)  # SM_CXSCREEN, SM_CYSCREEN
+
+    try:
+        with open(SCREEN_GEOMETRY_CACHE_FILE, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        return int(cached["width"]), int(cached["height"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    import tkinter as tk  # Imported here: only needed when there is no cached size.
+    root = tk.Tk()
+    root.withdraw()
+    size = root.winfo_screenwidth(), root.winfo_screenheight()
+    root.destroy()
+    try:
+        with open(SCREEN_GEOMETRY_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"width": size[0], "height": size[1]}, f)
+    except OSError as e:
+        logging.error(f"Could not cache the screen size: {e}")
+    return size
 
 def get_screen_center_position(window_size: tuple[int, int]) -> tuple[int, int]:
     """
@@ -13,10 +55,7 @@ def get_screen_center_position(window_size: tuple[int, int]) -> tuple[int, int]:
     Returns:
         tuple: A tuple containing the (x, y) coordinates for the top-left corner.
     """
-    root = tk.Tk()
-    root.withdraw()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
+    screen_width, screen_height = get_screen_size()
     
     x = (screen_width / 2) - (window_size[0] / 2)
     y = (screen_height / 2) - (window_size[1] / 2)
@@ -1,9 +1,14 @@
 # desktop-client/main.py
 # The main entry point for the VortexFlow Desktop Client.
 
-import eel
 import os
-import tkinter as tk
+import threading
+
+# Started first, so the start-up report covers the imports below as well.
+from core.startup import startup_timer
+
+with startup_timer.phase("import eel"):
+    import eel
 
 print("--- STARTING DEBUG ---")
 
@@ -27,48 +32,71 @@ else:
 print("--- ENDING DEBUG ---")
 
 
-from tkinter import filedialog
-import requests
-from typing import Dict
-
 # Import from our new, organized core modules
-# from core.app_logic import expose_all_functions # In the future, you can uncomment this
+# app_logic only imports what the window needs; the analysis and download engines are loaded
+# in the background once the UI is up (see app_logic.ui_ready).
+with startup_timer.phase("import app_logic"):
+    from core import app_logic  # Registers the functions exposed to the UI.
 from core.utils import get_screen_center_position
-from core.config import LOCAL_DOWNLOAD_FOLDER, SORTED_OUTPUT_FOLDER
+from core.config import LOCAL_DOWNLOAD_FOLDER, SORTED_OUTPUT_FOLDER, METRICS_SERVER_ENABLED, METRICS_PORT
+from core.metrics import start_metrics_server
 
 def test_backend_connection() -> bool:
     """Pings the FastAPI backend server to check if it's running."""
+    import requests  # Only needed here, and slow to import; this runs in a background thread.
     try:
         response = requests.get("http://127.0.0.1:8000/ping", timeout=3)
         return response.status_code == 200 and response.json().get("response") == "pong"
     except requests.exceptions.ConnectionError:
         return False
 
-# This tells Eel where to find the UI files
-eel.init('web')
-
-# This is the main execution block
-if __name__ == '__main__':
-    # --- 1. Application Startup Logic ---
-    print("--- VortexFlow Initializing ---")
-    
-    os.makedirs(LOCAL_DOWNLOAD_FOLDER, exist_ok=True)
-    os.makedirs(SORTED_OUTPUT_FOLDER, exist_ok=True)
+def prepare_folders() -> None:
+    """Creates the download and output folders if they don't exist yet."""
+    with startup_timer.phase("prepare folders"):
+        os.makedirs(LOCAL_DOWNLOAD_FOLDER, exist_ok=True)
+        os.makedirs(SORTED_OUTPUT_FOLDER, exist_ok=True)
     print(f"Required folders are ready.")
 
-    # --- TEST THE BACKEND CONNECTION ON STARTUP ---
+def check_backend() -> None:
+    """Reports whether the backend answers. Runs while the window opens instead of before it."""
     print("--- Attempting to establish first contact with backend... ---")
-    if test_backend_connection():
+    with startup_timer.phase("backend ping"):
+        connected = test_backend_connection()
+    if connected:
         print("Backend connection successful!")
     else:
         print("Backend connection FAILED. The app may not function correctly.")
     print("----------------------------------------------------------")
 
+def start_metrics() -> None:
+    """Serves the stage timings for Prometheus (or a quick look in the browser) while the app runs."""
+    with startup_timer.phase("metrics server"):
+        started = start_metrics_server(METRICS_PORT)
+    if started:
+        print(f"Metrics available at http://127.0.0.1:{METRICS_PORT}/metrics")
+
+# This tells Eel where to find the UI files
+with startup_timer.phase("eel.init"):
+    eel.init('web')
+
+# This is the main execution block
+if __name__ == '__main__':
+    # --- 1. Application Startup Logic ---
+    print("--- VortexFlow Initializing ---")
+    
+    # None of these tasks is needed to show the window, so they run next to eel.start().
+    startup_tasks = [prepare_folders, check_backend]
+    if METRICS_SERVER_ENABLED:
+        startup_tasks.append(start_metrics)
+    for task in startup_tasks:
+        threading.Thread(target=task, name=f"Startup-{task.__name__}", daemon=True).start()
+
     # --- 2. Start the Eel Application ---
     print("Starting VortexFlow UI...")
     
     window_size = (1200, 800)
-    window_position = get_screen_center_position(window_size)
+    with startup_timer.phase("screen geometry"):
+        window_position = get_screen_center_position(window_size)
 
     eel.start(
     'dev.html',  # <-- Tell Eel to open our new loader file
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# Makes the "core" package importable when the tests are run from the desktop-client folder:
+#     python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
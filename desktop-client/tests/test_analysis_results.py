@@ -0,0 +1,21 @@
+# tests/test_analysis_results.py
+# Paging through a stored analysis result the way the UI does.
+
+from core.analysis_results import AnalysisResultStore, JOBS, LINKS
+
+RESULT = {
+    "unique_links": ["https://terabox.com/s/1a", "https://youtube.com/watch?v=b"],
+    "download_jobs": [
+        {"source_file": "messages.html", "type": "SINGLE", "folder_name": "Holiday", "links": ["https://terabox.com/s/1a"]},
+    ],
+}
+
+
+def test_a_missing_search_matches_everything():
+    store = AnalysisResultStore()
+    handle = store.add(RESULT)["handle"]
+    for kind in (LINKS, JOBS):
+        page = store.page(handle, kind, search=None)
+        assert page == store.page(handle, kind, search="")
+        assert page["total"] == len(RESULT["unique_links"] if kind == LINKS else RESULT["download_jobs"])
+    assert store.page(handle, JOBS, search="HOLIDAY")["total"] == 1
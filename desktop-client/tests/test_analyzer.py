@@ -0,0 +1,108 @@
+# tests/test_analyzer.py
+# The analyzer's modes must not change its results: every case analyzes a generated export two
+# ways and compares the outcomes.
+
+import re
+
+import pytest
+
+from benchmarks.export_generator import generate_export
+from core import analysis_cache, analyzer
+from core.config import TERABOX_DOMAINS
+from core.share_links import canonical_link_key
+
+
+@pytest.fixture(autouse=True)
+def isolated_analysis(tmp_path, monkeypatch):
+    """Keeps the cache in a temp folder and starts from an empty ban list."""
+    cache_dir = tmp_path / "analysis_cache"
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(analysis_cache, "INDEX_FILE", str(cache_dir / "index.json"))
+    monkeypatch.setattr(analyzer, "load_banned_links", lambda: set())
+
+
+def _analyze(paths, **kwargs):
+    options = {"streaming": True, "workers": 1, "use_cache": False, "use_registry": False}
+    options.update(kwargs)
+    return analyzer.analyze_html_files(paths, **options)
+
+
+def _without_sources(results):
+    """
+    The results without the export file names, which differ between the HTML and JSON exports
+    (the folders of multi-link messages are named after their file).
+    """
+    return dict(results, download_jobs=[
+        dict(links=job["links"], type=job["type"], folder_name=job["folder_name"].replace(job["source_file"], ""))
+        for job in results["download_jobs"]
+    ])
+
+
+def test_json_export_gives_the_same_jobs_as_html(tmp_path):
+    html_paths = generate_export(str(tmp_path / "html"), messages=600)
+    json_paths = generate_export(str(tmp_path / "json"), messages=600, export_format="json")
+    html_results = _analyze(html_paths)
+    assert html_results["download_jobs"]
+    assert _without_sources(_analyze(json_paths)) == _without_sources(html_results)
+
+
+def test_a_scan_cached_by_another_extractor_is_not_used(tmp_path):
+    json_paths = generate_export(str(tmp_path / "json"), messages=300, export_format="json")
+    # What an older version cached for a result.json: an HTML scan that found nothing.
+    analysis_cache.store_scan(json_paths[0], {"records": [], "message_count": 0, "complete": True}, "html")
+    assert _analyze(json_paths, use_cache=True) == _analyze(json_paths)
+
+
+def test_streaming_and_soup_parsers_agree(tmp_path):
+    paths = generate_export(str(tmp_path / "export"), messages=600)
+    streamed = _analyze(paths)
+    assert streamed["download_jobs"]
+    assert _analyze(paths, streaming=False) == streamed
+
+
+def test_parallel_workers_give_the_same_results_as_one(tmp_path):
+    # Reposts across the files, so the merge order decides which link of a share is kept.
+    paths = generate_export(str(tmp_path / "export"), messages=900, files=3, duplicate_rate=0.5)
+    sequential = _analyze(paths)
+    assert sequential["duplicate_count"]
+    assert _analyze(paths, workers=3) == sequential
+
+
+def test_a_warm_cache_gives_the_same_results_as_a_cold_one(tmp_path):
+    paths = generate_export(str(tmp_path / "export"), messages=600, files=2)
+    cold = _analyze(paths, use_cache=True)
+    assert cold["download_jobs"]
+    assert _analyze(paths, use_cache=True) == cold
+    assert _analyze(paths) == cold
+
+
+def test_an_appended_export_is_resumed_to_the_same_results(tmp_path):
+    [path] = generate_export(str(tmp_path / "export"), messages=300)
+    _analyze([path], use_cache=True)
+    # The same seed writes the same first 300 messages, then 300 more.
+    generate_export(str(tmp_path / "export"), messages=600)
+    assert analysis_cache.load_cached_scan(path, "html")["resume_offset"] is not None
+    resumed = _analyze([path], use_cache=True)
+    assert analysis_cache.load_cached_scan(path, "html")["resume_offset"] is None
+    assert resumed == _analyze([path])
+
+
+def test_reposts_on_other_mirrors_are_one_job(tmp_path):
+    [path] = generate_export(str(tmp_path / "mirrors"), messages=600, duplicate_rate=0.5)
+    # The same export with every TeraBox link pointing to a single mirror domain (the link texts,
+    # which name the folders, are left alone).
+    mirror = re.compile(r'href="https://(www\.)?(' + "|".join(map(re.escape, TERABOX_DOMAINS)) + r")/")
+    with open(path, encoding="utf-8") as f:
+        single_mirror = mirror.sub('href="https://terabox.com/', f.read())
+    (tmp_path / "one_mirror").mkdir()
+    one_mirror_path = tmp_path / "one_mirror" / "messages.html"
+    one_mirror_path.write_text(single_mirror, encoding="utf-8")
+
+    def shares(results):
+        # The link statistics count spellings; the jobs and the TeraBox count go by share.
+        jobs = [dict(job, links=sorted(canonical_link_key(link) for link in job["links"])) for job in results["download_jobs"]]
+        return results["terabox_count"], jobs
+
+    mirrored = shares(_analyze([path]))
+    assert mirrored[0] < single_mirror.count('href="https://terabox.com/')
+    assert shares(_analyze([str(one_mirror_path)])) == mirrored
@@ -0,0 +1,73 @@
+# tests/test_download_scheduler.py
+# The scheduler's workers against a fake browser pool: which browser work they hand to the
+# downloader, and how they get over a browser they can't use.
+
+import pytest
+
+from core import download_scheduler
+from core.download_scheduler import DownloadScheduler
+from core.retry_policy import MirrorHealth, RetryPolicy
+
+JOBS = [{"source_file": "messages.html", "type": "SINGLE", "folder_name": "Video",
+         "links": ["https://terabox.com/s/1a", "https://terabox.com/s/1b"]}]
+
+
+class _FakePool:
+    def __init__(self):
+        self.started = 0
+        self.discarded = []
+
+    def acquire(self, log_callback, download_dir, **kind):
+        self.started += 1
+        return f"browser-{self.started}"
+
+    def release(self, driver):
+        pass
+
+    def discard(self, driver):
+        self.discarded.append(driver)
+
+    def note_page(self, driver):
+        pass
+
+    def needs_recycling(self, driver):
+        return False
+
+    @staticmethod
+    def is_healthy(driver):
+        return True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = _FakePool()
+    monkeypatch.setattr(download_scheduler, "driver_pool", pool)
+    return pool
+
+
+def _scheduler(tmp_path, **kwargs):
+    return DownloadScheduler(lambda message: None, num_workers=1, prefetch=False, download_root=str(tmp_path),
+                             retry_policy=RetryPolicy(max_attempts=1), health=MirrorHealth(), **kwargs)
+
+
+def test_workers_use_the_schedulers_engine(tmp_path, monkeypatch, pool):
+    engines = []
+
+    def download(driver, url, log_callback, engine=None, **kwargs):
+        engines.append(engine)
+        return [str(tmp_path / url.rsplit("/", 1)[1])]
+
+    monkeypatch.setattr(download_scheduler, "download_file_locally", download)
+    [result] = _scheduler(tmp_path, engine="http").run(JOBS)
+    assert result["status"] == "done"
+    assert engines == ["http", "http"]
+
+
+def test_a_browser_without_a_pipeline_is_replaced(tmp_path, monkeypatch, pool):
+    def pipeline(driver, download_dir, log_callback):
+        raise RuntimeError("no download events")
+
+    monkeypatch.setattr(download_scheduler, "TabPipeline", pipeline)
+    [result] = _scheduler(tmp_path, engine="browser", pipeline_depth=2).run(JOBS)
+    assert result["failed_links"] == JOBS[0]["links"]
+    assert pool.discarded == ["browser-1", "browser-2"]
@@ -0,0 +1,69 @@
+# tests/test_file_placement.py
+# Placing files into the sorted folder: names are claimed atomically, so concurrent placers of
+# files with the same name never overwrite each other.
+
+import os
+import threading
+
+from core import file_placement
+
+
+def test_concurrent_placements_of_the_same_name_keep_every_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_placement, "_index", file_placement.ContentIndex(str(tmp_path / "content.db")))
+    destination = tmp_path / "sorted"
+    destination.mkdir()
+    sources = []
+    for n in range(16):
+        folder = tmp_path / f"worker_{n}"
+        folder.mkdir()
+        path = folder / "video.mp4"
+        path.write_bytes(f"content {n}".encode() * (n + 1))  # Different content, so nothing is deduplicated.
+        sources.append(str(path))
+
+    start = threading.Barrier(len(sources))
+    placed = []
+
+    def place(source):
+        start.wait()
+        placed.append(file_placement.place_file(source, str(destination)))
+
+    threads = [threading.Thread(target=place, args=(source,)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(placed)) == len(sources)
+    assert sorted(os.listdir(destination)) == sorted(os.path.basename(path) for path in placed)
+    contents = {(destination / name).read_bytes() for name in os.listdir(destination)}
+    assert len(contents) == len(sources)
+
+
+def test_claim_destination_skips_taken_names(tmp_path):
+    (tmp_path / "a.txt").write_text("taken")
+    first = file_placement.claim_destination(str(tmp_path), "a.txt")
+    second = file_placement.claim_destination(str(tmp_path), "a.txt")
+    assert os.path.basename(first) == "a (1).txt"
+    assert os.path.basename(second) == "a (2).txt"
+    assert (tmp_path / "a.txt").read_text() == "taken"
+
+
+def test_a_duplicate_that_cannot_be_hard_linked_is_placed_as_it_is(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_placement, "_index", file_placement.ContentIndex(str(tmp_path / "content.db")))
+
+    def link(source, destination):
+        raise OSError("Invalid cross-device link")
+
+    monkeypatch.setattr(file_placement.os, "link", link)
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    for folder in (tmp_path / "worker_1", tmp_path / "worker_2"):
+        folder.mkdir()
+        (folder / "video.mp4").write_bytes(b"same content")
+
+    file_placement.place_file(str(tmp_path / "worker_1" / "video.mp4"), str(first), "hardlink")
+    placed = file_placement.place_file(str(tmp_path / "worker_2" / "video.mp4"), str(second), "hardlink")
+    assert placed == str(second / "video.mp4")
+    assert (second / "video.mp4").read_bytes() == b"same content"
+    assert not (tmp_path / "worker_2" / "video.mp4").exists()
@@ -0,0 +1,121 @@
+# tests/test_http_transfer.py
+# The HTTP download engine against a local server that supports Range requests: segmented
+# transfers, resuming after an interruption, and what must never be resumed or overwritten.
+
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core import http_transfer
+
+FILE_SIZE = 8 * 1024 * 1024  # Two segments of HTTP_MIN_SEGMENT_SIZE.
+
+
+class _RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, content: bytes):
+        super().__init__(("127.0.0.1", 0), _RangeHandler)
+        self.content = content
+        self.etag = '"v1"'
+        self.bytes_sent = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/files/video.mp4"
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = self.server.content
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if match and (if_range is None or if_range == self.server.etag):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(content) - 1
+            body = content[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server._count_lock:
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = _RangeServer(os.urandom(FILE_SIZE))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def _interrupt_after(limit: int):
+    """A progress callback that stops the transfer once `limit` bytes arrived, like a crash would."""
+    def progress(done, total):
+        if done >= limit:
+            raise _Interrupted()
+    return progress
+
+
+def _download(server, directory, **kwargs):
+    return http_transfer.download_file(server.url, str(directory), lambda message: None, segments=2,
+                                       session=requests.Session(), **kwargs)
+
+
+def test_segmented_download(server, tmp_path):
+    path = _download(server, tmp_path)
+    assert path == str(tmp_path / "video.mp4")
+    assert open(path, "rb").read() == server.content
+    assert sorted(os.listdir(tmp_path)) == ["video.mp4"]
+
+
+def test_resumes_after_an_interruption(server, tmp_path):
+    with pytest.raises(_Interrupted):
+        _download(server, tmp_path, progress_callback=_interrupt_after(FILE_SIZE // 2))
+    assert os.path.exists(tmp_path / ("video.mp4" + http_transfer.PART_SUFFIX))
+    sent_before = server.bytes_sent
+
+    path = _download(server, tmp_path)
+    assert open(path, "rb").read() == server.content
+    # Only the part that was missing is fetched again (plus the one-byte probe).
+    assert server.bytes_sent - sent_before < FILE_SIZE
+    assert sorted(os.listdir(tmp_path)) == ["video.mp4"]
+
+
+def test_does_not_resume_a_changed_file(server, tmp_path):
+    with pytest.raises(_Interrupted):
+        _download(server, tmp_path, progress_callback=_interrupt_after(FILE_SIZE // 2))
+    server.content = os.urandom(FILE_SIZE)
+    server.etag = '"v2"'
+
+    path = _download(server, tmp_path)
+    assert open(path, "rb").read() == server.content
+
+
+def test_never_overwrites_an_existing_file(server, tmp_path):
+    (tmp_path / "video.mp4").write_bytes(b"left over from an earlier download")
+    path = _download(server, tmp_path)
+    assert os.path.basename(path) == "video (1).mp4"
+    assert open(path, "rb").read() == server.content
+    assert (tmp_path / "video.mp4").read_bytes() == b"left over from an earlier download"
@@ -0,0 +1,38 @@
+# tests/test_job_store.py
+# Running a batch again (e.g. a resumed session) must track its links in the rows it already has.
+
+from core.job_store import JobStore, PENDING, RESOLVING, DOWNLOADING, DONE, FAILED
+
+JOBS = [
+    {"source_file": "messages.html", "type": "MULTI", "folder_name": "Album", "links": ["https://a/1", "https://a/2"]},
+    {"source_file": "messages.html", "type": "SINGLE", "folder_name": "Video", "links": ["https://a/3"]},
+]
+
+
+def test_a_rerun_reuses_the_stored_rows(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    first = store.add_or_reuse_jobs(JOBS)
+    for state in (RESOLVING, DOWNLOADING, DONE):
+        store.set_link_state(first[0][0], state)
+    store.set_link_state(first[0][1], RESOLVING)
+    store.set_link_state(first[0][1], FAILED)
+
+    again = store.add_or_reuse_jobs(JOBS)
+    assert again == first
+    assert store.count_links(PENDING) == 3
+    assert [job["link_ids"] for job in store.jobs_with_links_in([PENDING])] == first
+
+
+def test_identical_jobs_in_one_batch_get_their_own_rows(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    ids = store.add_or_reuse_jobs([JOBS[1], JOBS[1]])
+    assert ids[0] != ids[1]
+    assert store.add_or_reuse_jobs([JOBS[1], JOBS[1]]) == ids
+
+
+def test_a_link_can_be_retried_after_its_transfer_broke_off(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    [[link_id, _], _] = store.add_or_reuse_jobs(JOBS)
+    for state in (RESOLVING, DOWNLOADING, RESOLVING, DOWNLOADING, DONE):
+        store.set_link_state(link_id, state)
+    assert store.count_links(DONE) == 1
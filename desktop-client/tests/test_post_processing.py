@@ -0,0 +1,69 @@
+# tests/test_post_processing.py
+# The extract stage: archives are unpacked into the sorted folder, and archives that can't be
+# unpacked are sorted as they are instead of being left behind.
+
+import os
+import zipfile
+
+import pytest
+
+from core import downloader, file_placement
+from core.post_processing import PostProcessor
+
+
+@pytest.fixture
+def sorted_root(tmp_path, monkeypatch):
+    root = tmp_path / "sorted"
+    monkeypatch.setattr(downloader, "SORTED_OUTPUT_FOLDER", str(root))
+    monkeypatch.setattr(file_placement, "_index", file_placement.ContentIndex(str(tmp_path / "content.db")))
+    return root
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def _process(paths, **kwargs):
+    processor = PostProcessor(lambda message: None, verify=False, **kwargs).start()
+    processor.submit({"type": "SINGLE", "folder_name": "job"}, paths)
+    return processor.close()
+
+
+def _sorted_files(sorted_root):
+    job = sorted_root / "Single_File_Downloads" / "job"
+    return sorted(os.path.relpath(os.path.join(root, name), job)
+                  for root, _, names in os.walk(job) for name in names)
+
+
+def test_archives_are_extracted(tmp_path, sorted_root):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    path = _zip(downloads / "photos.zip", {"a.jpg": b"a", "b/c.jpg": b"c"})
+    _process([path])
+    assert _sorted_files(sorted_root) == [os.path.join("photos", "a.jpg"), os.path.join("photos", "b", "c.jpg")]
+    assert os.listdir(downloads) == []
+
+
+def test_a_damaged_archive_is_sorted_without_unpacking(tmp_path, sorted_root):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    path = _zip(downloads / "photos.zip", {"a.jpg": os.urandom(4096)})
+    data = bytearray(open(path, "rb").read())
+    data[100:200] = bytes(100)  # Inside the member's compressed data.
+    open(path, "wb").write(data)
+
+    summary = _process([path])
+    assert _sorted_files(sorted_root) == ["photos.zip"]
+    assert os.listdir(downloads) == []  # No staging folder left behind.
+    assert summary["extract"]["failed"] == 0
+
+
+def test_an_archive_over_the_size_limit_is_not_unpacked(tmp_path, sorted_root):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    path = _zip(downloads / "big.zip", {"zeros.bin": bytes(1024 * 1024)})
+    _process([path], max_extracted_size=1024)
+    assert _sorted_files(sorted_root) == ["big.zip"]
@@ -0,0 +1,29 @@
+# tests/test_retry_policy.py
+# The mirror circuit breaker: what counts against a mirror, and what happens to links of a mirror
+# that keeps failing.
+
+from core.retry_policy import MirrorHealth, ALLOW, DEFER, REJECT
+
+
+def test_pages_without_a_download_button_do_not_open_the_circuit():
+    health = MirrorHealth(failure_threshold=2)
+    for _ in range(5):
+        health.record_inconclusive("mirror.com", "page")
+    assert health.admit("mirror.com") == (ALLOW, 0.0)
+    # The page timeout is still lengthened for the next try.
+    assert health.timeouts("mirror.com")[0] > MirrorHealth().timeouts("mirror.com")[0]
+
+
+def test_mirror_failures_open_the_circuit():
+    health = MirrorHealth(failure_threshold=2, cooldown=60)
+    assert not health.record_failure("mirror.com", "start")
+    assert health.record_failure("mirror.com")
+    decision, wait = health.admit("mirror.com")
+    assert decision == DEFER and 0 < wait <= 60
+
+
+def test_a_rejected_link_waits_for_the_cooldown():
+    health = MirrorHealth(failure_threshold=1, cooldown=0, max_cooldown=120, max_trips=1)
+    health.record_failure("mirror.com")
+    decision, wait = health.admit("mirror.com")
+    assert decision == REJECT and 0 < wait <= 120
@@ -0,0 +1,49 @@
+# tests/test_share_metadata.py
+# Share lookups against the stand-in share info API (benchmarks/share_server.py): only the API's
+# own answer may mark a share as dead.
+
+import pytest
+import requests
+
+from benchmarks.share_server import ShareServer
+from core.share_metadata import fetch_share_info, prefetch_share_info, ALIVE, DEAD, UNKNOWN
+
+SHARES = {
+    "1Alive": [{"server_filename": "video.mp4", "size": "1048576", "isdir": "0"}],
+    "1Folder": [{"server_filename": "album", "size": "0", "isdir": "1"}],
+    "1Empty": [],
+    "1Deleted": None,
+}
+
+
+@pytest.fixture
+def server():
+    server = ShareServer(SHARES).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _lookup(server, share_id, api_base=None):
+    with requests.Session() as session:
+        return fetch_share_info(f"https://www.terabox.com/s/{share_id}", session, api_base or server.base_url)
+
+
+def test_the_api_answer_decides_the_state(server):
+    assert _lookup(server, "1Alive") == {"state": ALIVE, "name": "video.mp4", "size": 1048576}
+    assert _lookup(server, "1Folder") == {"state": ALIVE, "name": "album", "size": None}
+    assert _lookup(server, "1Empty")["state"] == DEAD
+    assert _lookup(server, "1Deleted")["state"] == DEAD
+
+
+def test_an_http_404_does_not_mean_the_share_is_gone(server):
+    # E.g. a mirror that doesn't serve the API at this path.
+    assert _lookup(server, "1Alive", api_base=f"{server.base_url}/elsewhere")["state"] == UNKNOWN
+
+
+def test_a_share_linked_on_several_mirrors_is_looked_up_once(server):
+    links = ["https://www.terabox.com/s/1Alive", "https://1024terabox.com/s/1Alive", "https://example.com/video"]
+    with requests.Session() as session:
+        infos = prefetch_share_info(links, session=session, api_base=server.base_url)
+    assert [infos[link]["state"] for link in links] == [ALIVE, ALIVE, UNKNOWN]
+    assert server.requests_served == 1
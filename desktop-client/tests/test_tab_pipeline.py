@@ -0,0 +1,143 @@
+# tests/test_tab_pipeline.py
+# TabPipeline against a fake browser that sends ChromeDriver's download events: overlapping
+# downloads in different tabs must each end up with their own link.
+
+import json
+import os
+
+from core import downloader
+from core.downloader import TabPipeline
+
+
+class _Button:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        self.driver.clicked(self.driver.current_window_handle)
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.tab_count += 1
+        handle = f"TAB{self.driver.tab_count}"
+        self.driver.window_handles.append(handle)
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class _FakeBrowser:
+    """
+    Saves every download as <download path>/<guid>, like Chrome with "allowAndName", and only
+    finishes a download when the test says so.
+    """
+
+    def __init__(self):
+        self.window_handles = ["HOME"]
+        self.current_window_handle = "HOME"
+        self.switch_to = _SwitchTo(self)
+        self.tab_count = 0
+        self.download_path = None
+        self.urls = {}  # tab -> share URL
+        self.pending = []  # (tab, url) of clicked downloads that did not begin yet
+        self.events = []
+        self.cancelled = []
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Browser.setDownloadBehavior":
+            assert params["behavior"] == "allowAndName"
+            self.download_path = params["downloadPath"]
+        elif command == "Browser.cancelDownload":
+            self.cancelled.append(params["guid"])
+        return {}
+
+    def get(self, url):
+        self.urls[self.current_window_handle] = url
+
+    def find_element(self, *args):
+        return _Button(self)
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def get_log(self, kind):
+        assert kind == "performance"
+        events, self.events = self.events, []
+        return events
+
+    def clicked(self, tab):
+        self.pending.append(tab)
+
+    def _event(self, tab, method, **params):
+        self.events.append({"message": json.dumps({"message": {"method": method, "params": params}, "webview": tab})})
+
+    def begin(self, tab, guid, name):
+        self._event(tab, "Page.downloadWillBegin", frameId=tab, guid=guid, url=self.urls[tab], suggestedFilename=name)
+        with open(os.path.join(self.download_path, guid), "wb") as f:
+            f.write(self.urls[tab].encode())
+
+    def complete(self, tab, guid):
+        self._event(tab, "Page.downloadProgress", guid=guid, state="completed")
+
+
+def _pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, "_prepare_tab", lambda driver: None)
+    browser = _FakeBrowser()
+    return browser, TabPipeline(browser, str(tmp_path), lambda message: None)
+
+
+def test_overlapping_downloads_keep_their_own_files(tmp_path, monkeypatch):
+    browser, pipeline = _pipeline(tmp_path, monkeypatch)
+    assert pipeline.start("https://example.com/s/a", context="a") is None
+    assert pipeline.start("https://example.com/s/b", context="b") is None
+    tab_a, tab_b = "TAB1", "TAB2"
+
+    # The second link's file begins first and both are in flight at once, with the same name.
+    browser.begin(tab_b, "guid-b", "video.mp4")
+    browser.begin(tab_a, "guid-a", "video.mp4")
+    assert pipeline.poll() == []
+    assert pipeline.in_flight == 2
+
+    browser.complete(tab_b, "guid-b")
+    [(context, paths)] = pipeline.poll()
+    assert context == "b"
+    assert [open(path).read() for path in paths] == ["https://example.com/s/b"]
+
+    browser.complete(tab_a, "guid-a")
+    [(context, paths)] = pipeline.poll()
+    assert context == "a"
+    assert [open(path).read() for path in paths] == ["https://example.com/s/a"]
+
+    assert sorted(os.listdir(tmp_path)) == ["video (1).mp4", "video.mp4"]
+    assert browser.window_handles == ["HOME"]
+
+
+def test_a_download_from_an_abandoned_tab_is_not_taken_for_another_link(tmp_path, monkeypatch):
+    browser, pipeline = _pipeline(tmp_path, monkeypatch)
+    pipeline.start("https://example.com/s/a", context="a", start_timeout=0)
+    [(context, paths)] = pipeline.poll()
+    assert (context, paths) == ("a", [])
+
+    pipeline.start("https://example.com/s/b", context="b")
+    # The first link's file only begins now, while the second link is waiting for its own.
+    browser.begin("TAB1", "guid-a", "late.bin")
+    assert pipeline.poll() == []
+    assert browser.cancelled == ["guid-a"]
+    assert os.listdir(tmp_path) == []
+
+    browser.begin("TAB2", "guid-b", "b.bin")
+    browser.complete("TAB2", "guid-b")
+    [(context, paths)] = pipeline.poll()
+    assert context == "b"
+    assert [open(path).read() for path in paths] == ["https://example.com/s/b"]
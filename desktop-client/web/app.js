@@ -112,4 +112,6 @@ document.addEventListener("DOMContentLoaded", () => {
   console.log(
     "VortexFlow UI Initialized. Click the sidebar to launch the main view."
   );
+  // Lets the client print its start-up timings and load the heavy engines in the background.
+  if (window.eel && eel.ui_ready) eel.ui_ready();
 });